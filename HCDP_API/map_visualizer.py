@@ -41,6 +41,7 @@ try:
 except ImportError:
     from station_finder import get_nearby_stations
 
+from database.region_masks import circle_mask
 
 # --- Configuration ---
 DEFAULT_JSON = "station_rainfall_data.json"
@@ -112,27 +113,14 @@ def haversine_dist(lat1, lon1, lat2, lon2):
 def mask_raster_to_circle(data, meta, center_lat, center_lon, radius_km):
     """
     Masks raster data to a circular area using Haversine distance.
+    The mask is built only over the circle's pixel window and cached by region_masks.
     """
-    rows, cols = data.shape
-    transform = meta['transform']
+    window, mask = circle_mask(meta['transform'], data.shape, center_lat, center_lon, radius_km)
     
-    # Generate meshgrid of row/col indices
-    r_idx, c_idx = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
-    
-    # Convert to coordinates (lon, lat) using the transform
-    # transform is (a, b, c, d, e, f) where x = a*col + b*row + c, y = d*col + e*row + f
-    # Rasterio transform: (res_x, shear_x, x_min, shear_y, res_y, y_max)
-    # x = transform[0] * c + transform[1] * r + transform[2]
-    # y = transform[3] * c + transform[4] * r + transform[5]
-    
-    lons = transform[0] * c_idx + transform[1] * r_idx + transform[2]
-    lats = transform[3] * c_idx + transform[4] * r_idx + transform[5]
-    
-    # Calculate distance for all pixels
-    dist = haversine_dist(center_lat, center_lon, lats, lons)
-    
-    masked_data = data.copy()
-    masked_data[dist > radius_km] = np.nan
+    masked_data = np.full(data.shape, np.nan, dtype=np.result_type(data.dtype, np.float32))
+    if window is not None:
+        y_min, y_max, x_min, x_max = window
+        masked_data[y_min:y_max, x_min:x_max] = np.where(mask, data[y_min:y_max, x_min:x_max], np.nan)
     return masked_data
 
 def process_tiffs(tiff_dir, start_date=None, end_date=None):
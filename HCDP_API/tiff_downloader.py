@@ -10,10 +10,14 @@ Usage (Monthly):
 Usage (Daily):
     python tiff_downloader.py 2026-01-01 2026-04-01 --datatype rainfall
 
+Usage (Pipeline, straight into a TileDB array without writing TIFFs):
+    python tiff_downloader.py 2022-01 2022-12 --datatype rainfall --array_uri ../database/rainfall_array
+
 The API requires an authentication token, which should be set in the HCDP_API_TOKEN environment variable.
 """
 
 import os
+import sys
 import requests
 import argparse
 from dotenv import load_dotenv
@@ -27,18 +31,12 @@ load_dotenv()
 API_URL = "https://api.hcdp.ikewai.org/raster"
 AUTH_TOKEN = os.getenv("HCDP_API_TOKEN")
 
-def download_tiff(date_str, output_path, datatype='rainfall', period='month'):
-    """
-    Downloads a single TIFF file for a specific date from the HCDP API.
+# Concurrent downloads in pipeline mode (--array_uri)
+PIPELINE_WORKERS = 8
 
-    Args:
-        date_str (str): The date string in YYYY-MM or YYYY-MM-DD format.
-        output_path (str): The local file path to save the downloaded TIFF.
-        datatype (str): The climate variable to download (e.g., 'rainfall', 'temperature').
-        period (str): The time resolution of the data ('month' or 'day').
-
-    Returns:
-        bool: True if the download was successful, False otherwise.
+def _request_args(date_str, datatype, period):
+    """
+    Query parameters and headers of the raster request for one date.
     """
     params = {
         'date': date_str,
@@ -60,6 +58,22 @@ def download_tiff(date_str, output_path, datatype='rainfall', period='month'):
         'accept': 'image/tif',
         'Authorization': f'Bearer {AUTH_TOKEN}'
     }
+    return params, headers
+
+def download_tiff(date_str, output_path, datatype='rainfall', period='month'):
+    """
+    Downloads a single TIFF file for a specific date from the HCDP API.
+
+    Args:
+        date_str (str): The date string in YYYY-MM or YYYY-MM-DD format.
+        output_path (str): The local file path to save the downloaded TIFF.
+        datatype (str): The climate variable to download (e.g., 'rainfall', 'temperature').
+        period (str): The time resolution of the data ('month' or 'day').
+
+    Returns:
+        bool: True if the download was successful, False otherwise.
+    """
+    params, headers = _request_args(date_str, datatype, period)
 
     try:
         print(f"Downloading {date_str}...")
@@ -79,12 +93,91 @@ def download_tiff(date_str, output_path, datatype='rainfall', period='month'):
         print(f"  Exception: {str(e)}")
         return False
 
+def fetch_tiff_bytes(date_str, datatype='rainfall', period='month'):
+    """
+    Downloads the TIFF for a specific date from the HCDP API into memory.
+
+    Args:
+        date_str (str): The date string in YYYY-MM or YYYY-MM-DD format.
+        datatype (str): The climate variable to download (e.g., 'rainfall', 'temperature').
+        period (str): The time resolution of the data ('month' or 'day').
+
+    Returns:
+        bytes: The GeoTIFF file contents, or None if the download failed.
+    """
+    params, headers = _request_args(date_str, datatype, period)
+
+    try:
+        response = requests.get(API_URL, params=params, headers=headers)
+        if response.status_code == 200:
+            return response.content
+        print(f"  Error {response.status_code} for {date_str}: {response.text}")
+        return None
+
+    except Exception as e:
+        print(f"  Exception for {date_str}: {str(e)}")
+        return None
+
+def date_range(start_date, end_date):
+    """
+    Dates from start_date through end_date, monthly for YYYY-MM and daily for YYYY-MM-DD.
+
+    Returns:
+        tuple: (list of date strings, period) with period 'month' or 'day'.
+    """
+    # Detect format and parse dates
+    is_daily = len(start_date) == 10 # YYYY-MM-DD is 10 chars
+    date_format = "%Y-%m-%d" if is_daily else "%Y-%m"
+    period = "day" if is_daily else "month"
+
+    current_date = datetime.strptime(start_date, date_format)
+    end = datetime.strptime(end_date, date_format)
+
+    dates = []
+    while current_date <= end:
+        dates.append(current_date.strftime(date_format))
+
+        # Increment
+        if is_daily:
+            current_date += timedelta(days=1)
+        else:
+            current_date += relativedelta(months=1)
+    return dates, period
+
+def ingest_range(start_date, end_date, array_uri, datatype='rainfall', workers=PIPELINE_WORKERS, refresh=False,
+                 **options):
+    """
+    Pipeline mode: downloads the TIFFs of a date range concurrently and streams them
+    straight into a TileDB array (see ingest_downloads in database/tiledb_ingest.py),
+    without writing files. Daily dates go to the daily array next to array_uri.
+
+    Returns:
+        dict: The ingest diff (new, changed, unchanged, ... dates).
+    """
+    # Add project root to path so we can import from database folder
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    from database.tiledb_ingest import ingest_downloads
+
+    dates, period = date_range(start_date, end_date)
+    source = f"{API_URL}?datatype={datatype}&period={period}&date={{date}}"
+    return ingest_downloads(
+        array_uri, dates, lambda date_str: fetch_tiff_bytes(date_str, datatype=datatype, period=period),
+        source=source, refresh=refresh, workers=workers, resolution=period, **options
+    )
+
 def main():
     parser = argparse.ArgumentParser(description="Batch download TIFFs from HCDP API.")
     parser.add_argument("start_date", help="Start date (YYYY-MM or YYYY-MM-DD)")
     parser.add_argument("end_date", help="End date (YYYY-MM or YYYY-MM-DD)")
     parser.add_argument("--datatype", default="rainfall", help="Data type: rainfall, temperature, etc. (default: rainfall)")
     parser.add_argument("--output_dir", default="downloads", help="Directory to save TIFFs (default: downloads)")
+    parser.add_argument("--array_uri", help="Stream the downloads straight into this TileDB array instead of saving TIFFs")
+    parser.add_argument("--workers", type=int, default=PIPELINE_WORKERS,
+                        help=f"Concurrent downloads with --array_uri (default: {PIPELINE_WORKERS})")
+    parser.add_argument("--refresh", action="store_true",
+                        help="With --array_uri, download stored dates again and overwrite the ones whose content changed")
     
     args = parser.parse_args()
 
@@ -92,35 +185,27 @@ def main():
         print("Error: HCDP_API_TOKEN environment variable is not set.")
         return
 
+    try:
+        dates, period = date_range(args.start_date, args.end_date)
+    except ValueError:
+        print("Error: Dates must be in YYYY-MM or YYYY-MM-DD format.")
+        return
+
+    if args.array_uri:
+        ingest_range(args.start_date, args.end_date, args.array_uri, datatype=args.datatype,
+                     workers=args.workers, refresh=args.refresh)
+        return
+
     # Create output directory if it doesn't exist
     if not os.path.exists(args.output_dir):
         os.makedirs(args.output_dir)
         print(f"Created directory: {args.output_dir}")
 
-    # Detect format and parse dates
-    is_daily = len(args.start_date) == 10 # YYYY-MM-DD is 10 chars
-    date_format = "%Y-%m-%d" if is_daily else "%Y-%m"
-    period = "day" if is_daily else "month"
-
-    try:
-        current_date = datetime.strptime(args.start_date, date_format)
-        end_date = datetime.strptime(args.end_date, date_format)
-    except ValueError:
-        print(f"Error: Dates must be in {date_format} format.")
-        return
-
-    while current_date <= end_date:
-        date_str = current_date.strftime(date_format)
+    for date_str in dates:
         file_name = f"{date_str}.tiff"
         output_path = os.path.join(args.output_dir, file_name)
         
         download_tiff(date_str, output_path, datatype=args.datatype, period=period)
-        
-        # Increment
-        if is_daily:
-            current_date += timedelta(days=1)
-        else:
-            current_date += relativedelta(months=1)
 
     print("Batch download complete.")
 
@@ -0,0 +1,260 @@
+"""
+SPI Compute Job
+
+Derives the Standardized Precipitation Index directly from the monthly rainfall array
+instead of relying on the SPI TIFFs published by the HCDP portal. For every accumulation
+window (1, 3, 6 and 12 months by default) it:
+
+1. Sums rainfall over the trailing window (missing months leave the window undefined).
+2. Fits a gamma distribution per pixel and calendar month (Thom's maximum-likelihood
+   approximation, with the share of zero totals handled separately).
+3. Maps each total through the fitted CDF to a standard normal quantile.
+
+All land pixels of a row stripe are fitted at once with NumPy. Stripes are sized from a
+per-worker memory budget, spread over a process pool, and each worker writes its stripe
+of every window straight to the output arrays, so the full statewide history never has
+to fit in memory. Output arrays sit next to the SPI array, one per window
+(e.g. database/spi_array_3mo), with the same layout as the other climate arrays.
+
+Usage:
+    python database/compute_spi.py --rain_uri database/rainfall_array --spi_uri database/spi_array
+    python database/compute_spi.py --windows 3 12 --calibration 1991-2020 --workers 4 --memory_mb 1024
+"""
+import os
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tiledb
+from scipy.special import gammainc, ndtri
+
+try:
+    from database.tiledb_access import build_time_index, index_runs, mask_fill_values, write_time_index
+    from database.tiledb_ingest import create_array_like, refresh_hot_window
+except ImportError:
+    # Running as a script from inside database/
+    from tiledb_access import build_time_index, index_runs, mask_fill_values, write_time_index
+    from tiledb_ingest import create_array_like, refresh_hot_window
+
+SPI_WINDOWS = (1, 3, 6, 12)
+
+# Worker processes and the memory each may use for its stripe
+SPI_WORKERS = max(1, min(4, os.cpu_count() or 1))
+SPI_MEMORY_MB = 1024
+
+# Approximate bytes held per (month, pixel) cell while a stripe is processed:
+# the float32 read and write buffers plus float64 cumulative sums and window totals
+BYTES_PER_CELL = 40
+
+# Minimum number of non-zero totals needed to fit a pixel's gamma distribution
+MIN_GAMMA_SAMPLES = 10
+
+# CDF values are clipped to this distance from 0 and 1, bounding SPI to about +/-3.7
+CDF_EPSILON = 1e-4
+
+def spi_uri_for_window(spi_uri, window):
+    """
+    URI of the computed SPI array for an accumulation window, e.g. spi_array_3mo.
+    """
+    return spi_uri.rstrip("/\\") + f"_{window}mo"
+
+def rolling_totals(precip, window):
+    """
+    Trailing window sums along axis 0 of a (months, pixels) float64 array.
+    Totals covering a missing month (NaN) or the first window - 1 months are NaN.
+    """
+    missing = np.isnan(precip)
+    csum = np.cumsum(np.where(missing, 0.0, precip), axis=0)
+    cmissing = np.cumsum(missing, axis=0)
+    totals = np.full(precip.shape, np.nan)
+    if window > len(precip):
+        return totals
+    totals[window - 1] = csum[window - 1]
+    totals[window:] = csum[window:] - csum[:-window]
+    gaps = cmissing[window - 1:].copy()
+    gaps[1:] -= cmissing[:-window]
+    totals[window - 1:][gaps > 0] = np.nan
+    return totals
+
+def fit_gamma(sample):
+    """
+    Fits a gamma distribution to each column of a (years, pixels) sample of totals.
+    Returns (alpha, beta, q): shape, scale and the probability of a zero total.
+    Columns with fewer than MIN_GAMMA_SAMPLES non-zero totals get NaN parameters.
+    """
+    valid = ~np.isnan(sample)
+    positive = valid & (sample > 0)
+    n_valid = valid.sum(axis=0)
+    n_pos = positive.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = (n_valid - n_pos) / n_valid
+        mean = np.where(positive, sample, 0.0).sum(axis=0) / n_pos
+        mean_log = np.where(positive, np.log(np.where(positive, sample, 1.0)), 0.0).sum(axis=0) / n_pos
+        a = np.log(mean) - mean_log
+        alpha = (1.0 + np.sqrt(1.0 + 4.0 * a / 3.0)) / (4.0 * a)
+        beta = mean / alpha
+
+    unfit = (n_pos < MIN_GAMMA_SAMPLES) | ~(a > 0)
+    alpha[unfit] = np.nan
+    beta[unfit] = np.nan
+    return alpha, beta, q
+
+def gamma_spi(totals, alpha, beta, q):
+    """
+    SPI of (years, pixels) totals under the fitted mixed zero/gamma distribution.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cdf = q + (1.0 - q) * gammainc(alpha, np.maximum(totals, 0.0) / beta)
+    cdf = np.clip(cdf, CDF_EPSILON, 1.0 - CDF_EPSILON)
+    return ndtri(cdf)
+
+def spi_for_block(precip, calendar_months, window, calibration=None):
+    """
+    SPI for a (months, pixels) block of monthly rainfall in chronological order.
+    calendar_months: month of year (0-11) of every row.
+    calibration: optional boolean row mask of the months used to fit the distributions.
+    Returns a float32 (months, pixels) array.
+    """
+    totals = rolling_totals(precip, window)
+    spi = np.full(totals.shape, np.nan, dtype=np.float32)
+    for month in range(12):
+        rows = calendar_months == month
+        if not rows.any():
+            continue
+        fit_rows = rows & calibration if calibration is not None else rows
+        alpha, beta, q = fit_gamma(totals[fit_rows])
+        spi[rows] = gamma_spi(totals[rows], alpha, beta, q)
+    return spi
+
+def _stripe_rows(n_months, width, tile_y, memory_mb):
+    rows = max(1, int(memory_mb * 1024 * 1024 // (n_months * width * BYTES_PER_CELL)))
+    # Whole tiles when the budget allows, so each stripe decodes every tile once
+    return rows - rows % tile_y if rows >= tile_y else rows
+
+def _compute_stripe(rain_uri, out_uris, windows, y0, y1, rain_indices, positions, calendar_months, calibration, out_start):
+    """
+    Worker: reads one row stripe of the rainfall history, computes SPI for every window
+    over its land pixels and writes the stripe to the output arrays.
+    """
+    n_months = len(calendar_months)
+    with tiledb.DenseArray(rain_uri, mode='r') as rain:
+        width = int(rain.meta["width"])
+        # multi_index ranges are inclusive on both ends
+        block = rain.multi_index[[slice(a, b) for a, b in index_runs(rain_indices)], y0:y1 - 1, :]["value"]
+        if not rain.meta.get("nodata_normalized", 0):
+            block = mask_fill_values(block, rain.meta.get("nodata"))
+
+    stripe = np.full((n_months, y1 - y0, width), np.nan, dtype=np.float32)
+    stripe[positions] = block
+    del block
+
+    # Only pixels with rainfall in some month are fitted
+    flat = stripe.reshape(n_months, -1)
+    land = ~np.isnan(flat).all(axis=0)
+    precip = flat[:, land].astype(np.float64)
+
+    out = np.full(stripe.shape, np.nan, dtype=np.float32)
+    out_flat = out.reshape(n_months, -1)
+    for window in windows:
+        out_flat[:, land] = spi_for_block(precip, calendar_months, window, calibration)
+        with tiledb.DenseArray(out_uris[window], mode='w') as dest:
+            dest[out_start:out_start + n_months, y0:y1, :] = out
+    return y0, y1, int(land.sum())
+
+def compute_spi(rain_uri, spi_uri, windows=SPI_WINDOWS, calibration=None, workers=SPI_WORKERS, memory_mb=SPI_MEMORY_MB):
+    """
+    Computes SPI for every month of rain_uri at each accumulation window and writes it to
+    spi_uri_for_window(spi_uri, window). calibration: optional 'YYYY-YYYY' period whose
+    months are used to fit the distributions (default: the full record).
+    Re-running recomputes the full history and appends months added since the last run.
+    """
+    with tiledb.DenseArray(rain_uri, mode='r') as rain:
+        dates, indices = build_time_index(json.loads(rain.meta["time_mapping"]))
+        height, width = int(rain.meta["height"]), int(rain.meta["width"])
+        tile_y = rain.schema.domain.dim("y").tile
+    if not len(dates):
+        print(f"No rainfall data in {rain_uri}")
+        return
+
+    # Continuous monthly calendar; months missing from the rainfall array stay NaN
+    months = dates.astype("datetime64[M]")
+    calendar = np.arange(months[0], months[-1] + 1)
+    calendar_months = (calendar.astype(np.int64) % 12).astype(np.int8)
+    labels = [str(m) for m in calendar]
+
+    # Rows are read in time_index order and scattered to their calendar position
+    order = np.argsort(indices)
+    rain_indices = indices[order]
+    positions = (months - calendar[0]).astype(np.int64)[order]
+
+    cal_mask = None
+    if calibration:
+        first, last = (int(v) for v in calibration.split("-"))
+        years = calendar.astype("datetime64[Y]").astype(np.int64) + 1970
+        cal_mask = (years >= first) & (years <= last)
+
+    out_uris = {window: spi_uri_for_window(spi_uri, window) for window in windows}
+    out_start = None
+    for window, out_uri in out_uris.items():
+        create_array_like(rain_uri, out_uri)
+        with tiledb.DenseArray(out_uri, mode='r') as out:
+            stored = json.loads(out.meta["time_mapping"])
+        # Outputs are written as one contiguous block starting at the first calendar month
+        start = stored.get(labels[0], 0)
+        if any(stored.get(label, start + i) != start + i for i, label in enumerate(labels)):
+            raise ValueError(f"{out_uri} was not written by compute_spi; remove it before recomputing.")
+        if out_start is not None and start != out_start:
+            raise ValueError(f"SPI arrays disagree on their time layout; remove {out_uri} before recomputing.")
+        out_start = start
+
+    rows = _stripe_rows(len(calendar), width, tile_y, memory_mb)
+    stripes = [(y0, min(y0 + rows, height)) for y0 in range(0, height, rows)]
+    print(f"Computing SPI-{'/'.join(str(w) for w in windows)} for {len(calendar)} months "
+          f"in {len(stripes)} stripes of {rows} rows on {workers} worker(s)...")
+
+    args = (rain_uri, out_uris, tuple(windows))
+    tail = (rain_indices, positions, calendar_months, cal_mask, out_start)
+    if workers <= 1:
+        results = (_compute_stripe(*args, y0, y1, *tail) for y0, y1 in stripes)
+        for y0, y1, n_land in results:
+            print(f"  Rows {y0}-{y1 - 1}: {n_land} land pixels")
+    else:
+        # TileDB contexts must not be inherited through fork(), so workers are spawned
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_compute_stripe, *args, y0, y1, *tail) for y0, y1 in stripes]
+            for future in futures:
+                y0, y1, n_land = future.result()
+                print(f"  Rows {y0}-{y1 - 1}: {n_land} land pixels")
+
+    # Publish the months only after every stripe has been written
+    for window, out_uri in out_uris.items():
+        with tiledb.DenseArray(out_uri, mode='w') as out:
+            write_time_index(out, {label: out_start + i for i, label in enumerate(labels)})
+            out.meta["next_time_index"] = out_start + len(labels)
+            out.meta["spi_window"] = window
+            out.meta["spi_calibration"] = calibration or f"{labels[0][:4]}-{labels[-1][:4]}"
+        # Stripe writes leave one fragment per stripe; merge them
+        tiledb.consolidate(out_uri)
+        tiledb.vacuum(out_uri)
+        refresh_hot_window(out_uri)
+        print(f"SPI-{window} written to {out_uri}")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compute SPI from the monthly rainfall array")
+    parser.add_argument("--rain_uri", default=os.path.join("database", "rainfall_array"),
+                        help="Monthly rainfall TileDB array")
+    parser.add_argument("--spi_uri", default=os.path.join("database", "spi_array"),
+                        help="Base URI of the SPI arrays; one array per window is written next to it")
+    parser.add_argument("--windows", type=int, nargs="+", default=list(SPI_WINDOWS),
+                        help="Accumulation windows in months")
+    parser.add_argument("--calibration", help="Calibration period 'YYYY-YYYY' (default: full record)")
+    parser.add_argument("--workers", type=int, default=SPI_WORKERS, help="Worker processes")
+    parser.add_argument("--memory_mb", type=int, default=SPI_MEMORY_MB,
+                        help="Approximate memory budget per worker in MB")
+    args = parser.parse_args()
+
+    compute_spi(args.rain_uri, args.spi_uri, windows=args.windows, calibration=args.calibration,
+                workers=args.workers, memory_mb=args.memory_mb)
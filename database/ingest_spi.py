@@ -1,50 +1,31 @@
 import os
-import sys
-import subprocess
 
-# Add the database directory to path to import tiledb_ingest if needed, 
-# although we'll just call it via subprocess for simplicity and to avoid path issues.
+try:
+    from database.tiledb_ingest import ingest_tiffs
+except ImportError:
+    # Running as a script from inside database/
+    from tiledb_ingest import ingest_tiffs
 
 DATABASE_DIR = r"c:\SCIPE\HCDP-data-for-AI\database"
 SPI_DIR = r"c:\SCIPE\HCDP-data-for-AI\HCDP_API\spi"
 ARRAY_URI = os.path.join(DATABASE_DIR, "spi_array")
-INGEST_SCRIPT = os.path.join(DATABASE_DIR, "tiledb_ingest.py")
 
-def run_ingestion():
-    if not os.path.exists(INGEST_SCRIPT):
-        print(f"Error: Ingestion script not found at {INGEST_SCRIPT}")
+def run_ingestion(spi_dir=SPI_DIR, array_uri=ARRAY_URI):
+    if not os.path.isdir(spi_dir):
+        print(f"Error: SPI directory not found at {spi_dir}")
         return
 
-    print(f"Starting SPI data ingestion from {SPI_DIR} to {ARRAY_URI}...")
-    
-    # We run in a loop because tiledb_ingest.py limits to 120 files per run on Windows 
-    # to avoid fragment locking/memory issues.
-    max_loops = 10 
-    for i in range(max_loops):
-        print(f"\n--- Batch Run {i+1} ---")
-        result = subprocess.run([
-            sys.executable, INGEST_SCRIPT, 
-            "--input_dir", SPI_DIR, 
-            "--array_uri", ARRAY_URI
-        ], capture_output=True, text=True)
-        
-        print(result.stdout)
-        if result.stderr:
-            print("Errors:", result.stderr)
-            
-        if "No TIFF files found" in result.stdout or "already ingested in array" in result.stdout and "Limiting to 120 files" not in result.stdout:
-            # If we didn't limit to 120, it means we finished all remaining files.
-            # But the script always prints "already ingested" for skipped files.
-            # If it doesn't say "Loading X files" and just says skipping, we are done.
-            if "Loading 0 files" in result.stdout or "Skipping" in result.stdout and "Loading" not in result.stdout:
-                 print("All files processed.")
-                 break
-        
-        # A more reliable check: if "Successfully finished ingestion" is in stdout 
-        # but it didn't find any NEW files to ingest.
-        if "Loading" not in result.stdout and "Successfully finished ingestion" in result.stdout:
-            print("All files already ingested or no new files found.")
-            break
+    print(f"Starting SPI data ingestion from {spi_dir} to {array_uri}...")
+
+    # The ingest streams the files in batches, so the whole archive goes in one run
+    # (and a rerun after an interruption picks up at the first missing month).
+    ingest_tiffs(spi_dir, array_uri)
 
 if __name__ == "__main__":
-    run_ingestion()
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest SPI TIFFs into the SPI TileDB array")
+    parser.add_argument("--input_dir", default=SPI_DIR, help="Directory containing SPI TIFF files")
+    parser.add_argument("--array_uri", default=ARRAY_URI, help="Path/URI for the SPI TileDB array")
+    args = parser.parse_args()
+
+    run_ingestion(args.input_dir, args.array_uri)
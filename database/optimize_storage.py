@@ -5,6 +5,353 @@ import numpy as np
 import json
 import time
 
+try:
+    from database.tiledb_access import mask_fill_values, invalidate_cache, array_version, hot_window_dir, HOT_WINDOW_INDEX
+except ImportError:
+    # Running as a script from inside database/
+    from tiledb_access import mask_fill_values, invalidate_cache, array_version, hot_window_dir, HOT_WINDOW_INDEX
+
+# Spatial tile extents used by migrate_tiling when none are given
+DEFAULT_TILE_Y = 256
+DEFAULT_TILE_X = 256
+
+# Square window sizes (pixels) used for the bytes-read report. 41 px is roughly the
+# 5 km radius used by the agent's regional tools on the statewide grid.
+REPORT_WINDOW_SIZES = [1, 11, 41, 161]
+
+# Ingest consolidates an array once it holds more fragments than this (0 disables it)
+CONSOLIDATE_FRAGMENT_THRESHOLD = int(os.getenv("HCDP_CONSOLIDATE_FRAGMENTS", "8"))
+
+# Time slices copied (and then compared against the original) per batch when rewriting an array
+COPY_BATCH_SLICES = 50
+
+# What consolidate_array merges (and then vacuums), in this order
+CONSOLIDATION_MODES = ("fragments", "fragment_meta", "array_meta")
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(dirpath, filename))
+               for dirpath, _, filenames in os.walk(path)
+               for filename in filenames)
+
+def _copy_slices(src_array, dest_uri, meta):
+    """
+    Copies every recorded time slice of src_array into dest_uri in batches.
+    Returns the number of slices copied.
+    """
+    time_mapping = json.loads(meta.get("time_mapping", "{}"))
+    num_slices = meta.get("next_time_index", len(time_mapping))
+    
+    if num_slices == 0:
+        print("Array has no recorded slices, nothing to copy.")
+        return num_slices
+
+    print(f"Copying {num_slices} time slices...")
+    for i in range(0, num_slices, COPY_BATCH_SLICES):
+        end_idx = min(i + COPY_BATCH_SLICES, num_slices)
+        print(f"  Processing slices {i} to {end_idx-1}...")
+        data = src_array[i:end_idx, :, :]
+        with tiledb.DenseArray(dest_uri, mode='w') as dest_array:
+            dest_array[i:end_idx, :, :] = data
+    return num_slices
+
+def _verify_copy(array_uri, temp_uri, num_slices, batch_size=COPY_BATCH_SLICES):
+    """
+    Compares every copied slice with the original, batch by batch, before the copy may
+    replace it. Raises ValueError on the first batch that differs.
+    """
+    print(f"Verifying all {num_slices} copied slices...")
+    with tiledb.DenseArray(array_uri, mode='r') as src:
+        with tiledb.DenseArray(temp_uri, mode='r') as dest:
+            for i in range(0, num_slices, batch_size):
+                end_idx = min(i + batch_size, num_slices)
+                s_data = src[i:end_idx, :, :]
+                d_data = dest[i:end_idx, :, :]
+                
+                # Handle cases where TileDB returns a dictionary of arrays
+                if isinstance(s_data, dict): s_data = next(iter(s_data.values()))
+                if isinstance(d_data, dict): d_data = next(iter(d_data.values()))
+                
+                if not np.array_equal(s_data, d_data, equal_nan=True):
+                    raise ValueError(f"Data mismatch in slices {i} to {end_idx-1}!")
+    
+    print("Verification passed.")
+
+def _swap_in(array_uri, temp_uri, backup_uri):
+    print(f"Backing up original to {backup_uri}...")
+    os.rename(array_uri, backup_uri)
+    print(f"Moving optimized array from {temp_uri} to {array_uri}...")
+    # shutil.move is safer if temp_uri is on a different drive
+    shutil.move(temp_uri, array_uri)
+
+def _temp_uri(array_uri, label):
+    # Use system temp directory for better isolation from file watchers on Windows
+    import tempfile
+    temp_parent = tempfile.gettempdir()
+    return os.path.join(temp_parent, os.path.basename(array_uri) + f"_{label}_" + str(int(time.time())))
+
+def _stats_counters():
+    stats = tiledb.stats_dump(json=True, print_out=False)
+    if isinstance(stats, str):
+        stats = json.loads(stats)
+    if isinstance(stats, list):
+        stats = stats[0]
+    return stats.get("counters", {})
+
+def measure_window_reads(array_uri, window_sizes=REPORT_WINDOW_SIZES, num_months=12):
+    """
+    Reads square windows centered on the grid over the last num_months slices and
+    reports, per window size, the bytes fetched from disk and the bytes decompressed.
+    A fresh context is used for every read so the tile cache does not hide I/O.
+    """
+    with tiledb.DenseArray(array_uri, mode='r') as array:
+        height, width = int(array.meta["height"]), int(array.meta["width"])
+        next_time_index = int(array.meta["next_time_index"])
+    t_end = max(next_time_index, 1)
+    t_start = max(0, t_end - num_months)
+    cy, cx = height // 2, width // 2
+
+    report = []
+    tiledb.stats_enable()
+    try:
+        for size in window_sizes:
+            half = size // 2
+            y0, y1 = max(0, cy - half), min(height, cy - half + size)
+            x0, x1 = max(0, cx - half), min(width, cx - half + size)
+
+            tiledb.stats_reset()
+            with tiledb.DenseArray(array_uri, mode='r', ctx=tiledb.Ctx()) as array:
+                array[t_start:t_end, y0:y1, x0:x1]
+            counters = _stats_counters()
+            report.append({
+                "window": size,
+                "bytes_read": int(counters.get("Context.VFS.read_byte_num", 0)),
+                "bytes_decompressed": int(counters.get("Context.Query.Reader.read_unfiltered_byte_num", 0))
+            })
+    finally:
+        tiledb.stats_disable()
+    return report
+
+def _print_read_report(before, after):
+    print(f"{'Window':>8} {'Read before':>14} {'Read after':>14} {'Decoded before':>16} {'Decoded after':>16}")
+    for b, a in zip(before, after):
+        print(f"{str(b['window']) + 'px':>8} {b['bytes_read']:>14,} {a['bytes_read']:>14,} "
+              f"{b['bytes_decompressed']:>16,} {a['bytes_decompressed']:>16,}")
+
+def migrate_tiling(array_uri, tile_y=DEFAULT_TILE_Y, tile_x=DEFAULT_TILE_X, window_sizes=REPORT_WINDOW_SIZES, dry_run=False):
+    """
+    Rewrites array_uri with spatial tile extents (tile_y, tile_x), keeping one month per
+    time tile, verifies the copy and swaps it in (the original is kept as a backup).
+    Prints bytes read/decompressed before and after for each window size so the tile
+    size can be chosen from data. With dry_run=True the rewritten array is only measured
+    and then discarded.
+    """
+    if not tiledb.array_exists(array_uri):
+        print(f"Array {array_uri} does not exist.")
+        return None
+
+    temp_uri = _temp_uri(array_uri, f"tiled{tile_y}x{tile_x}")
+    backup_uri = array_uri + "_backup_" + str(int(time.time()))
+
+    print(f"\n--- Migrating tiling of {array_uri} to {tile_y}x{tile_x} ---")
+    with tiledb.DenseArray(array_uri, mode='r') as src_array:
+        schema = src_array.schema
+        meta = dict(src_array.meta)
+        dom = schema.domain
+        height, width = int(meta["height"]), int(meta["width"])
+
+        current = (dom.dim("y").tile, dom.dim("x").tile)
+        if current == (min(tile_y, height), min(tile_x, width)):
+            print(f"Array {array_uri} already uses {current[0]}x{current[1]} spatial tiles. Skipping migration.")
+            return None
+
+        time_dim = dom.dim("time_index")
+        new_dom = tiledb.Domain(
+            tiledb.Dim(name="time_index", domain=time_dim.domain, tile=time_dim.tile, dtype=time_dim.dtype),
+            tiledb.Dim(name="y", domain=(0, height - 1), tile=min(tile_y, height), dtype=dom.dim("y").dtype),
+            tiledb.Dim(name="x", domain=(0, width - 1), tile=min(tile_x, width), dtype=dom.dim("x").dtype)
+        )
+        new_schema = tiledb.ArraySchema(
+            domain=new_dom,
+            sparse=schema.sparse,
+            attrs=[schema.attr(i) for i in range(schema.nattr)],
+            cell_order=schema.cell_order,
+            tile_order=schema.tile_order
+        )
+
+        print(f"Creating re-tiled array at {temp_uri}...")
+        tiledb.DenseArray.create(temp_uri, new_schema)
+        with tiledb.DenseArray(temp_uri, mode='w') as dest_array:
+            for key, value in meta.items():
+                dest_array.meta[key] = value
+
+        num_slices = _copy_slices(src_array, temp_uri, meta)
+
+    _verify_copy(array_uri, temp_uri, num_slices)
+
+    print("Measuring bytes read per window size...")
+    before = measure_window_reads(array_uri, window_sizes)
+    after = measure_window_reads(temp_uri, window_sizes)
+    _print_read_report(before, after)
+
+    if dry_run:
+        print(f"Dry run: discarding {temp_uri}.")
+        shutil.rmtree(temp_uri)
+    else:
+        _swap_in(array_uri, temp_uri, backup_uri)
+        print(f"Migration complete. You can now safely delete the backup: {backup_uri}")
+
+    return {"before": before, "after": after}
+
+def normalize_nodata(array_uri, batch_size=50):
+    """
+    One-off migration for arrays ingested before nodata normalization: rewrites every
+    slice with the nodata value and legacy fill values (-9999, < -1e30) replaced by NaN,
+    then flags the array so readers skip their masking passes. Progress is checkpointed
+    in the array metadata, so an interrupted run resumes where it stopped.
+    """
+    if not tiledb.array_exists(array_uri):
+        print(f"Array {array_uri} does not exist.")
+        return
+
+    with tiledb.DenseArray(array_uri, mode='r') as src_array:
+        meta = dict(src_array.meta)
+    if meta.get("nodata_normalized"):
+        print(f"Array {array_uri} already stores NaN fill values. Skipping normalization.")
+        return
+
+    nodata = meta.get("nodata")
+    num_slices = int(meta.get("next_time_index", 0))
+    done_through = int(meta.get("nodata_normalized_through", -1))
+    print(f"\n--- Normalizing nodata in {array_uri} (slices {done_through + 1} to {num_slices - 1}) ---")
+
+    for i in range(done_through + 1, num_slices, batch_size):
+        end_idx = min(i + COPY_BATCH_SLICES, num_slices)
+        print(f"  Processing slices {i} to {end_idx-1}...")
+        with tiledb.DenseArray(array_uri, mode='r') as src_array:
+            data = src_array[i:end_idx, :, :]["value"]
+        data = mask_fill_values(data, nodata)
+        with tiledb.DenseArray(array_uri, mode='w') as dest_array:
+            dest_array[i:end_idx, :, :] = data
+            dest_array.meta["nodata_normalized_through"] = end_idx - 1
+
+    with tiledb.DenseArray(array_uri, mode='w') as dest_array:
+        dest_array.meta["nodata_normalized"] = 1
+
+    # The rewrite superseded every original fragment; merge and drop them
+    print("Consolidating and vacuuming rewritten fragments...")
+    tiledb.consolidate(array_uri)
+    tiledb.vacuum(array_uri)
+    print(f"Nodata normalization complete for {array_uri}.")
+
+def _count_files(path):
+    try:
+        return sum(1 for entry in os.scandir(path) if entry.is_file())
+    except OSError:
+        return 0
+
+def fragment_counts(array_uri):
+    """
+    Number of fragments, consolidated fragment metadata files and array metadata files
+    of array_uri. The file counts are only available for local arrays (None otherwise).
+    """
+    local = "://" not in array_uri
+    return {
+        "fragments": len(tiledb.array_fragments(array_uri)),
+        "fragment_meta": _count_files(os.path.join(array_uri, "__fragment_meta")) if local else None,
+        "array_meta": _count_files(os.path.join(array_uri, "__meta")) if local else None
+    }
+
+def measure_read_latency(array_uri, window=41, num_months=12, repeats=3):
+    """
+    Median seconds to open array_uri with a fresh context (no tile cache), load its
+    metadata and read a window x window square at the grid center over the last
+    num_months stored slices. Both the open and the read slow down as fragments pile up.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with tiledb.DenseArray(array_uri, mode='r', ctx=tiledb.Ctx()) as array:
+            dict(array.meta)
+            domain = array.nonempty_domain()
+            if domain is not None:
+                subarray = []
+                for i, (lo, hi) in enumerate(domain):
+                    lo, hi = int(lo), int(hi)
+                    if i >= len(domain) - 2:
+                        # Spatial dimensions: a window around the center
+                        lo = max(lo, (lo + hi) // 2 - window // 2)
+                        hi = min(hi, lo + window - 1)
+                    elif i == 0:
+                        lo = max(lo, hi - num_months + 1)
+                    subarray.append(slice(lo, hi + 1))
+                array[tuple(subarray)]
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def _hot_index_path(array_uri):
+    directory = hot_window_dir(array_uri)
+    return os.path.join(directory, HOT_WINDOW_INDEX) if directory else None
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (TypeError, OSError, ValueError):
+        return None
+
+def consolidate_array(array_uri, modes=CONSOLIDATION_MODES, measure=True):
+    """
+    Consolidates the fragments, fragment metadata and array metadata of array_uri and
+    vacuums what each step superseded. Prints and returns fragment counts and read
+    latency (see measure_read_latency) before and after. Cell values are unchanged, so
+    pooled handles are reopened and a current hot window stays in use.
+    """
+    before = fragment_counts(array_uri)
+    if measure:
+        before["latency_s"] = measure_read_latency(array_uri)
+
+    hot_path = _hot_index_path(array_uri)
+    hot_index = _read_json(hot_path)
+    hot_current = hot_index is not None and hot_index.get("version") == json.dumps(array_version(array_uri))
+
+    # Pooled read handles would keep vacuumed files open (and locked on Windows)
+    invalidate_cache(array_uri)
+    for mode in modes:
+        config = tiledb.Config({"sm.consolidation.mode": mode, "sm.vacuum.mode": mode})
+        tiledb.consolidate(array_uri, config=config)
+        tiledb.vacuum(array_uri, config=config)
+    invalidate_cache(array_uri)
+
+    if hot_current:
+        hot_index["version"] = json.dumps(array_version(array_uri))
+        tmp_path = f"{hot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(hot_index, f)
+        os.replace(tmp_path, hot_path)
+
+    after = fragment_counts(array_uri)
+    if measure:
+        after["latency_s"] = measure_read_latency(array_uri)
+
+    print(f"Consolidated {array_uri}:")
+    for key in ("fragments", "fragment_meta", "array_meta"):
+        if before[key] is not None:
+            print(f"  {key:<14} {before[key]:>6} -> {after[key]}")
+    if measure:
+        print(f"  {'read latency':<14} {before['latency_s'] * 1000:>6.1f} -> {after['latency_s'] * 1000:.1f} ms")
+    return {"before": before, "after": after}
+
+def consolidate_if_needed(array_uri, max_fragments=CONSOLIDATE_FRAGMENT_THRESHOLD):
+    """
+    Runs consolidate_array when array_uri holds more than max_fragments fragments.
+    Returns its report, or None when nothing was done (max_fragments <= 0 disables it).
+    """
+    if max_fragments <= 0 or not tiledb.array_exists(array_uri):
+        return None
+    if len(tiledb.array_fragments(array_uri)) <= max_fragments:
+        return None
+    return consolidate_array(array_uri)
+
 def optimize_array(array_uri):
     if not tiledb.array_exists(array_uri):
         print(f"Array {array_uri} does not exist.")
@@ -12,11 +359,7 @@ def optimize_array(array_uri):
 
     backup_base = array_uri + "_backup"
     backup_uri = backup_base + "_" + str(int(time.time()))
-    
-    # Use system temp directory for better isolation from file watchers on Windows
-    import tempfile
-    temp_parent = tempfile.gettempdir()
-    temp_uri = os.path.join(temp_parent, os.path.basename(array_uri) + "_compressed_" + str(int(time.time())))
+    temp_uri = _temp_uri(array_uri, "compressed")
     
     print(f"\n--- Optimizing array: {array_uri} ---")
     print(f"Building compressed version in temp: {temp_uri}")
@@ -57,55 +400,17 @@ def optimize_array(array_uri):
                 dest_array.meta[key] = value
 
         # Copy data in chunks
-        time_mapping = json.loads(meta.get("time_mapping", "{}"))
-        num_slices = meta.get("next_time_index", len(time_mapping))
-        
-        if num_slices == 0:
-            print("Array has no recorded slices, nothing to copy.")
-        else:
-            print(f"Copying {num_slices} time slices...")
-            batch_size = 50 
-            for i in range(0, num_slices, batch_size):
-                end_idx = min(i + batch_size, num_slices)
-                print(f"  Processing slices {i} to {end_idx-1}...")
-                data = src_array[i:end_idx, :, :]
-                with tiledb.DenseArray(temp_uri, mode='w') as dest_array:
-                    dest_array[i:end_idx, :, :] = data
+        num_slices = _copy_slices(src_array, temp_uri, meta)
 
     # Verification Step
-    print("Verifying data integrity...")
-    with tiledb.DenseArray(array_uri, mode='r') as src:
-        with tiledb.DenseArray(temp_uri, mode='r') as dest:
-            # Check a few random slices
-            for test_idx in [0, num_slices // 2, num_slices - 1]:
-                if test_idx < 0 or test_idx >= num_slices: continue
-                print(f"  Checking slice {test_idx}...")
-                s_data = src[test_idx]
-                d_data = dest[test_idx]
-                
-                # Handle cases where TileDB returns a dictionary of arrays
-                if isinstance(s_data, dict): s_data = next(iter(s_data.values()))
-                if isinstance(d_data, dict): d_data = next(iter(d_data.values()))
-                
-                if not np.allclose(s_data, d_data, equal_nan=True):
-                    raise ValueError(f"Data mismatch at slice {test_idx}!")
-    
-    print("Verification passed.")
+    _verify_copy(array_uri, temp_uri, num_slices)
 
     # Swap arrays
-    print(f"Backing up original to {backup_uri}...")
-    os.rename(array_uri, backup_uri)
-    print(f"Moving optimized array from {temp_uri} to {array_uri}...")
-    # shutil.move is safer if temp_uri is on a different drive
-    shutil.move(temp_uri, array_uri)
+    _swap_in(array_uri, temp_uri, backup_uri)
     
     # Calculate savings
-    old_size = sum(os.path.getsize(os.path.join(dirpath, filename)) 
-                   for dirpath, _, filenames in os.walk(backup_uri) 
-                   for filename in filenames)
-    new_size = sum(os.path.getsize(os.path.join(dirpath, filename)) 
-                   for dirpath, _, filenames in os.walk(array_uri) 
-                   for filename in filenames)
+    old_size = _dir_size(backup_uri)
+    new_size = _dir_size(array_uri)
     
     print(f"Optimization complete!")
     print(f"Old size: {old_size / (1024**2):.2f} MB")
@@ -114,13 +419,43 @@ def optimize_array(array_uri):
     print(f"You can now safely delete the backup: {backup_uri}")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Optimize or migrate the layout of the TileDB climate arrays")
+    parser.add_argument("--migrate_tiling", action="store_true",
+                        help="Rewrite arrays with spatial tile extents instead of recompressing them")
+    parser.add_argument("--tile_y", type=int, default=DEFAULT_TILE_Y, help="Spatial tile extent along y (rows)")
+    parser.add_argument("--tile_x", type=int, default=DEFAULT_TILE_X, help="Spatial tile extent along x (columns)")
+    parser.add_argument("--windows", type=int, nargs="+", default=REPORT_WINDOW_SIZES,
+                        help="Square window sizes (pixels) for the bytes-read report")
+    parser.add_argument("--normalize_nodata", action="store_true",
+                        help="Rewrite legacy fill values as NaN so readers can skip masking")
+    parser.add_argument("--consolidate", action="store_true",
+                        help="Consolidate and vacuum fragments, fragment metadata and array metadata")
+    parser.add_argument("--max_fragments", type=int, default=0,
+                        help="With --consolidate, only process arrays holding more fragments than this")
+    parser.add_argument("--dry_run", action="store_true",
+                        help="Only measure the re-tiled layout; keep the original array in place")
+    parser.add_argument("--array_uri", action="append",
+                        help="Array to process (repeatable). Defaults to the standard arrays.")
+    args = parser.parse_args()
+
     base_dir = r"c:\SCIPE\HCDP-data-for-AI\database"
     arrays = ["rainfall_array", "temperature_array", "spi_array"]
+    uris = args.array_uri or [os.path.join(base_dir, array_name) for array_name in arrays]
     
-    for array_name in arrays:
-        uri = os.path.join(base_dir, array_name)
+    for uri in uris:
         if os.path.exists(uri):
             try:
-                optimize_array(uri)
+                if args.consolidate:
+                    if args.max_fragments > 0:
+                        consolidate_if_needed(uri, args.max_fragments)
+                    else:
+                        consolidate_array(uri)
+                elif args.normalize_nodata:
+                    normalize_nodata(uri)
+                elif args.migrate_tiling:
+                    migrate_tiling(uri, args.tile_y, args.tile_x, args.windows, args.dry_run)
+                else:
+                    optimize_array(uri)
             except Exception as e:
-                print(f"Failed to optimize {array_name}: {e}")
+                print(f"Failed to optimize {os.path.basename(uri)}: {e}")
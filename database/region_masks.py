@@ -0,0 +1,160 @@
+"""
+Region Mask Service
+
+Builds boolean masks for circular areas (center + radius in km) and GeoJSON polygons
+(watersheds, districts, ...) on the climate grid. A mask only covers the pixel window
+around the region, so callers read and mask just that window instead of the full grid.
+
+Masks are cached on the quantized geometry: repeated queries for the same place cost a
+dictionary lookup. Returned masks are read-only because they are shared between callers.
+
+Usage:
+    from database.region_masks import circle_mask
+
+    window, mask = circle_mask(meta["transform"], (meta["height"], meta["width"]), 21.3069, -157.8583, 5.0)
+    y_min, y_max, x_min, x_max = window   # stop indices are exclusive
+"""
+import json
+import math
+from functools import lru_cache
+
+import numpy as np
+from affine import Affine
+from rasterio.features import geometry_mask
+
+EARTH_RADIUS_KM = 6371.0
+
+# Coordinates are rounded to this many decimals (~10 m) before caching
+COORD_DECIMALS = 4
+
+# Number of distinct circles / polygons kept per cache
+MASK_CACHE_SIZE = 256
+
+def haversine_dist(lat1, lon1, lat2, lon2):
+    """
+    Calculate the great circle distance between two points on the earth.
+    Can accept numpy arrays.
+    """
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat/2)**2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return EARTH_RADIUS_KM * c
+
+def _grid_key(transform, shape):
+    return tuple(round(float(v), 12) for v in tuple(transform)[:6]), (int(shape[0]), int(shape[1]))
+
+def _bounds_to_window(transform, shape, west, south, east, north):
+    """
+    Pixel window (y_min, y_max, x_min, x_max), exclusive stops, covering a lon/lat box
+    on a north-up grid, clipped to the grid. Returns None if the box misses the grid.
+    """
+    a, b, c, d, e, f = transform
+    cols = sorted(((west - c) / a, (east - c) / a))
+    rows = sorted(((north - f) / e, (south - f) / e))
+    x_min = max(0, int(math.floor(cols[0])))
+    x_max = min(shape[1], int(math.floor(cols[1])) + 1)
+    y_min = max(0, int(math.floor(rows[0])))
+    y_max = min(shape[0], int(math.floor(rows[1])) + 1)
+    if x_min >= x_max or y_min >= y_max:
+        return None
+    return y_min, y_max, x_min, x_max
+
+def _pixel_centers(transform, window):
+    a, b, c, d, e, f = transform
+    y_min, y_max, x_min, x_max = window
+    rows = np.arange(y_min, y_max) + 0.5
+    cols = np.arange(x_min, x_max) + 0.5
+    r_idx, c_idx = np.meshgrid(rows, cols, indexing='ij')
+    lons = a * c_idx + b * r_idx + c
+    lats = d * c_idx + e * r_idx + f
+    return lats, lons
+
+@lru_cache(maxsize=MASK_CACHE_SIZE)
+def _cached_circle(grid_key, lat, lon, radius_km):
+    transform, shape = grid_key
+
+    # Exact degree extents of the circle at this latitude
+    deg_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    deg_lon = deg_lat / max(math.cos(math.radians(lat)), 1e-6)
+    window = _bounds_to_window(transform, shape, lon - deg_lon, lat - deg_lat, lon + deg_lon, lat + deg_lat)
+    if window is None:
+        return None, None
+
+    lats, lons = _pixel_centers(transform, window)
+    mask = haversine_dist(lat, lon, lats, lons) <= radius_km
+    mask.flags.writeable = False
+    return window, mask
+
+def circle_mask(transform, shape, center_lat, center_lon, radius_km):
+    """
+    Mask of the pixels whose centers lie within radius_km (great-circle distance) of
+    the center point. transform is the 6-element affine transform of the grid and
+    shape its (height, width).
+    Returns (window, mask): window is (y_min, y_max, x_min, x_max) with exclusive stops and
+    mask a boolean array of the window's shape; (None, None) if the circle misses the grid.
+    """
+    return _cached_circle(
+        _grid_key(transform, shape),
+        round(float(center_lat), COORD_DECIMALS),
+        round(float(center_lon), COORD_DECIMALS),
+        round(float(radius_km), 3)
+    )
+
+def _geometry_shapes(geojson):
+    """
+    Extracts the geometries from a GeoJSON geometry, Feature or FeatureCollection.
+    """
+    if geojson.get("type") == "FeatureCollection":
+        return [feature["geometry"] for feature in geojson["features"]]
+    if geojson.get("type") == "Feature":
+        return [geojson["geometry"]]
+    return [geojson]
+
+def _round_coords(coords):
+    if isinstance(coords, (list, tuple)) and coords and isinstance(coords[0], (int, float)):
+        return [round(float(v), COORD_DECIMALS) for v in coords]
+    return [_round_coords(c) for c in coords]
+
+def _flatten_points(coords):
+    if coords and isinstance(coords[0], (int, float)):
+        yield coords
+    else:
+        for c in coords:
+            yield from _flatten_points(c)
+
+@lru_cache(maxsize=MASK_CACHE_SIZE)
+def _cached_polygon(grid_key, geometry_key):
+    transform, shape = grid_key
+    shapes = json.loads(geometry_key)
+
+    points = [p for geom in shapes for p in _flatten_points(geom["coordinates"])]
+    lons = [p[0] for p in points]
+    lats = [p[1] for p in points]
+    window = _bounds_to_window(transform, shape, min(lons), min(lats), max(lons), max(lats))
+    if window is None:
+        return None, None
+
+    y_min, y_max, x_min, x_max = window
+    window_transform = Affine(*transform) * Affine.translation(x_min, y_min)
+    mask = geometry_mask(shapes, out_shape=(y_max - y_min, x_max - x_min), transform=window_transform, invert=True)
+    mask.flags.writeable = False
+    return window, mask
+
+def polygon_mask(transform, shape, geojson):
+    """
+    Mask of the pixels whose centers fall inside a GeoJSON Polygon/MultiPolygon (a bare
+    geometry, a Feature or a FeatureCollection), e.g. a watershed or district boundary.
+    Returns (window, mask) like circle_mask.
+    """
+    shapes = [
+        {"type": geom["type"], "coordinates": _round_coords(geom["coordinates"])}
+        for geom in _geometry_shapes(geojson)
+    ]
+    return _cached_polygon(_grid_key(transform, shape), json.dumps(shapes, sort_keys=True))
+
+def mask_cache_info():
+    """
+    Hit/miss counters for the circle and polygon mask caches.
+    """
+    return {"circle": _cached_circle.cache_info(), "polygon": _cached_polygon.cache_info()}
@@ -0,0 +1,219 @@
+"""
+Query Result Cache
+
+A bounded, thread-safe LRU cache for query results (time series, statistics, rasters).
+Small results stay in memory within a byte budget; results holding large arrays are
+spilled to .npy files in a local cache directory with their own disk budget. The least
+recently used entries are evicted from each tier when its budget is exceeded.
+
+Callers build the key (tiledb_access keys on the array URI, its fragment version and the
+query arguments) and always get a private copy back, so cached results can be modified.
+
+Usage:
+    from database.result_cache import ResultCache
+
+    cache = ResultCache(memory_bytes=256 * 1024 * 1024, disk_bytes=2 * 1024 ** 3)
+    found, value = cache.get(key)
+    if not found:
+        value = compute()
+        cache.put(key, value)
+    print(cache.info())
+"""
+import atexit
+import copy
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+# Results whose arrays total at least this many bytes go to the disk tier
+SPILL_MIN_BYTES = 4 * 1024 * 1024
+
+class _Spilled:
+    """
+    Placeholder for an array stored in a .npy file of the disk tier.
+    """
+    def __init__(self, path):
+        self.path = path
+
+def _result_nbytes(value):
+    """
+    Approximate size of a result: array buffers plus a small charge per container item.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "memory_usage"):
+        # pandas Series / DataFrame results
+        usage = value.memory_usage(index=True, deep=True)
+        return 64 + int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(value, dict):
+        return 64 + sum(_result_nbytes(k) + _result_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 64 + sum(_result_nbytes(v) for v in value)
+    if isinstance(value, str):
+        return 49 + len(value)
+    return 32
+
+def _iter_arrays(value):
+    if isinstance(value, np.ndarray):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _iter_arrays(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _iter_arrays(v)
+
+def _map_arrays(value, func):
+    """
+    Rebuilds a nested dict/list/tuple result with func applied to every array leaf.
+    """
+    if isinstance(value, (np.ndarray, _Spilled)):
+        return func(value)
+    if isinstance(value, dict):
+        return {k: _map_arrays(v, func) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_map_arrays(v, func) for v in value)
+    return value
+
+class ResultCache:
+    """
+    Two-tier LRU cache: results under spill_min_bytes of array data are kept in memory
+    (bounded by memory_bytes), larger ones are written to cache_dir (bounded by disk_bytes).
+    A budget of 0 disables the tier.
+    """
+    def __init__(self, memory_bytes, disk_bytes=0, cache_dir=None, spill_min_bytes=SPILL_MIN_BYTES):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.spill_min_bytes = spill_min_bytes
+        self.base_dir = cache_dir or os.path.join(tempfile.gettempdir(), "hcdp_result_cache")
+        self.cache_dir = None
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()   # key -> (value, nbytes)
+        self.disk = OrderedDict()     # key -> (skeleton, paths, nbytes)
+        self.memory_used = 0
+        self.disk_used = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "spills": 0}
+
+    def get(self, key):
+        """
+        Returns (found, value). value is a copy the caller may modify.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.counters["hits"] += 1
+                return True, copy.deepcopy(self.memory[key][0])
+            if key in self.disk:
+                self.disk.move_to_end(key)
+                skeleton = self.disk[key][0]
+            else:
+                self.counters["misses"] += 1
+                return False, None
+
+        try:
+            value = _map_arrays(skeleton, lambda leaf: np.load(leaf.path))
+        except OSError:
+            # Spill file removed behind our back (e.g. temp cleanup): treat as a miss
+            self._drop_disk(key)
+            with self.lock:
+                self.counters["misses"] += 1
+            return False, None
+        with self.lock:
+            self.counters["disk_hits"] += 1
+        return True, value
+
+    def put(self, key, value):
+        array_bytes = sum(leaf.nbytes for leaf in _iter_arrays(value))
+        if array_bytes >= self.spill_min_bytes and self.disk_bytes > 0:
+            self._put_disk(key, value, array_bytes)
+            return
+        nbytes = _result_nbytes(value)
+        if nbytes > self.memory_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self.lock:
+            if key in self.memory:
+                self.memory_used -= self.memory.pop(key)[1]
+            self.memory[key] = (value, nbytes)
+            self.memory_used += nbytes
+            while self.memory_used > self.memory_bytes:
+                _, (_, evicted) = self.memory.popitem(last=False)
+                self.memory_used -= evicted
+                self.counters["evictions"] += 1
+
+    def _put_disk(self, key, value, nbytes):
+        if nbytes > self.disk_bytes:
+            return
+        with self.lock:
+            if self.cache_dir is None:
+                os.makedirs(self.base_dir, exist_ok=True)
+                # One directory per process, removed at exit
+                self.cache_dir = tempfile.mkdtemp(prefix=f"{os.getpid()}_", dir=self.base_dir)
+                atexit.register(shutil.rmtree, self.cache_dir, True)
+            cache_dir = self.cache_dir
+
+        paths = []
+        def spill(leaf):
+            path = os.path.join(cache_dir, f"{uuid.uuid4().hex}.npy")
+            np.save(path, leaf)
+            paths.append(path)
+            return _Spilled(path)
+        skeleton = _map_arrays(value, spill)
+
+        stale = []
+        with self.lock:
+            if key in self.disk:
+                stale.append(self.disk.pop(key))
+                self.disk_used -= stale[-1][2]
+            self.disk[key] = (skeleton, paths, nbytes)
+            self.disk_used += nbytes
+            self.counters["spills"] += 1
+            while self.disk_used > self.disk_bytes:
+                _, entry = self.disk.popitem(last=False)
+                self.disk_used -= entry[2]
+                self.counters["evictions"] += 1
+                stale.append(entry)
+        for _, old_paths, _ in stale:
+            self._remove_files(old_paths)
+
+    def _drop_disk(self, key):
+        with self.lock:
+            entry = self.disk.pop(key, None)
+            if entry is not None:
+                self.disk_used -= entry[2]
+        if entry is not None:
+            self._remove_files(entry[1])
+
+    def _remove_files(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            disk_entries = list(self.disk.values())
+            self.memory.clear()
+            self.disk.clear()
+            self.memory_used = self.disk_used = 0
+        for _, paths, _ in disk_entries:
+            self._remove_files(paths)
+
+    def info(self):
+        """
+        Hit/miss/eviction counters and current usage of both tiers.
+        """
+        with self.lock:
+            return dict(
+                self.counters,
+                memory_entries=len(self.memory),
+                memory_bytes=self.memory_used,
+                disk_entries=len(self.disk),
+                disk_bytes=self.disk_used
+            )
@@ -1,215 +1,1519 @@
+import os
+import functools
+import hashlib
+import inspect
+import threading
+import warnings
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import tiledb
 import json
 import numpy as np
+import pandas as pd
 import rasterio
 
-def get_metadata(array_uri):
-    with tiledb.DenseArray(array_uri, mode='r') as array:
-        meta = {
-            "transform": json.loads(array.meta["transform"]),
-            "crs": array.meta["crs"],
-            "nodata": array.meta["nodata"],
-            "width": array.meta["width"],
-            "height": array.meta["height"],
-            "time_mapping": json.loads(array.meta["time_mapping"])
-        }
-    return meta
+try:
+    from database.result_cache import ResultCache
+except ImportError:
+    # Running as a script from inside database/
+    from result_cache import ResultCache
+
+# Shared read context. The tile cache keeps recently decompressed tiles in memory
+# so repeated queries against the same months skip the Zstd decode.
+TILE_CACHE_BYTES = int(os.getenv("HCDP_TILEDB_TILE_CACHE_MB", "512")) * 1024 * 1024
+
+# Idle read handles kept open per array; extra handles are closed on release.
+MAX_HANDLES_PER_ARRAY = 4
+
+# Budgets of the query result cache (see result_cache). Results with large rasters
+# are spilled to .npy files under HCDP_RESULT_CACHE_DIR; a budget of 0 disables a tier.
+RESULT_CACHE_BYTES = int(os.getenv("HCDP_RESULT_CACHE_MB", "256")) * 1024 * 1024
+RESULT_CACHE_DISK_BYTES = int(os.getenv("HCDP_RESULT_CACHE_DISK_MB", "2048")) * 1024 * 1024
+
+RESULT_CACHE = ResultCache(RESULT_CACHE_BYTES, RESULT_CACHE_DISK_BYTES, os.getenv("HCDP_RESULT_CACHE_DIR"))
+
+# Root directory for hot windows (see hot_window_dir). Unset, each local array keeps
+# its hot window next to it; remote arrays need this to have one at all.
+HOT_WINDOW_ROOT = os.getenv("HCDP_HOT_WINDOW_DIR")
+
+_ctx = None
+_ctx_lock = threading.Lock()
+_registry = {}
+_registry_lock = threading.Lock()
+
+def get_context():
+    """
+    Returns the process-wide TileDB context used by every read in this module.
+    """
+    global _ctx
+    if _ctx is None:
+        with _ctx_lock:
+            if _ctx is None:
+                config = tiledb.Config({
+                    "sm.tile_cache_size": str(TILE_CACHE_BYTES),
+                    "vfs.read_ahead_cache_size": str(min(TILE_CACHE_BYTES, 64 * 1024 * 1024)),
+                })
+                _ctx = tiledb.Ctx(config)
+    return _ctx
+
+def _normalize_uri(array_uri):
+    if "://" in array_uri:
+        return array_uri
+    return os.path.abspath(array_uri)
+
+def _array_version(array_uri):
+    """
+    Cheap change token for an array. Local arrays use the mtimes of the directories
+    TileDB adds entries to when fragments or metadata are written, so checking for
+    new data costs a few stat calls instead of a fragment listing.
+    """
+    if "://" in array_uri:
+        fragments = tiledb.array_fragments(array_uri, ctx=get_context())
+        return (len(fragments), tuple(fragments.timestamp_range[-1]) if len(fragments) else None)
+
+    stamps = []
+    for sub in ("", "__fragments", "__commits", "__meta"):
+        try:
+            stamps.append(os.stat(os.path.join(array_uri, sub)).st_mtime_ns)
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+def array_version(array_uri):
+    """
+    Change token of an array (see _array_version); differs after every write.
+    Used to key caches built on top of the arrays.
+    """
+    return _array_version(_normalize_uri(array_uri))
+
+def build_time_index(time_mapping):
+    """
+    Builds the sorted time index for a {date_str: time_index} mapping.
+    Returns (dates, indices): ascending datetime64 dates ('YYYY-MM' keys give
+    datetime64[M], 'YYYY-MM-DD' keys datetime64[D]) and the time_index of each date.
+    """
+    keys = sorted(time_mapping)
+    if not keys:
+        return np.array([], dtype="datetime64[M]"), np.array([], dtype=np.int64)
+    dates = np.array(keys, dtype="datetime64")
+    indices = np.array([time_mapping[k] for k in keys], dtype=np.int64)
+    return dates, indices
+
+def write_time_index(array, time_mapping):
+    """
+    Stores the time axis on an array opened for writing: the JSON time_mapping
+    plus the compact sorted index (time_dates as int64 datetime64 values, time_unit
+    and time_indices) that readers binary-search.
+    """
+    array.meta["time_mapping"] = json.dumps(time_mapping)
+    dates, indices = build_time_index(time_mapping)
+    if len(dates):
+        array.meta["time_dates"] = dates.astype(np.int64)
+        array.meta["time_unit"] = np.datetime_data(dates.dtype)[0]
+        array.meta["time_indices"] = indices
+
+def _load_time_index(raw, time_mapping):
+    if "time_dates" in raw and "time_unit" in raw and "time_indices" in raw:
+        dates = np.atleast_1d(np.asarray(raw["time_dates"], dtype=np.int64)).astype(f"datetime64[{raw['time_unit']}]")
+        indices = np.atleast_1d(np.asarray(raw["time_indices"], dtype=np.int64))
+        if len(dates) == len(time_mapping):
+            return dates, indices
+    # Arrays written before the index existed (or out of sync): derive it once per version
+    return build_time_index(time_mapping)
+
+def _parse_metadata(array):
+    raw = dict(array.meta)
+    time_mapping = json.loads(raw.get("time_mapping", "{}"))
+    time_dates, time_indices = _load_time_index(raw, time_mapping)
+    return {
+        "transform": json.loads(raw["transform"]) if "transform" in raw else None,
+        "crs": raw.get("crs"),
+        "nodata": raw.get("nodata"),
+        "nodata_normalized": bool(raw.get("nodata_normalized", 0)),
+        "width": raw.get("width"),
+        "height": raw.get("height"),
+        "time_mapping": time_mapping,
+        "time_dates": time_dates,
+        "time_indices": time_indices,
+        "time_labels": [str(d) for d in np.datetime_as_string(time_dates)],
+        "raw": raw
+    }
+
+class _ArrayEntry:
+    """
+    Pooled read handles and parsed metadata for one version of an array.
+    """
+    def __init__(self, array_uri, version):
+        self.array_uri = array_uri
+        self.version = version
+        self.lock = threading.Lock()
+        self.closed = False
+        array = tiledb.DenseArray(array_uri, mode='r', ctx=get_context())
+        self.meta = _parse_metadata(array)
+        self.idle = [array]
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return tiledb.DenseArray(self.array_uri, mode='r', ctx=get_context())
+
+    def release(self, array):
+        with self.lock:
+            if not self.closed and len(self.idle) < MAX_HANDLES_PER_ARRAY:
+                self.idle.append(array)
+                return
+        array.close()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for array in idle:
+            array.close()
+
+def _get_entry(array_uri):
+    array_uri = _normalize_uri(array_uri)
+    version = _array_version(array_uri)
+    with _registry_lock:
+        entry = _registry.get(array_uri)
+        if entry is not None and entry.version == version:
+            return entry
+
+    # Open outside the registry lock so a slow open does not block other arrays
+    new_entry = _ArrayEntry(array_uri, version)
+    with _registry_lock:
+        entry = _registry.get(array_uri)
+        if entry is not None and entry.version == version:
+            stale = new_entry
+        else:
+            stale = entry
+            _registry[array_uri] = entry = new_entry
+    if stale is not None:
+        stale.close()
+    return entry
+
+@contextmanager
+def open_array(array_uri):
+    """
+    Borrows a pooled read handle for array_uri together with its parsed metadata.
+    Handles are reopened automatically once new fragments or metadata are written.
+
+    Usage:
+        with open_array(uri) as (array, meta):
+            data = array[0, :, :]["value"]
+    """
+    entry = _get_entry(array_uri)
+    array = entry.acquire()
+    try:
+        yield array, entry.meta
+    finally:
+        entry.release(array)
+
+def invalidate_cache(array_uri=None):
+    """
+    Closes pooled handles for one array (or all arrays) so the next read reopens them.
+    Without an array_uri the query result cache is cleared as well.
+    """
+    with _registry_lock:
+        if array_uri is None:
+            entries = list(_registry.values())
+            _registry.clear()
+            RESULT_CACHE.clear()
+        else:
+            entry = _registry.pop(_normalize_uri(array_uri), None)
+            entries = [entry] if entry is not None else []
+    with _hot_windows_lock:
+        if array_uri is None:
+            _hot_windows.clear()
+        else:
+            _hot_windows.pop(_normalize_uri(array_uri), None)
+    for entry in entries:
+        entry.close()
+
+def get_metadata(array_uri, resolution="month"):
+    entry = _get_entry(resolution_uri(array_uri, resolution))
+    meta = entry.meta
+    return {
+        "transform": meta["transform"],
+        "crs": meta["crs"],
+        "nodata": meta["nodata"],
+        "width": meta["width"],
+        "height": meta["height"],
+        "time_mapping": meta["time_mapping"]
+    }
+
+# Worker threads for concurrent multi-variable reads (TileDB releases the GIL while reading)
+MAX_FETCH_WORKERS = 4
+
+# Worker threads prefetching month slices in get_raster_for_date_range
+RASTER_READ_WORKERS = min(4, os.cpu_count() or 1)
+
+# Months reduced per read in get_region_statistics
+REDUCE_CHUNK_MONTHS = 24
+
+# Overall percentiles of get_region_statistics are exact up to this many cells (steps x
+# window pixels, 32 MB of values); larger requests take them from a fixed-bin histogram
+PERCENTILE_EXACT_CELLS = 8_000_000
+
+# Value of each histogram bin: the float16 numbers, in ascending order (see _histogram_bins)
+_HISTOGRAM_KEYS = np.arange(1 << 16, dtype=np.uint32)
+_HISTOGRAM_VALUES = (
+    np.where(_HISTOGRAM_KEYS & 0x8000, _HISTOGRAM_KEYS & 0x7FFF, ~_HISTOGRAM_KEYS & 0xFFFF)
+    .astype(np.uint16).view(np.float16).astype(np.float64)
+)
+
+# Suffix of the companion array holding running sums/counts along time
+CUMULATIVE_SUFFIX = "_cumsum"
+
+# Suffix of the pixel-major companion array used for time-series extraction
+TIMESERIES_SUFFIX = "_timeseries"
+
+# Array URI suffix for each time resolution of a variable. The base array holds
+# monthly maps; daily maps and annual rollups live next to it.
+RESOLUTION_SUFFIXES = {"day": "_daily", "month": "", "year": "_yearly"}
+
+# Suffix of the directory holding the memory-mapped hot window of recent years
+HOT_WINDOW_SUFFIX = "_hot"
+HOT_WINDOW_INDEX = "index.json"
+
+# Suffixes of the sidecar arrays holding monthly normals and annual totals/means
+NORMALS_SUFFIX = "_normals"
+ANNUAL_SUFFIX = "_annual"
+
+# Reference period used when a normals query does not name one
+DEFAULT_NORMALS_PERIOD = "1991-2020"
+
+# Full-grid normals (12 maps each) kept in memory for anomaly queries
+NORMALS_CACHE_SIZE = 4
+
+# Largest (months x rows x cols) block read at once when aggregating observed values
+MAX_ANOMALY_BLOCK_CELLS = 32_000_000
+
+# Calendar seasons for get_calendar_aggregate. Wet/dry follow the Hawaii convention;
+# seasons crossing the new year belong to the year they end in (wet 2021 = Nov 2020-Apr 2021).
+SEASONS = {
+    "wet": (11, 12, 1, 2, 3, 4),
+    "dry": (5, 6, 7, 8, 9, 10),
+    "winter": (12, 1, 2),
+    "spring": (3, 4, 5),
+    "summer": (6, 7, 8),
+    "fall": (9, 10, 11)
+}
+
+# Largest (times x rows x cols) block a calendar aggregation reads in one query
+MAX_CALENDAR_BLOCK_CELLS = 32_000_000
+
+# Result layouts of the time-series functions (see _timeseries_result)
+TIMESERIES_OUTPUTS = ("dict", "array", "series")
+
+# Largest (times x rows x cols) block a batched point query reads in one request.
+# Scattered batches beyond this fall back to one single-cell read per point.
+MAX_POINT_BLOCK_CELLS = 1_000_000
+
+def _freeze(value):
+    """
+    Hashable form of a query argument; arrays (e.g. region masks) are keyed by content.
+    """
+    if isinstance(value, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16).hexdigest()
+        return ("ndarray", value.dtype.str, value.shape, digest)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _memoized(func=None, exclude=()):
+    """
+    Serves repeated queries from RESULT_CACHE. The key is the function, the array URI
+    (after resolution_uri), the array's fragment version (see _array_version) and every
+    other argument (date range, pixel window, mask, aggregation, ...), so new ingests
+    never return stale results. Callers always receive their own copy.
+    exclude: Arguments that only change how the result is computed (e.g. parallelism),
+             left out of the key so the same query hits the cache whatever their value.
+    """
+    if func is None:
+        return functools.partial(_memoized, exclude=exclude)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if RESULT_CACHE.memory_bytes <= 0 and RESULT_CACHE.disk_bytes <= 0:
+            return func(*args, **kwargs)
+        params = signature.bind(*args, **kwargs)
+        params.apply_defaults()
+        params = {name: value for name, value in params.arguments.items() if name not in exclude}
+        array_uri = _normalize_uri(resolution_uri(params.pop("array_uri"), params.get("resolution", "month")))
+        key = (func.__name__, array_uri, _array_version(array_uri), _freeze(params))
+
+        found, value = RESULT_CACHE.get(key)
+        if found:
+            return value
+        value = func(*args, **kwargs)
+        RESULT_CACHE.put(key, value)
+        return value
+    return wrapper
+
+def result_cache_info():
+    """
+    Hit, miss, eviction and spill counters plus current usage of the query result cache.
+    """
+    return RESULT_CACHE.info()
+
+def resolution_uri(array_uri, resolution="month"):
+    """
+    URI of the array holding a variable at the given time resolution ('day', 'month' or
+    'year'), e.g. database/rainfall_array -> database/rainfall_array_daily for 'day'.
+    """
+    if resolution not in RESOLUTION_SUFFIXES:
+        raise ValueError(f"Unknown resolution '{resolution}', expected one of {sorted(RESOLUTION_SUFFIXES)}.")
+    return array_uri.rstrip("/\\") + RESOLUTION_SUFFIXES[resolution]
+
+def mask_fill_values(data, nodata_val):
+    """
+    Replaces the array nodata value and legacy fill values with NaN in place.
+    """
+    if nodata_val is not None and not np.isnan(nodata_val):
+        data[data == nodata_val] = np.nan
+    data[data == -9999.0] = np.nan
+    data[data < -1e30] = np.nan
+    return data
+
+def _with_nan_fill(data, meta, normalized=False):
+    """
+    Returns data with every fill value as NaN. Arrays ingested with nodata normalization
+    (or read from a companion array) already store NaN, so their float32 buffers are
+    returned as-is; legacy arrays are cast to float64 and masked.
+    """
+    if normalized or meta["nodata_normalized"]:
+        return data
+    return mask_fill_values(data.astype(np.float64), meta["nodata"])
+
+def latlon_to_pixel(meta, lat, lon):
+    """
+    Converts latitude/longitude (scalars or arrays) to integer (row, col) pixel indices
+    using the inverse of the north-up affine transform stored in the array metadata.
+    """
+    a, b, c, d, e, f = meta["transform"]
+    col = np.floor((np.asarray(lon, dtype=np.float64) - c) / a).astype(np.int64)
+    row = np.floor((np.asarray(lat, dtype=np.float64) - f) / e).astype(np.int64)
+    return row, col
+
+def hot_window_dir(array_uri):
+    """
+    Directory of the hot window of array_uri: <array>_hot next to a local array, or
+    <HCDP_HOT_WINDOW_DIR>/<array name>_hot when that root is set. None for remote
+    arrays without a root.
+    """
+    array_uri = array_uri.rstrip("/\\")
+    if HOT_WINDOW_ROOT:
+        return os.path.join(HOT_WINDOW_ROOT, os.path.basename(array_uri) + HOT_WINDOW_SUFFIX)
+    if "://" in array_uri:
+        return None
+    return array_uri + HOT_WINDOW_SUFFIX
+
+class _HotWindow:
+    """
+    Recent slices of one array version as an uncompressed float32 (time, y, x) .npy file
+    (NaN fill) opened with np.memmap, plus a time_index -> row lookup.
+    """
+    def __init__(self, path, time_indices):
+        self.data = np.load(path, mmap_mode="r")
+        time_indices = np.asarray(time_indices, dtype=np.int64)
+        self.lookup = np.full(int(time_indices.max()) + 1 if len(time_indices) else 0, -1, dtype=np.int64)
+        self.lookup[time_indices] = np.arange(len(time_indices))
+
+    def rows(self, time_indices):
+        """
+        Rows holding time_indices, or None unless every one of them is in the window.
+        """
+        time_indices = np.asarray(time_indices, dtype=np.int64)
+        if not len(time_indices) or time_indices.min() < 0 or time_indices.max() >= len(self.lookup):
+            return None
+        rows = self.lookup[time_indices]
+        return None if (rows < 0).any() else rows
+
+_hot_windows = {}
+_hot_windows_lock = threading.Lock()
+
+def _hot_rows(array_uri, time_indices):
+    """
+    Returns (data, rows) when the hot window of array_uri is current and holds every
+    time index requested, otherwise (None, None) and the caller reads from TileDB.
+    data is the read-only memmap; slices of it must be copied before modifying them.
+    """
+    directory = hot_window_dir(array_uri)
+    if directory is None:
+        return None, None
+    index_path = os.path.join(directory, HOT_WINDOW_INDEX)
+    try:
+        stamp = os.stat(index_path).st_mtime_ns
+    except OSError:
+        return None, None
+
+    entry = _get_entry(array_uri)
+    with _hot_windows_lock:
+        cached = _hot_windows.get(entry.array_uri)
+    if cached is not None and cached[:2] == (stamp, entry.version):
+        window = cached[2]
+    else:
+        window = None
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            # A window refreshed before the latest write to the array is never used
+            if index.get("version") == json.dumps(entry.version):
+                window = _HotWindow(os.path.join(directory, index["file"]), index["time_indices"])
+        except (OSError, ValueError, KeyError):
+            window = None
+        with _hot_windows_lock:
+            _hot_windows[entry.array_uri] = (stamp, entry.version, window)
+
+    rows = window.rows(time_indices) if window is not None else None
+    if rows is None:
+        return None, None
+    return window.data, rows
 
-def get_data_for_month(array_uri, date_str):
+@_memoized
+def get_point_values(array_uri, lats, lons, dates, resolution="month"):
     """
-    Retrieves the 2D geospatial array for a specific month.
+    Retrieves the values at one or more (lat, lon, date) points.
+    Only the requested cells are read (TileDB decodes just the tiles containing them),
+    and a batch of points is resolved with a single multi-range query.
+    lats, lons and dates may be scalars or equal-length sequences of dates in the
+    array's resolution ('YYYY-MM', or 'YYYY-MM-DD' with resolution='day').
+    Returns a float64 array with NaN for nodata or points outside the grid.
     """
-    with tiledb.DenseArray(array_uri, mode='r') as array:
-        time_mapping = json.loads(array.meta["time_mapping"])
+    array_uri = resolution_uri(array_uri, resolution)
+    lats, lons, dates = np.broadcast_arrays(np.atleast_1d(lats), np.atleast_1d(lons), np.atleast_1d(dates))
+
+    with open_array(array_uri) as (array, meta):
+        time_mapping = meta["time_mapping"]
+        missing = sorted({str(d) for d in dates if str(d) not in time_mapping})
+        if missing:
+            raise ValueError(f"Date {missing[0]} not found in array metadata.")
+
+        rows, cols = latlon_to_pixel(meta, lats, lons)
+        times = np.array([time_mapping[str(d)] for d in dates], dtype=np.int64)
+        inside = (rows >= 0) & (rows < meta["height"]) & (cols >= 0) & (cols < meta["width"])
+
+        values = np.full(len(dates), np.nan, dtype=np.float64)
+        if not inside.any():
+            return values
+
+        t_in, r_in, c_in = times[inside], rows[inside], cols[inside]
+        hot, hot_rows = _hot_rows(array_uri, t_in)
+        if hot is not None:
+            values[inside] = hot[hot_rows, r_in, c_in]
+            return values
+
+        uniq_t, uniq_r, uniq_c = np.unique(t_in), np.unique(r_in), np.unique(c_in)
+
+        if len(uniq_t) * len(uniq_r) * len(uniq_c) <= MAX_POINT_BLOCK_CELLS:
+            # One query over the cross product of the point coordinates
+            block = array.multi_index[
+                [int(v) for v in uniq_t],
+                [int(v) for v in uniq_r],
+                [int(v) for v in uniq_c]
+            ]["value"]
+            picked = block[
+                np.searchsorted(uniq_t, t_in),
+                np.searchsorted(uniq_r, r_in),
+                np.searchsorted(uniq_c, c_in)
+            ]
+        else:
+            picked = np.array([
+                array[int(t), int(r):int(r) + 1, int(c):int(c) + 1]["value"][0, 0]
+                for t, r, c in zip(t_in, r_in, c_in)
+            ])
+
+        values[inside] = picked
+        if meta["nodata_normalized"]:
+            return values
+        return mask_fill_values(values, meta["nodata"])
+
+def get_data_for_month(array_uri, date_str, resolution="month"):
+    """
+    Retrieves the 2D geospatial array for a specific month (or day / year, with
+    date_str in that resolution's format).
+    Arrays with normalized nodata return their float32 data directly; legacy
+    arrays are cast to float64 with fill values masked to NaN.
+    """
+    array_uri = resolution_uri(array_uri, resolution)
+    with open_array(array_uri) as (array, meta):
+        time_mapping = meta["time_mapping"]
         if date_str not in time_mapping:
             raise ValueError(f"Date {date_str} not found in array metadata.")
         
         time_index = time_mapping[date_str]
+
+        hot, hot_rows = _hot_rows(array_uri, [time_index])
+        if hot is not None:
+            return np.array(hot[hot_rows[0]])
         
         # TileDB slicing is highly efficient since it only fetches the needed blocks
         data = array[time_index, :, :]["value"]
         
-        # Ensure float type for NaN support
-        data = data.astype(float)
-        
-        # Mask nodata/legacy values efficiently
-        nodata_val = array.meta.get("nodata")
-        
-        # Use fast direct comparison and thresholding instead of slow np.isclose
-        if nodata_val is not None and not np.isnan(nodata_val):
-            data[data == nodata_val] = np.nan
-        
-        data[data == -9999.0] = np.nan
-        data[data < -1e30] = np.nan
-            
-        return data
+        # Fill values are NaN already unless the array predates nodata normalization
+        return _with_nan_fill(data, meta)
+
+def timeseries_uri(array_uri):
+    """
+    URI of the pixel-major companion array for array_uri (built by tiledb_ingest).
+    """
+    return array_uri.rstrip("/\\") + TIMESERIES_SUFFIX
 
-def get_timeseries_for_pixel(array_uri, y, x):
+def _timeseries_source(array_uri, last_idx):
+    """
+    Returns the URI to read time series from: the pixel-major companion when it has
+    been built through last_idx, otherwise the map-oriented array itself.
+    """
+    ts_uri = timeseries_uri(array_uri)
+    if tiledb.array_exists(ts_uri, ctx=get_context()):
+        with open_array(ts_uri) as (_, ts_meta):
+            if ts_meta["raw"].get("built_through", -1) >= last_idx:
+                return ts_uri
+    return array_uri
+
+def _timeseries_result(dates, labels, values, output):
+    """
+    Packs a time series in the requested layout:
+    'dict'   -> {label: float} without NaN entries (the historical format)
+    'array'  -> (dates, values): a datetime64 index and an aligned float32 array, NaN kept
+    'series' -> a float32 pandas Series on a DatetimeIndex, NaN kept
+    """
+    values = np.asarray(values)
+    if output == "dict":
+        keep = ~np.isnan(values)
+        return dict(zip(np.asarray(labels, dtype=object)[keep].tolist(), values[keep].astype(np.float64).tolist()))
+    if output == "array":
+        return dates, values.astype(np.float32)
+    if output == "series":
+        return pd.Series(values.astype(np.float32), index=pd.DatetimeIndex(dates.astype("datetime64[ns]"), name="date"), name="value")
+    raise ValueError(f"Unknown output '{output}', expected one of {TIMESERIES_OUTPUTS}.")
+
+@_memoized
+def get_timeseries_for_pixel(array_uri, y, x, resolution="month", output="dict"):
     """
     Retrieves the temporal slice (time series) for a specific pixel coordinate.
+    Reads from the pixel-major companion array when it is available.
+    output: 'dict' ({label: value}, NaN dropped), 'array' ((datetime64 dates, float32 values))
+            or 'series' (pandas Series); see _timeseries_result.
     """
-    with tiledb.DenseArray(array_uri, mode='r') as array:
-        # Slice across the time dimension for a single (y, x)
-        data = array[:, y, x]["value"]
-        time_mapping = json.loads(array.meta["time_mapping"])
-        
-        # Invert mapping to return {date: value}
-        inverted_mapping = {v: k for k, v in time_mapping.items()}
-        
-        # Mask common fill values in time series efficiently
-        data = data.astype(float)
-        data[data == -9999.0] = np.nan
-        data[data < -1e30] = np.nan
+    array_uri = resolution_uri(array_uri, resolution)
+    meta = _get_entry(array_uri).meta
+    indices = meta["time_indices"]
+    if not len(indices):
+        return _timeseries_result(meta["time_dates"], [], np.array([], dtype=np.float32), output)
+    last_idx = int(indices.max())
+    source_uri = _timeseries_source(array_uri, last_idx)
+    with open_array(source_uri) as (array, _):
+        # Slice across the stored part of the time dimension for a single (y, x)
+        data = array[0:last_idx + 1, y, x]["value"]
         
-        series = {}
-        for idx, val in enumerate(data):
-            if idx in inverted_mapping:
-                # Skip NaNs in the final result series
-                if not np.isnan(val):
-                    series[inverted_mapping[idx]] = float(val)
-        return series
+    # The pixel-major companion always stores NaN fill values
+    data = _with_nan_fill(data, meta, normalized=source_uri != array_uri)
+    
+    # Reorder into chronological order via the sorted time index
+    return _timeseries_result(meta["time_dates"], meta["time_labels"], data[indices], output)
+
+def resolve_time_range(meta, start_date=None, end_date=None):
+    """
+    Resolves a date range against the sorted time index with a binary search.
+    Bounds are inclusive and may be coarser or finer than the array resolution
+    (an end_date of '2020' covers all of 2020). Returns (labels, indices) for the
+    stored dates in range, in chronological order.
+    """
+    positions = _time_range_positions(meta, start_date, end_date)
+    return meta["time_labels"][positions], meta["time_indices"][positions]
+
+def _time_range_positions(meta, start_date=None, end_date=None):
+    """
+    Slice of the sorted time index covering start_date..end_date (see resolve_time_range).
+    """
+    dates = meta["time_dates"]
+    lo, hi = 0, len(dates)
+    if start_date:
+        start = np.datetime64(start_date)
+        common = np.promote_types(dates.dtype, start.dtype)
+        lo = int(np.searchsorted(dates.astype(common, copy=False), start.astype(common), side="left"))
+    if end_date:
+        # First instant after the end period, so the whole end period is included
+        end_excl = np.datetime64(end_date) + 1
+        common = np.promote_types(dates.dtype, end_excl.dtype)
+        hi = int(np.searchsorted(dates.astype(common, copy=False), end_excl.astype(common), side="left"))
+    return slice(lo, max(lo, hi))
+
+def index_runs(indices):
+    """
+    Splits time indices (in chronological order) into runs of consecutive ascending
+    indices. Returns a list of inclusive (first, last) pairs. Backfilled dates written
+    out of order simply start a new run.
+    """
+    if not len(indices):
+        return []
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(indices)])) - 1
+    return [(int(indices[s]), int(indices[e])) for s, e in zip(starts, ends)]
+
+def _read_runs(array, runs, y_min, y_max, x_min, x_max):
+    """
+    Reads a (time, y, x) block for the given runs in chronological order with a single
+    query: a plain slice for one run, a multi-range subarray when there are gaps.
+    """
+    return _read_runs_attrs(array, runs, y_min, y_max, x_min, x_max)["value"]
 
-def get_timeseries_for_region(array_uri, start_date, end_date, y_min, y_max, x_min, x_max):
+def _read_runs_attrs(array, runs, y_min, y_max, x_min, x_max):
+    """
+    Like _read_runs, but returns every attribute of the array as a dict.
+    """
+    if len(runs) == 1:
+        first, last = runs[0]
+        return array[first:last + 1, y_min:y_max, x_min:x_max]
+    # multi_index ranges are inclusive on both ends
+    return array.multi_index[[slice(first, last) for first, last in runs], y_min:y_max - 1, x_min:x_max - 1]
+
+def _clip_window(meta, y_min, y_max, x_min, x_max):
+    # Ensure pixel indices are within array bounds (stop indices are exclusive)
+    h, w = meta["height"], meta["width"]
+    y_min = max(0, min(y_min, h - 1))
+    y_max = max(0, min(y_max, h))
+    x_min = max(0, min(x_min, w - 1))
+    x_max = max(0, min(x_max, w))
+    return y_min, y_max, x_min, x_max
+
+def _empty_window(y_min, y_max, x_min, x_max):
+    # An empty window (e.g. y_min == y_max) cannot be expressed as a TileDB range
+    return y_max <= y_min or x_max <= x_min
+
+def _apply_region_mask(data_block, mask):
+    """
+    Sets pixels outside a boolean region mask (see region_masks) to NaN in place.
+    """
+    if mask is not None:
+        if mask.shape != data_block.shape[1:]:
+            raise ValueError(f"Region mask shape {mask.shape} does not match the window {data_block.shape[1:]}.")
+        data_block[:, ~mask] = np.nan
+    return data_block
+
+@_memoized
+def get_timeseries_for_region(array_uri, start_date, end_date, y_min, y_max, x_min, x_max, mask=None, resolution="month",
+                              output="dict"):
     """
     Retrieves a spatial average (mean) time series for a bounding box region.
-    Coordinates y_min, y_max, x_min, x_max should be integer pixel indices.
+    Coordinates y_min, y_max, x_min, x_max should be integer pixel indices (stops exclusive).
+    mask: Optional boolean array of the window's shape (see region_masks); pixels
+          outside it are ignored, so circles and polygons are averaged exactly.
+    resolution: 'month' (default), 'day' or 'year'; selects the array via resolution_uri.
+    output: 'dict' ({label: value}, NaN dropped), 'array' ((datetime64 dates, float32 values))
+            or 'series' (pandas Series); see _timeseries_result.
+    Reads from the pixel-major companion array when it covers the requested range.
     """
-    with tiledb.DenseArray(array_uri, mode='r') as array:
-        time_mapping = json.loads(array.meta["time_mapping"])
-        # Sort months to find the indices
-        sorted_months = sorted(time_mapping.keys())
-        
-        # Determine start/end indices for time slicing
-        relevant_months = [m for m in sorted_months if (not start_date or m >= start_date) and (not end_date or m <= end_date)]
-        if not relevant_months:
-            return {}
-        
-        # Sort the relevant months to ensure correct mapping to the slice
-        relevant_months.sort()
-        
-        start_idx = time_mapping[relevant_months[0]]
-        end_idx = time_mapping[relevant_months[-1]]
-        
-        # Ensure pixel indices are within array bounds
-        h, w = array.meta["height"], array.meta["width"]
-        y_min = max(0, min(y_min, h - 1))
-        y_max = max(0, min(y_max, h - 1))
-        x_min = max(0, min(x_min, w - 1))
-        x_max = max(0, min(x_max, w - 1))
-
-        # TileDB slicing in Python follows NumPy conventions (stop index is exclusive)
-        data_block = array[start_idx:end_idx + 1, y_min:y_max, x_min:x_max]["value"]
-        
-        # Ensure float type for NaN support
-        data_block = data_block.astype(float)
-        
-        # Mask nodata/legacy values efficiently
-        nodata_val = array.meta.get("nodata")
-        if nodata_val is not None and not np.isnan(nodata_val):
-            data_block[data_block == nodata_val] = np.nan
+    array_uri = resolution_uri(array_uri, resolution)
+    meta = _get_entry(array_uri).meta
+    positions = _time_range_positions(meta, start_date, end_date)
+    relevant_months, indices = meta["time_labels"][positions], meta["time_indices"][positions]
+    dates = meta["time_dates"][positions]
+    if not relevant_months:
+        return _timeseries_result(dates, [], np.array([], dtype=np.float32), output)
+    
+    y_min, y_max, x_min, x_max = _clip_window(meta, y_min, y_max, x_min, x_max)
+    if _empty_window(y_min, y_max, x_min, x_max):
+        return _timeseries_result(dates[:0], [], np.array([], dtype=np.float32), output)
+
+    hot, hot_rows = _hot_rows(array_uri, indices)
+    if hot is not None:
+        # Fancy indexing copies the rows out of the memmap
+        data_block = hot[hot_rows, y_min:y_max, x_min:x_max]
+    else:
+        source_uri = _timeseries_source(array_uri, int(indices.max()))
+        with open_array(source_uri) as (array, _):
+            # One query for all months, even when their time indices are not contiguous
+            data_block = _read_runs(array, index_runs(indices), y_min, y_max, x_min, x_max)
+
+        # Fill values are NaN already for normalized arrays and the pixel-major companion
+        data_block = _with_nan_fill(data_block, meta, normalized=source_uri != array_uri)
+    _apply_region_mask(data_block, mask)
         
-        data_block[data_block == -9999.0] = np.nan
-        data_block[data_block < -1e30] = np.nan
-            
-        # Spatial aggregation (mean over y and x dims)
-        with np.errstate(all='ignore'):
-            # axis=(1, 2) averages across height and width
-            spatial_mean = np.nanmean(data_block, axis=(1, 2))
-            
-        # Construct the result dictionary
-        series = {}
-        for i, month in enumerate(relevant_months):
-            val = float(spatial_mean[i])
-            if not np.isnan(val):
-                series[month] = val
-                
-        return series
+    # Spatial aggregation (mean over y and x dims)
+    with np.errstate(all='ignore'):
+        # axis=(1, 2) averages across height and width
+        spatial_mean = np.nanmean(data_block, axis=(1, 2), dtype=np.float64)
+
+    return _timeseries_result(dates, relevant_months, spatial_mean, output)
+
+def _reduce_block(block, percentiles):
+    """
+    Per-time-step statistics for a (time, y, x) block with NaN for missing pixels,
+    plus the partial sums needed to combine chunks into overall statistics and, when
+    percentiles are requested, the block's valid values.
+    """
+    flat = block.reshape(block.shape[0], -1)
+    valid = ~np.isnan(flat)
+    count = valid.sum(axis=1)
+    filled = np.where(valid, flat, 0.0)
+    total = filled.sum(axis=1, dtype=np.float64)
+    total_sq = np.square(filled, dtype=np.float64).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(total_sq / count - mean ** 2, 0.0))
+
+    step = {
+        "mean": mean,
+        "min": np.fmin.reduce(flat, axis=1),
+        "max": np.fmax.reduce(flat, axis=1),
+        "std": std,
+        "count": count
+    }
+    if percentiles:
+        with warnings.catch_warnings():
+            # All-NaN steps (e.g. a window over the ocean) yield NaN percentiles
+            warnings.simplefilter("ignore", RuntimeWarning)
+            values = np.nanpercentile(flat, percentiles, axis=1)
+        for q, row in zip(percentiles, values):
+            step[f"p{q:g}"] = row
+    return step, total.sum(), total_sq.sum(), flat[valid] if percentiles else None
+
+def _histogram_bins(values):
+    """
+    Bins of a 65536-bin histogram for finite values: the float16 bit pattern of each value,
+    reordered so the bins sort like the numbers (under 0.05% relative rounding error).
+    """
+    bits = np.clip(values, -65504, 65504).astype(np.float16).view(np.uint16)
+    return np.where(bits & 0x8000, ~bits, bits | 0x8000)
+
+def _histogram_percentiles(histogram, percentiles):
+    """
+    np.percentile (linear interpolation) of the values counted in a _histogram_bins histogram.
+    """
+    cumulative = np.cumsum(histogram)
+    n = int(cumulative[-1])
+    result = {}
+    for q in percentiles:
+        if not n:
+            result[q] = np.nan
+            continue
+        rank = q / 100 * (n - 1)
+        # Bins holding the values of sorted positions floor(rank) and ceil(rank)
+        lo, hi = np.searchsorted(cumulative, [np.floor(rank) + 1, np.ceil(rank) + 1])
+        low, high = _HISTOGRAM_VALUES[lo], _HISTOGRAM_VALUES[hi]
+        result[q] = float(low + (rank - np.floor(rank)) * (high - low))
+    return result
+
+@_memoized(exclude=("chunk_months",))
+def get_region_statistics(array_uri, start_date, end_date, y_min, y_max, x_min, x_max,
+                          statistics=("mean", "min", "max", "std", "count"), percentiles=(10, 50, 90),
+                          chunk_months=REDUCE_CHUNK_MONTHS, mask=None, resolution="month"):
+    """
+    Computes summary statistics for a bounding box region in a single chunked pass.
+    Coordinates y_min, y_max, x_min, x_max should be integer pixel indices (stops exclusive).
+    mask: Optional boolean region mask of the window's shape (see region_masks).
+    statistics: any of 'mean', 'min', 'max', 'std', 'count' (valid-pixel count).
+    percentiles: percentiles to compute, reported as 'p10', 'p50', ... Overall percentiles
+                 are exact up to PERCENTILE_EXACT_CELLS cells (steps x window pixels); above
+                 that they come from a fixed 65536-bin histogram (float16 resolution), so
+                 memory stays bounded for statewide multi-decade requests.
+    chunk_months: Number of time steps read and reduced with NumPy per block.
+    Returns {"months": [...], "dates": datetime64 array, "per_step": {stat: array},
+    "overall": {stat: float}}, where "overall" covers every valid pixel of every month,
+    or None if no month is in range or the window is empty.
+    With resolution='day' or 'year' the steps are days or years instead of months.
+    """
+    array_uri = resolution_uri(array_uri, resolution)
+    meta = _get_entry(array_uri).meta
+    positions = _time_range_positions(meta, start_date, end_date)
+    relevant_months, indices = meta["time_labels"][positions], meta["time_indices"][positions]
+    if not relevant_months:
+        return None
+
+    y_min, y_max, x_min, x_max = _clip_window(meta, y_min, y_max, x_min, x_max)
+    if _empty_window(y_min, y_max, x_min, x_max):
+        return None
+    percentiles = tuple(percentiles or ())
+    wanted = list(statistics) + [f"p{q:g}" for q in percentiles]
+
+    steps = []
+    total = total_sq = 0.0
+    if percentiles and len(indices) * (y_max - y_min) * (x_max - x_min) <= PERCENTILE_EXACT_CELLS:
+        values, n_values = np.empty(len(indices) * (y_max - y_min) * (x_max - x_min), dtype=np.float32), 0
+        histogram = None
+    elif percentiles:
+        values, histogram = None, np.zeros(1 << 16, dtype=np.int64)
+    hot, hot_rows = _hot_rows(array_uri, indices)
+    source_uri = _timeseries_source(array_uri, int(indices.max()))
+    with open_array(source_uri) as (array, _):
+        if hot is not None:
+            blocks = (
+                hot[hot_rows[start:start + chunk_months], y_min:y_max, x_min:x_max]
+                for start in range(0, len(hot_rows), chunk_months)
+            )
+        else:
+            # Chunks never span a gap in the time indices, so each is one contiguous slice
+            chunks = [
+                (start, min(start + chunk_months, last + 1))
+                for first, last in index_runs(indices)
+                for start in range(first, last + 1, chunk_months)
+            ]
+            # TileDB slicing in Python follows NumPy conventions (stop index is exclusive)
+            blocks = (
+                _with_nan_fill(array[start:stop, y_min:y_max, x_min:x_max]["value"], meta, normalized=source_uri != array_uri)
+                for start, stop in chunks
+            )
+        for block in blocks:
+            block = _apply_region_mask(block, mask)
+            step, chunk_total, chunk_total_sq, chunk_values = _reduce_block(block, percentiles)
+            steps.append(step)
+            total += chunk_total
+            total_sq += chunk_total_sq
+            if percentiles and histogram is None:
+                values[n_values:n_values + chunk_values.size] = chunk_values
+                n_values += chunk_values.size
+            elif percentiles:
+                histogram += np.bincount(_histogram_bins(chunk_values), minlength=1 << 16)
+        steps = {stat: np.concatenate([step[stat] for step in steps]) for stat in steps[0]}
+
+    count = int(steps["count"].sum())
+    overall = {"count": count}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overall["mean"] = total / count if count else np.nan
+        if "std" in steps:
+            overall["std"] = float(np.sqrt(max(total_sq / count - overall["mean"] ** 2, 0.0))) if count else np.nan
+    overall["min"] = float(np.fmin.reduce(steps["min"])) if count else np.nan
+    overall["max"] = float(np.fmax.reduce(steps["max"])) if count else np.nan
+    if percentiles and histogram is None:
+        for q in percentiles:
+            overall[f"p{q:g}"] = float(np.percentile(values[:n_values], q)) if n_values else np.nan
+    elif percentiles:
+        for q, value in _histogram_percentiles(histogram, percentiles).items():
+            overall[f"p{q:g}"] = value
+
+    return {
+        "months": relevant_months,
+        "dates": meta["time_dates"][positions],
+        "per_step": {stat: steps[stat] for stat in wanted},
+        "overall": {stat: overall[stat] for stat in wanted}
+    }
+
+def get_timeseries_for_variables(array_uris, start_date, end_date, y_min, y_max, x_min, x_max, mask=None,
+                                 max_workers=MAX_FETCH_WORKERS, resolution="month", output="dict"):
+    """
+    Retrieves spatial-mean time series for several variables over one region and date range.
+    array_uris maps variable names to array URIs, e.g. {"temperature": ..., "rainfall": ...}.
+    mask: Optional boolean region mask applied to every variable (see region_masks).
+    The reads run concurrently on a thread pool, so the call takes roughly as long as the
+    slowest single read. With output='dict' returns {month: {variable: value}} for every
+    month present in any variable; 'array' returns (dates, {variable: float32 values}) on
+    the union of their datetime64 dates, and 'series' a pandas DataFrame with one column
+    per variable. NaN marks months where a variable has no data.
+    """
+    if output not in TIMESERIES_OUTPUTS:
+        raise ValueError(f"Unknown output '{output}', expected one of {TIMESERIES_OUTPUTS}.")
+    variables = list(array_uris)
+    region_output = "dict" if output == "dict" else "array"
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(variables)))) as executor:
+        futures = {
+            var: executor.submit(get_timeseries_for_region, array_uris[var], start_date, end_date, y_min, y_max, x_min, x_max,
+                                 mask, resolution, region_output)
+            for var in variables
+        }
+        results = {var: future.result() for var, future in futures.items()}
+
+    if output == "dict":
+        months = sorted(set().union(*(series.keys() for series in results.values())))
+        return {m: {var: results[var].get(m, np.nan) for var in variables} for m in months}
+
+    # Align every variable on the union of the stored dates
+    dates = np.unique(np.concatenate([d for d, _ in results.values()])) if variables else np.array([], dtype="datetime64[M]")
+    columns = {}
+    for var, (var_dates, values) in results.items():
+        column = np.full(len(dates), np.nan, dtype=np.float32)
+        column[np.searchsorted(dates, var_dates)] = values
+        columns[var] = column
+
+    if output == "array":
+        return dates, columns
+    return pd.DataFrame(columns, index=pd.DatetimeIndex(dates.astype("datetime64[ns]"), name="date"))
+
+def cumulative_uri(array_uri):
+    """
+    URI of the running-sum companion array for array_uri (built by tiledb_ingest).
+    """
+    return array_uri.rstrip("/\\") + CUMULATIVE_SUFFIX
 
-def get_raster_for_date_range(array_uri, start_date, end_date, aggregation='mean'):
+def _read_cumulative_range(array_uri, runs):
+    """
+    Returns (sum, count) grids over the time-index runs [(first, last), ...] from the
+    cumulative companion array, or None if the companion is missing or has not been
+    built that far. Each run costs at most two slices, all fetched in one query.
+    """
+    cum_uri = cumulative_uri(array_uri)
+    if not tiledb.array_exists(cum_uri, ctx=get_context()):
+        return None
+
+    with open_array(cum_uri) as (cum, cum_meta):
+        if cum_meta["raw"].get("built_through", -1) < max(last for _, last in runs):
+            return None
+
+        # Prefix differences: S[last] - S[first - 1] for every run
+        ends = sorted({last for _, last in runs} | {first - 1 for first, _ in runs if first > 0})
+        slices = cum.multi_index[ends, :, :]
+        position = {t: i for i, t in enumerate(ends)}
+
+    sum_buffer = np.zeros(slices["sum"].shape[1:], dtype=np.float64)
+    count_buffer = np.zeros(slices["count"].shape[1:], dtype=np.int32)
+    for first, last in runs:
+        sum_buffer += slices["sum"][position[last]]
+        count_buffer += slices["count"][position[last]]
+        if first > 0:
+            sum_buffer -= slices["sum"][position[first - 1]]
+            count_buffer -= slices["count"][position[first - 1]]
+    return sum_buffer, count_buffer
+
+def _read_slice(array_uri, meta, time_index):
+    with open_array(array_uri) as (array, _):
+        data = array[time_index, :, :]["value"]
+    # Masking (legacy arrays only) also runs on the worker thread
+    return _with_nan_fill(data, meta)
+
+def _iter_slices(array_uri, meta, time_indices, parallelism):
+    """
+    Yields the 2D slices for time_indices in order while worker threads read ahead.
+    At most 2 * parallelism slices are in flight, which bounds memory use.
+    """
+    if parallelism <= 1:
+        for i in time_indices:
+            yield _read_slice(array_uri, meta, i)
+        return
+
+    pending = deque()
+    indices = iter(time_indices)
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        for i in indices:
+            pending.append(executor.submit(_read_slice, array_uri, meta, i))
+            if len(pending) >= 2 * parallelism:
+                break
+        while pending:
+            data = pending.popleft().result()
+            next_index = next(indices, None)
+            if next_index is not None:
+                pending.append(executor.submit(_read_slice, array_uri, meta, next_index))
+            yield data
+
+def _aggregate_sum_count(sum_buffer, count_buffer, aggregation):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if aggregation == 'sum':
+            return sum_buffer
+        return np.divide(sum_buffer, count_buffer, out=np.full(sum_buffer.shape, np.nan), where=count_buffer > 0)
+
+@_memoized(exclude=("parallelism",))
+def _accumulate_range(array_uri, start_date, end_date, aggregation, parallelism=RASTER_READ_WORKERS, resolution="month"):
+    """
+    Aggregates a date range slice by slice. Only multi-slice ranges are cached: a range
+    answered from the running-sum companion costs two slice reads, about as much as
+    loading the spilled raster back from the disk cache.
+    """
+    array_uri = resolution_uri(array_uri, resolution)
+    meta = _get_entry(array_uri).meta
+    _, indices = resolve_time_range(meta, start_date, end_date)
+    h, w = meta["height"], meta["width"]
+
+    # Preallocated accumulators; every month is added in place without temporaries
+    sum_buffer = np.zeros((h, w), dtype=np.float64)
+    count_buffer = np.zeros((h, w), dtype=np.int32)
+    valid_mask = np.empty((h, w), dtype=bool)
+
+    hot, hot_rows = _hot_rows(array_uri, indices)
+    if hot is not None:
+        # Slices straight from the page cache, no decompression or read-ahead needed
+        slices = (hot[row] for row in hot_rows)
+    else:
+        slices = _iter_slices(array_uri, meta, [int(i) for i in indices], parallelism)
+
+    for month_data in slices:
+        np.isfinite(month_data, out=valid_mask)
+        np.add(sum_buffer, month_data, out=sum_buffer, where=valid_mask)
+        count_buffer += valid_mask
+    return _aggregate_sum_count(sum_buffer, count_buffer, aggregation)
+
+def get_raster_for_date_range(array_uri, start_date, end_date, aggregation='mean', use_cumulative=True,
+                              parallelism=RASTER_READ_WORKERS, resolution="month"):
     """
     Retrieves an aggregated 2D raster for a specific date range.
     aggregation: 'sum' (for rainfall) or 'mean' (for temperature/SPI)
+    use_cumulative: Answer from the running-sum companion array when it exists,
+                    which costs two slice reads regardless of the range length.
+    parallelism: Worker threads reading slices ahead of the accumulation (1 = serial).
+    resolution: 'month' (default), 'day' or 'year'; e.g. a daily range sums daily maps.
     """
-    with tiledb.DenseArray(array_uri, mode='r') as array:
-        time_mapping = json.loads(array.meta["time_mapping"])
-        sorted_months = sorted(time_mapping.keys())
-        relevant_months = [m for m in sorted_months if (not start_date or m >= start_date) and (not end_date or m <= end_date)]
-        
-        if not relevant_months:
-            return None, None
-        
-        relevant_months.sort()
-        start_idx = time_mapping[relevant_months[0]]
-        end_idx = time_mapping[relevant_months[-1]]
-        
-        # Fetch metadata and initialize buffers for incremental accumulation
-        h, w = array.meta["height"], array.meta["width"]
-        nodata_val = array.meta.get("nodata")
-        
-        # Process monthly to avoid giant memory allocations (e.g. for 72 months)
-        sum_buffer = np.zeros((h, w), dtype=np.float64)
-        count_buffer = np.zeros((h, w), dtype=np.int32)
-        
-        for i in range(start_idx, end_idx + 1):
-            # Read single 2D month slice
-            month_data = array[i, :, :]["value"].astype(np.float64)
-            
-            # Fast masking
-            if nodata_val is not None and not np.isnan(nodata_val):
-                month_data[month_data == nodata_val] = np.nan
-            month_data[month_data == -9999.0] = np.nan
-            month_data[month_data < -1e30] = np.nan
-            
-            # Identify valid pixels
-            valid_mask = ~np.isnan(month_data)
-            
-            # Accumulate
-            sum_buffer[valid_mask] += month_data[valid_mask]
-            count_buffer[valid_mask] += 1
+    base_uri = array_uri
+    array_uri = resolution_uri(array_uri, resolution)
+    meta = _get_entry(array_uri).meta
+    relevant_months, indices = resolve_time_range(meta, start_date, end_date)
+    if not relevant_months:
+        return None, None, None
+    
+    cumulative = _read_cumulative_range(array_uri, index_runs(indices)) if use_cumulative else None
+    if cumulative is not None:
+        aggregated = _aggregate_sum_count(*cumulative, aggregation)
+    elif len(indices) == 1:
+        # A single slice is cheaper to read again than to cache
+        aggregated = _accumulate_range.__wrapped__(base_uri, start_date, end_date, aggregation, parallelism, resolution)
+    else:
+        aggregated = _accumulate_range(base_uri, start_date, end_date, aggregation, parallelism, resolution)
             
-        # Perform final aggregation
-        with np.errstate(divide='ignore', invalid='ignore'):
-            if aggregation == 'sum':
-                aggregated = sum_buffer
+    # Get metadata for the mapper
+    map_meta = {
+        "transform": meta["transform"],
+        "crs": meta["crs"],
+        "width": meta["width"],
+        "height": meta["height"]
+    }
+    
+    # Calculate bounds for Folium (bottom-left, top-right)
+    # transform: [res_x, shear_x, x_min, shear_y, res_y, y_max]
+    t = map_meta["transform"]
+    x_min, y_max = t[2], t[5]
+    x_max = x_min + t[0] * map_meta["width"]
+    y_min = y_max + t[4] * map_meta["height"]
+    
+    folium_bounds = [[y_min, x_min], [y_max, x_max]]
+    
+    return aggregated, folium_bounds, map_meta
+
+def normals_uri(array_uri):
+    """
+    URI of the monthly normals sidecar of array_uri (built by tiledb_ingest).
+    """
+    return array_uri.rstrip("/\\") + NORMALS_SUFFIX
+
+def annual_uri(array_uri):
+    """
+    URI of the annual totals/means sidecar of array_uri (built by tiledb_ingest).
+    """
+    return array_uri.rstrip("/\\") + ANNUAL_SUFFIX
+
+def get_normal_periods(array_uri):
+    """
+    Reference periods with precomputed normals, as {'YYYY-YYYY': [years with data]}.
+    Empty if the normals sidecar has not been built.
+    """
+    n_uri = normals_uri(array_uri)
+    if not tiledb.array_exists(n_uri, ctx=get_context()):
+        return {}
+    with open_array(n_uri) as (_, meta):
+        periods = json.loads(meta["raw"].get("periods", "{}"))
+    return {period: info["years"] for period, info in periods.items()}
+
+_normals_cache = OrderedDict()
+_normals_cache_lock = threading.Lock()
+
+def _cached_normals(array_uri, period=None):
+    """
+    Returns (period, normals) with the full-grid (12, H, W) normals of a reference period,
+    read once per version of the normals sidecar and shared read-only between queries.
+    period defaults to DEFAULT_NORMALS_PERIOD, or the most recent period when that one is not built.
+    """
+    n_uri = normals_uri(array_uri)
+    if not tiledb.array_exists(n_uri, ctx=get_context()):
+        raise ValueError(f"No normals sidecar for {array_uri}; build it with tiledb_ingest.py --build_normals.")
+
+    entry = _get_entry(n_uri)
+    periods = json.loads(entry.meta["raw"].get("periods", "{}"))
+    if period is None:
+        # Most recent period: latest end year, then latest start year
+        period = DEFAULT_NORMALS_PERIOD if DEFAULT_NORMALS_PERIOD in periods else max(periods, key=lambda p: p.split("-")[::-1], default=None)
+    if period not in periods:
+        raise ValueError(f"Normals for period {period} not found. Available: {', '.join(sorted(periods)) or 'none'}.")
+
+    key = (entry.array_uri, entry.version, period)
+    with _normals_cache_lock:
+        if key in _normals_cache:
+            _normals_cache.move_to_end(key)
+            return period, _normals_cache[key]
+
+    with open_array(n_uri) as (array, _):
+        normals = array[periods[period]["index"], :, :, :]["value"]
+    normals.flags.writeable = False
+    with _normals_cache_lock:
+        _normals_cache[key] = normals
+        while len(_normals_cache) > NORMALS_CACHE_SIZE:
+            _normals_cache.popitem(last=False)
+    return period, normals
+
+def get_normals(array_uri, period=None, y_min=None, y_max=None, x_min=None, x_max=None, mask=None):
+    """
+    Per-pixel monthly normals for a reference period ('YYYY-YYYY'; defaults to
+    DEFAULT_NORMALS_PERIOD, or the most recent period when that one is not built).
+    The window (stop indices exclusive) defaults to the whole grid; pixels outside an
+    optional boolean region mask are NaN. Returns a float32 array of shape (12, h, w)
+    with January at index 0.
+    """
+    _, normals = _cached_normals(array_uri, period)
+    h, w = normals.shape[1:]
+    y_min, y_max, x_min, x_max = _clip_window(
+        {"height": h, "width": w},
+        0 if y_min is None else y_min, h if y_max is None else y_max,
+        0 if x_min is None else x_min, w if x_max is None else x_max
+    )
+    return _apply_region_mask(normals[:, y_min:y_max, x_min:x_max].copy(), mask)
+
+def get_region_normals(array_uri, period, y_min, y_max, x_min, x_max, mask=None):
+    """
+    Spatial-mean monthly normals over a region: a float64 array of 12 values
+    (January first), NaN for months without data. See get_normals.
+    """
+    normals = get_normals(array_uri, period, y_min, y_max, x_min, x_max, mask)
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(normals, axis=(1, 2), dtype=np.float64)
+
+def get_annual_summary(array_uri, start_year, end_year, y_min, y_max, x_min, x_max, mask=None):
+    """
+    Regional annual totals and means from the annual sidecar for the years
+    start_year..end_year (inclusive). Returns {'YYYY': {"total": float, "mean": float,
+    "slices": int}}, where total and mean are spatial means of the per-pixel annual
+    total / mean and slices is the number of stored months behind them.
+    """
+    a_uri = annual_uri(array_uri)
+    if not tiledb.array_exists(a_uri, ctx=get_context()):
+        raise ValueError(f"No annual sidecar for {array_uri}; build it with tiledb_ingest.py --build_normals.")
+
+    with open_array(a_uri) as (array, meta):
+        years, indices = resolve_time_range(meta, str(start_year), str(end_year))
+        if not years:
+            return {}
+        y_min, y_max, x_min, x_max = _clip_window(meta, y_min, y_max, x_min, x_max)
+        if _empty_window(y_min, y_max, x_min, x_max):
+            return {}
+        block = _read_runs_attrs(array, index_runs(indices), y_min, y_max, x_min, x_max)
+
+    summary = {}
+    for i, year in enumerate(years):
+        total = _apply_region_mask(block["total"][i:i + 1], mask)
+        mean = _apply_region_mask(block["mean"][i:i + 1], mask)
+        count = block["count"][i]
+        if not np.isfinite(total).any():
+            continue
+        summary[year] = {
+            "total": float(np.nanmean(total, dtype=np.float64)),
+            "mean": float(np.nanmean(mean, dtype=np.float64)),
+            "slices": int(count[mask].max() if mask is not None else count.max())
+        }
+    return summary
+
+def _expected_from_normals(normals, labels, aggregation):
+    """
+    Normal value of a date range per pixel: the normals of the calendar months in the
+    range, summed ('sum') or averaged ('mean'). normals is (12, h, w); labels 'YYYY-MM'.
+    """
+    calendar_months = np.array(labels, dtype="datetime64[M]").astype(np.int64) % 12
+    weights = np.bincount(calendar_months, minlength=12).astype(np.float64)
+    used = weights > 0
+    # Only months in the range contribute, so NaN normals of other months do not leak in
+    expected = np.tensordot(weights[used], normals[used], axes=1)
+    return expected if aggregation == 'sum' else expected / len(labels)
+
+def _observed_window(array_uri, meta, indices, y_min, y_max, x_min, x_max, aggregation):
+    """
+    Per-pixel observed value of a date range over a window: the sum ('sum', NaN unless
+    every month is present) or mean ('mean') of the stored months, read in bounded blocks.
+    """
+    runs = index_runs(indices)
+    full_grid = (y_min, y_max, x_min, x_max) == (0, meta["height"], 0, meta["width"])
+    cumulative = _read_cumulative_range(array_uri, runs) if full_grid else None
+    if cumulative is not None:
+        total, count = cumulative
+    else:
+        total = np.zeros((y_max - y_min, x_max - x_min), dtype=np.float64)
+        count = np.zeros((y_max - y_min, x_max - x_min), dtype=np.int32)
+        months_per_block = max(1, MAX_ANOMALY_BLOCK_CELLS // max(1, total.size))
+        hot, hot_rows = _hot_rows(array_uri, indices)
+        with open_array(array_uri) as (array, _):
+            if hot is not None:
+                blocks = (
+                    hot[hot_rows[start:start + months_per_block], y_min:y_max, x_min:x_max]
+                    for start in range(0, len(hot_rows), months_per_block)
+                )
             else:
-                aggregated = np.where(count_buffer > 0, sum_buffer / count_buffer, np.nan)
-                
-        # Get metadata for the mapper
-        meta = {
-            "transform": json.loads(array.meta["transform"]),
-            "crs": array.meta["crs"],
-            "width": array.meta["width"],
-            "height": array.meta["height"]
+                blocks = (
+                    _with_nan_fill(array[start:min(start + months_per_block, last + 1), y_min:y_max, x_min:x_max]["value"], meta)
+                    for first, last in runs
+                    for start in range(first, last + 1, months_per_block)
+                )
+            for block in blocks:
+                valid = ~np.isnan(block)
+                total += np.where(valid, block, 0.0).sum(axis=0, dtype=np.float64)
+                count += valid.sum(axis=0, dtype=np.int32)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if aggregation == 'sum':
+            return np.where(count == len(indices), total, np.nan)
+        return np.where(count > 0, total / count, np.nan)
+
+def _anomaly_fields(observed, normal):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            "observed": observed,
+            "normal": normal,
+            "anomaly": observed - normal,
+            "percent_of_normal": np.where(normal != 0, 100.0 * observed / normal, np.nan)
         }
-        
-        # Calculate bounds for Folium (bottom-left, top-right)
-        # transform: [res_x, shear_x, x_min, shear_y, res_y, y_max]
-        t = meta["transform"]
-        x_min, y_max = t[2], t[5]
-        x_max = x_min + t[0] * meta["width"]
-        y_min = y_max + t[4] * meta["height"]
-        
-        folium_bounds = [[y_min, x_min], [y_max, x_max]]
-        
-        return aggregated, folium_bounds, meta
+
+def get_anomaly_raster(array_uri, start_date, end_date=None, aggregation='mean', period=None, kind='anomaly'):
+    """
+    Anomaly map of a month or date range against the stored per-pixel normals.
+    aggregation: 'sum' (rainfall totals) or 'mean' (temperature).
+    period: Reference period of the normals ('YYYY-YYYY', see get_normals).
+    kind: 'anomaly' (observed - normal) or 'percent' (observed as % of normal).
+    Returns (raster, folium_bounds, map_meta) like get_raster_for_date_range, or (None, None, None).
+    """
+    meta = _get_entry(array_uri).meta
+    labels, indices = resolve_time_range(meta, start_date, end_date or start_date)
+    if not labels:
+        return None, None, None
+
+    _, normals = _cached_normals(array_uri, period)
+    h, w = meta["height"], meta["width"]
+    observed = _observed_window(array_uri, meta, indices, 0, h, 0, w, aggregation)
+    fields = _anomaly_fields(observed, _expected_from_normals(normals, labels, aggregation))
+
+    t = meta["transform"]
+    x_min, y_max = t[2], t[5]
+    folium_bounds = [[y_max + t[4] * h, x_min], [y_max, x_min + t[0] * w]]
+    map_meta = {"transform": t, "crs": meta["crs"], "width": w, "height": h}
+    return fields["percent_of_normal" if kind == 'percent' else "anomaly"], folium_bounds, map_meta
+
+def get_point_anomalies(array_uri, lats, lons, start_date, end_date=None, aggregation='mean', period=None):
+    """
+    Observed value, normal, anomaly and percent of normal at one or more points for a
+    month or date range. All months of all points are read with one point query.
+    Returns {"observed", "normal", "anomaly", "percent_of_normal", "months", "period"},
+    with float64 arrays (one value per point, NaN outside the grid or without data).
+    """
+    lats, lons = np.broadcast_arrays(np.atleast_1d(lats), np.atleast_1d(lons))
+    meta = _get_entry(array_uri).meta
+    labels, _ = resolve_time_range(meta, start_date, end_date or start_date)
+    if not labels:
+        raise ValueError(f"No data between {start_date} and {end_date or start_date}.")
+
+    period, normals = _cached_normals(array_uri, period)
+    values = get_point_values(array_uri, np.repeat(lats, len(labels)), np.repeat(lons, len(labels)),
+                              np.tile(labels, len(lats))).reshape(len(lats), len(labels))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if aggregation == 'sum':
+            observed = values.sum(axis=1)
+        else:
+            observed = np.nanmean(values, axis=1)
+
+    rows, cols = latlon_to_pixel(meta, lats, lons)
+    inside = (rows >= 0) & (rows < meta["height"]) & (cols >= 0) & (cols < meta["width"])
+    normal = np.full(len(lats), np.nan)
+    point_normals = normals[:, rows[inside], cols[inside]]
+    normal[inside] = _expected_from_normals(point_normals, labels, aggregation)
+
+    fields = _anomaly_fields(observed, normal)
+    fields.update(months=labels, period=period)
+    return fields
+
+def get_region_anomaly(array_uri, start_date, end_date, y_min, y_max, x_min, x_max, mask=None, aggregation='mean', period=None):
+    """
+    Regional observed value, normal, anomaly and percent of normal for a month or date
+    range. Coordinates are pixel indices (stops exclusive); mask is an optional boolean
+    region mask (see region_masks). Both sides are spatial means over the same pixels.
+    Returns {"observed", "normal", "anomaly", "percent_of_normal", "months", "period"}
+    with float values, or None if no month is in range or the window is empty.
+    """
+    meta = _get_entry(array_uri).meta
+    labels, indices = resolve_time_range(meta, start_date, end_date or start_date)
+    if not labels:
+        return None
+
+    y_min, y_max, x_min, x_max = _clip_window(meta, y_min, y_max, x_min, x_max)
+    if _empty_window(y_min, y_max, x_min, x_max):
+        return None
+    period, normals = _cached_normals(array_uri, period)
+    observed = _observed_window(array_uri, meta, indices, y_min, y_max, x_min, x_max, aggregation)
+    normal = _expected_from_normals(normals[:, y_min:y_max, x_min:x_max], labels, aggregation)
+
+    # Compare like with like: only pixels inside the region with both values
+    paired = ~np.isnan(observed) & ~np.isnan(normal)
+    if mask is not None:
+        paired &= mask
+    if not paired.any():
+        observed_mean = normal_mean = np.nan
+    else:
+        observed_mean = float(observed[paired].mean())
+        normal_mean = float(normal[paired].mean())
+
+    fields = {k: float(v) for k, v in _anomaly_fields(np.float64(observed_mean), np.float64(normal_mean)).items()}
+    fields.update(months=labels, period=period)
+    return fields
+
+def resolve_calendar(meta, months=None, season=None, years=None, start_date=None, end_date=None):
+    """
+    Stored dates matching a calendar filter: months of the year (1-12, in season order,
+    e.g. [11, 12, 1] crosses the new year), or a named season from SEASONS, restricted
+    to the given (season) years and the optional start_date..end_date range.
+    Returns (labels, indices, group_years, months): the matching dates in chronological
+    order, their time indices, the season year of each date and the months filtered on.
+    """
+    if season is not None:
+        if season not in SEASONS:
+            raise ValueError(f"Unknown season '{season}', expected one of {', '.join(SEASONS)}.")
+        months = SEASONS[season]
+    months = tuple(int(m) for m in (months or range(1, 13)))
+    if not months or min(months) < 1 or max(months) > 12:
+        raise ValueError("Months must be between 1 and 12.")
+
+    positions = _time_range_positions(meta, start_date, end_date)
+    dates = meta["time_dates"][positions].astype("datetime64[M]")
+    calendar_month = dates.astype(np.int64) % 12 + 1
+    group_years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    if months[0] > months[-1]:
+        # Months from the first one on belong to the season ending next year
+        group_years = group_years + (calendar_month >= months[0])
+
+    keep = np.isin(calendar_month, months)
+    if years is not None:
+        keep &= np.isin(group_years, [int(y) for y in years])
+    labels = np.asarray(meta["time_labels"][positions], dtype=object)[keep].tolist()
+    return labels, meta["time_indices"][positions][keep], group_years[keep], months
+
+def _expected_slices(group_year, months, day_resolution):
+    """
+    Slices a complete season year holds: one per month, or every day of each month.
+    """
+    if not day_resolution:
+        return len(months)
+    total = 0
+    for m in months:
+        year = group_year - 1 if months[0] > months[-1] and m >= months[0] else group_year
+        month = np.datetime64(f"{year:04d}-{m:02d}")
+        total += int(((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64))
+    return total
+
+@_memoized
+def get_calendar_aggregate(array_uri, months=None, season=None, years=None, start_date=None, end_date=None,
+                           aggregation='mean', y_min=None, y_max=None, x_min=None, x_max=None, mask=None,
+                           resolution="month"):
+    """
+    Aggregates only the time slices matching a calendar filter (see resolve_calendar), e.g.
+    January since 1990 (months=[1], start_date='1990') or wet-season totals (season='wet').
+    aggregation: 'mean' averages every matching slice per pixel; 'sum' totals each season
+                 year and averages those totals (incomplete season years are left out).
+    The window (stop indices exclusive) defaults to the whole grid; mask is an optional
+    boolean region mask of the window's shape. The matching slices are fetched with one
+    multi-range query per block of rows and reduced block by block.
+    Returns {"raster": (h, w) float64, "value": spatial mean of the raster,
+    "per_year": {season year: spatial mean}, "dates": [...], "months": (...)}, or None
+    when no stored date matches or the window is empty.
+    """
+    if aggregation not in ('mean', 'sum'):
+        raise ValueError(f"Unknown aggregation '{aggregation}', expected 'mean' or 'sum'.")
+    array_uri = resolution_uri(array_uri, resolution)
+    meta = _get_entry(array_uri).meta
+    labels, indices, group_years, months = resolve_calendar(meta, months, season, years, start_date, end_date)
+    if not labels:
+        return None
+
+    h, w = meta["height"], meta["width"]
+    y_min, y_max, x_min, x_max = _clip_window(
+        meta, 0 if y_min is None else y_min, h if y_max is None else y_max,
+        0 if x_min is None else x_min, w if x_max is None else x_max
+    )
+    if _empty_window(y_min, y_max, x_min, x_max):
+        return None
+
+    # Season years are contiguous in chronological order, so each is one reduceat segment
+    uniq_years, starts, slices_per_year = np.unique(group_years, return_index=True, return_counts=True)
+    if aggregation == 'sum':
+        expected = np.array([_expected_slices(int(y), months, resolution == "day") for y in uniq_years])
+        complete = slices_per_year == expected
+    else:
+        complete = np.ones(len(uniq_years), dtype=bool)
+
+    raster = np.full((y_max - y_min, x_max - x_min), np.nan)
+    year_sum = np.zeros(len(uniq_years))
+    year_count = np.zeros(len(uniq_years), dtype=np.int64)
+    rows_per_block = max(1, min(raster.shape[0], MAX_CALENDAR_BLOCK_CELLS // max(1, len(indices) * raster.shape[1])))
+    runs = index_runs(indices)
+    hot, hot_rows = _hot_rows(array_uri, indices)
+
+    with open_array(array_uri) as (array, _):
+        for r0 in range(y_min, y_max, rows_per_block):
+            r1 = min(r0 + rows_per_block, y_max)
+            if hot is not None:
+                block = hot[hot_rows, r0:r1, x_min:x_max]
+            else:
+                # Every matching slice of these rows in a single (multi-range) query
+                block = _with_nan_fill(_read_runs(array, runs, r0, r1, x_min, x_max), meta)
+            valid = ~np.isnan(block)
+            group_sum = np.add.reduceat(np.where(valid, block, 0.0), starts, axis=0, dtype=np.float64)
+            group_count = np.add.reduceat(valid, starts, axis=0, dtype=np.int32)
+            del block, valid
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                if aggregation == 'sum':
+                    # A season total needs every slice of that season at the pixel
+                    whole = (group_count == slices_per_year[:, None, None]) & complete[:, None, None]
+                    group_value = np.where(whole, group_sum, np.nan)
+                    n_groups = whole.sum(axis=0)
+                    block_raster = np.where(n_groups > 0, np.where(whole, group_sum, 0.0).sum(axis=0) / n_groups, np.nan)
+                else:
+                    group_value = np.where(group_count > 0, group_sum / group_count, np.nan)
+                    total_count = group_count.sum(axis=0)
+                    block_raster = np.where(total_count > 0, group_sum.sum(axis=0) / total_count, np.nan)
+
+            if mask is not None:
+                block_mask = mask[r0 - y_min:r1 - y_min]
+                block_raster[~block_mask] = np.nan
+                group_value[:, ~block_mask] = np.nan
+            raster[r0 - y_min:r1 - y_min] = block_raster
+            # Per-year spatial means are accumulated block by block
+            group_valid = ~np.isnan(group_value)
+            year_sum += np.where(group_valid, group_value, 0.0).sum(axis=(1, 2))
+            year_count += group_valid.sum(axis=(1, 2))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_year = year_sum / year_count
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        value = float(np.nanmean(raster)) if raster.size else np.nan
+    return {
+        "raster": raster,
+        "value": value,
+        "per_year": {int(y): float(v) for y, v in zip(uniq_years, per_year) if not np.isnan(v)},
+        "dates": labels,
+        "months": months
+    }
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Query a TileDB Array containing Monthly Rasters")
     parser.add_argument("--array_uri", required=True, help="Path/URI for the TileDB array")
-    parser.add_argument("--month", help="Month to query (e.g., '2022-01')")
+    parser.add_argument("--month", help="Month to query (e.g., '2022-01', or '2022-01-15' with --resolution day)")
+    parser.add_argument("--resolution", default="month", choices=sorted(RESOLUTION_SUFFIXES),
+                        help="Time resolution of the array to query")
     args = parser.parse_args()
     
     if args.month:
         try:
-            data = get_data_for_month(args.array_uri, args.month)
+            data = get_data_for_month(args.array_uri, args.month, resolution=args.resolution)
             print(f"Extracted shape for {args.month}: {data.shape}")
             print(f"Min Data Value: {np.nanmin(data)}")
             print(f"Max Data Value: {np.nanmax(data)}")
         except Exception as e:
             print(f"Error querying data: {e}")
     else:
-        meta = get_metadata(args.array_uri)
+        meta = get_metadata(args.array_uri, resolution=args.resolution)
         print(f"--- TileDB Array Metadata ---")
         print(f"Shape: (time: {len(meta['time_mapping'])}, y: {meta['height']}, x: {meta['width']})")
         print(f"CRS: {meta['crs']}")
@@ -1,11 +1,94 @@
 import os
 import glob
+import hashlib
 import json
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import shared_memory
 import rasterio
+from rasterio.errors import RasterioIOError
+from rasterio.io import MemoryFile
 import tiledb
 import numpy as np
 
-def create_array_if_not_exists(array_uri, template_tiff):
+try:
+    from database.tiledb_access import (cumulative_uri, timeseries_uri, resolution_uri, normals_uri, annual_uri,
+                                        index_runs, build_time_index, mask_fill_values, write_time_index,
+                                        open_array, array_version, resolve_time_range, hot_window_dir,
+                                        RESOLUTION_SUFFIXES, HOT_WINDOW_INDEX)
+except ImportError:
+    # Running as a script from inside database/
+    from tiledb_access import (cumulative_uri, timeseries_uri, resolution_uri, normals_uri, annual_uri,
+                               index_runs, build_time_index, mask_fill_values, write_time_index,
+                               open_array, array_version, resolve_time_range, hot_window_dir,
+                               RESOLUTION_SUFFIXES, HOT_WINDOW_INDEX)
+
+try:
+    from database.optimize_storage import consolidate_if_needed, CONSOLIDATE_FRAGMENT_THRESHOLD
+except ImportError:
+    # Running as a script from inside database/
+    from optimize_storage import consolidate_if_needed, CONSOLIDATE_FRAGMENT_THRESHOLD
+
+# Spatial tile extents for new arrays. Small windows (e.g. a 5 km radius) only
+# decompress the tiles they overlap instead of the whole statewide grid.
+SPATIAL_TILE_Y = 256
+SPATIAL_TILE_X = 256
+
+# TIFFs decoded and written per fragment by ingest_tiffs. Memory use is one batch of
+# rasters (12 statewide months is roughly 170 MB) however many files are ingested.
+INGEST_BATCH_SIZE = 12
+
+# Worker processes decoding GeoTIFFs during ingest (1 decodes on the writer thread)
+DECODE_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Time slices processed per write when building companion arrays
+COMPANION_BATCH_SIZE = 12
+
+# Tile shape of the pixel-major (time-series) companion: each tile holds a small
+# spatial block across many months, so a point history touches one or two tiles.
+TIMESERIES_TIME_TILE = 256
+TIMESERIES_SPATIAL_TILE = 16
+TIMESERIES_BATCH_SIZE = 48
+
+# Upper bound of the time dimension per resolution. Daily arrays need room for
+# decades of days; existing monthly arrays keep their original domain.
+TIME_DOMAIN_MAX = {"day": 100000, "month": 10000, "year": 1000}
+
+# Date key length expected in TIFF file names for each resolution
+DATE_KEY_LENGTH = {"day": 10, "month": 7, "year": 4}
+
+# Grid rows reduced per query when rolling daily maps up (rounded up to whole tiles).
+# A month of days over a 512-row stripe of the statewide grid is roughly 140 MB.
+ROLLUP_STRIPE_ROWS = 512
+
+# Reference periods materialized by update_normals_array, in addition to the trailing
+# RECENT_NORMAL_YEARS ending at the latest stored year (the climatogram default).
+STANDARD_NORMAL_PERIODS = ("1991-2020",)
+RECENT_NORMAL_YEARS = 10
+
+# Array metadata key of the ingest manifest: source path, size, mtime and content hash
+# of the TIFF behind every stored date
+MANIFEST_KEY = "ingest_manifest"
+
+# Bytes read at a time when hashing source TIFFs
+HASH_CHUNK_BYTES = 1 << 20
+
+# Categories of the diff ingest_tiffs reports against the manifest:
+# new: not stored yet; changed: content differs, the slice is overwritten in place;
+# touched: size/mtime differ but the content is the same (only the manifest is updated);
+# untracked: stored before the manifest existed, hashed and recorded as-is;
+# unchanged: same size and mtime, not hashed; absent: in the manifest but not in input_dir
+INGEST_DIFF_KEYS = ("new", "changed", "touched", "untracked", "unchanged", "absent")
+
+# Diff categories of ingest_downloads: stored dates are not downloaded again unless
+# refresh is set, and failed dates could not be downloaded (e.g. not published yet)
+DOWNLOAD_DIFF_KEYS = ("new", "changed", "untracked", "unchanged", "stored", "failed")
+
+# Concurrent HTTP downloads in ingest_downloads
+DOWNLOAD_WORKERS = 8
+
+def create_array_if_not_exists(array_uri, template_tiff, tile_y=SPATIAL_TILE_Y, tile_x=SPATIAL_TILE_X, resolution="month"):
     if tiledb.array_exists(array_uri):
         return True
 
@@ -17,12 +100,16 @@ def create_array_if_not_exists(array_uri, template_tiff):
         crs_wkt = src.crs.to_wkt()
         nodata = src.nodata if src.nodata is not None else np.nan
 
+    _create_grid_array(array_uri, height, width, transform[:6], crs_wkt, nodata, tile_y, tile_x, resolution)
+    return True
+
+def _create_grid_array(array_uri, height, width, transform, crs_wkt, nodata, tile_y, tile_x, resolution):
     # Dimensions: time_index, y (lat), x (lon)
     # Using a dense array since grid data is continuous
     dom = tiledb.Domain(
-        tiledb.Dim(name="time_index", domain=(0, 10000), tile=1, dtype=np.int32),
-        tiledb.Dim(name="y", domain=(0, height - 1), tile=height, dtype=np.int32),
-        tiledb.Dim(name="x", domain=(0, width - 1), tile=width, dtype=np.int32)
+        tiledb.Dim(name="time_index", domain=(0, TIME_DOMAIN_MAX[resolution]), tile=1, dtype=np.int32),
+        tiledb.Dim(name="y", domain=(0, height - 1), tile=min(tile_y, height), dtype=np.int32),
+        tiledb.Dim(name="x", domain=(0, width - 1), tile=min(tile_x, width), dtype=np.int32)
     )
 
     schema = tiledb.ArraySchema(
@@ -37,78 +124,1070 @@ def create_array_if_not_exists(array_uri, template_tiff):
     # Store spatial metadata as array metadata for later reprojection/mapping
     with tiledb.DenseArray(array_uri, mode='w') as array:
         # Save Affine transform matrix as list [a,b,c,d,e,f]
-        array.meta["transform"] = json.dumps(transform[:6]) 
+        array.meta["transform"] = json.dumps(list(transform[:6]))
         array.meta["crs"] = crs_wkt
         array.meta["nodata"] = float(nodata)
+        # Fill values are written as NaN (see read_tiff_as_float32), so readers skip masking
+        array.meta["nodata_normalized"] = 1
         array.meta["width"] = width
         array.meta["height"] = height
+        array.meta["resolution"] = resolution
         
-        # time mapping maps String Date "YYYY-MM" to integer time_index
+        # time mapping maps String Date "YYYY-MM" (or "YYYY-MM-DD" / "YYYY") to integer time_index
         array.meta["time_mapping"] = json.dumps({}) 
         array.meta["next_time_index"] = 0
 
-    return True
+def create_array_like(src_uri, array_uri, resolution="month"):
+    """
+    Creates array_uri on the same grid, tiling and spatial metadata as src_uri.
+    """
+    if tiledb.array_exists(array_uri):
+        return
+    print(f"Creating new TileDB array at {array_uri} based on {src_uri}...")
+    with tiledb.DenseArray(src_uri, mode='r') as src:
+        domain = src.schema.domain
+        _create_grid_array(
+            array_uri, int(src.meta["height"]), int(src.meta["width"]), json.loads(src.meta["transform"]),
+            src.meta["crs"], src.meta["nodata"], domain.dim("y").tile, domain.dim("x").tile, resolution
+        )
+
+def read_tiff_as_float32(tiff_path):
+    """
+    Reads band 1 of a GeoTIFF as float32 with its nodata value and the legacy fill
+    values (-9999, < -1e30) normalized to NaN, so nothing has to be masked at read time.
+    """
+    with rasterio.open(tiff_path) as src:
+        return mask_fill_values(src.read(1).astype(np.float32), src.nodata)
+
+def read_tiff_bytes_as_float32(data):
+    """
+    read_tiff_as_float32 for a GeoTIFF held in memory (e.g. an HTTP response body),
+    decoded through a rasterio MemoryFile without touching the disk.
+    """
+    with MemoryFile(data) as memfile, memfile.open() as src:
+        return mask_fill_values(src.read(1).astype(np.float32), src.nodata)
+
+def _decode_into_shared(shm_name, shape, slot, tiff_path):
+    """
+    Decode worker: reads one TIFF into row `slot` of a (batch, y, x) float32 buffer in
+    shared memory, so the raster is never pickled back to the writer.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffer = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        buffer[slot] = read_tiff_as_float32(tiff_path)
+        del buffer
+    finally:
+        shm.close()
+
+def _decode_batches(paths, batch_size, height, width, write_batch, executor=None):
+    """
+    Decodes paths in chronological batches and calls write_batch(start, data) for each
+    one, in order, with data a (n, y, x) float32 view that is only valid during the call.
+    With a process pool the next batch is decoded into a second shared buffer while the
+    current one is written.
+    """
+    shape = (min(batch_size, len(paths)), height, width)
+    starts = list(range(0, len(paths), batch_size))
+    if executor is None:
+        buffer = np.empty(shape, dtype=np.float32)
+        for start in starts:
+            batch = paths[start:start + batch_size]
+            for i, tiff_path in enumerate(batch):
+                buffer[i] = read_tiff_as_float32(tiff_path)
+            write_batch(start, buffer[:len(batch)])
+        return
+
+    nbytes = int(np.prod(shape)) * np.dtype(np.float32).itemsize
+    shms = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(2)]
+    pending = []
+    try:
+        def submit(k):
+            return [
+                executor.submit(_decode_into_shared, shms[k % 2].name, shape, i, tiff_path)
+                for i, tiff_path in enumerate(paths[starts[k]:starts[k] + batch_size])
+            ]
+
+        pending = submit(0)
+        for k, start in enumerate(starts):
+            for future in pending:
+                future.result()
+            pending = submit(k + 1) if k + 1 < len(starts) else []
+            buffer = np.ndarray(shape, dtype=np.float32, buffer=shms[k % 2].buf)
+            write_batch(start, buffer[:len(paths[start:start + batch_size])])
+            del buffer
+    finally:
+        # Workers may still be filling the other buffer after an error
+        wait(pending)
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+def _decode_pool(workers):
+    # Spawned rather than forked: the writer process holds TileDB contexts
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def file_digest(path):
+    """
+    blake2b content hash of a file, read in HASH_CHUNK_BYTES chunks.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_manifest(array_uri):
+    """
+    Ingest manifest of array_uri: {date: {"path", "size", "mtime_ns", "hash"}} for every
+    date ingested from a TIFF since manifests were introduced.
+    """
+    with tiledb.DenseArray(array_uri, mode='r') as array:
+        return json.loads(array.meta.get(MANIFEST_KEY, "{}"))
+
+def _slice_matches(array, t, data):
+    """
+    Whether slice t of an open array holds the same values as data (NaN counting as equal).
+    """
+    stored = array[t, :, :]["value"]
+    if not array.meta.get("nodata_normalized", 0):
+        stored = mask_fill_values(stored, array.meta.get("nodata"))
+    return np.array_equal(stored, data, equal_nan=True)
+
+def _matches_stored(array_uri, t, data):
+    with tiledb.DenseArray(array_uri, mode='r') as array:
+        return _slice_matches(array, t, data)
+
+def diff_manifest(sources, time_mapping, manifest):
+    """
+    Compares the TIFFs of sources ({date: path}) with the stored dates and manifest of an
+    array. Only files whose size or mtime differs from their manifest entry (or that have
+    none) are hashed. Stored dates without an entry are reported as untracked; ingest_tiffs
+    compares those with the stored slices. Returns the diff, a dict of sorted date lists keyed by
+    INGEST_DIFF_KEYS, and the manifest entries to record for every hashed date.
+    """
+    diff = {key: [] for key in INGEST_DIFF_KEYS}
+    entries = {}
+    for date_str in sorted(sources):
+        path = sources[date_str]
+        stat = os.stat(path)
+        known = manifest.get(date_str)
+        if (date_str in time_mapping and known is not None
+                and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns):
+            diff["unchanged"].append(date_str)
+            continue
+
+        entry = {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                 "hash": file_digest(path)}
+        entries[date_str] = entry
+        if date_str not in time_mapping:
+            diff["new"].append(date_str)
+        elif known is None:
+            diff["untracked"].append(date_str)
+        elif known["hash"] != entry["hash"]:
+            diff["changed"].append(date_str)
+        else:
+            diff["touched"].append(date_str)
+    diff["absent"] = sorted(set(manifest) - set(sources))
+    return diff, entries
+
+def _print_diff(array_uri, diff, limit=12):
+    print(f"Ingest diff for {array_uri}: " + ", ".join(f"{len(dates)} {key}" for key, dates in diff.items()))
+    for key in ("new", "changed"):
+        dates = diff[key]
+        if dates:
+            more = f", ... ({len(dates)} in total)" if len(dates) > limit else ""
+            print(f"  {key}: {', '.join(dates[:limit])}{more}")
+
+def _write_slices(array_uri, dates, targets, data, time_mapping, manifest, entries, next_time_index, rows=None):
+    """
+    Writes data[rows[i]] to time_index targets[i] (ascending) as contiguous runs and records
+    the dates in time_mapping and their entries in manifest. rows defaults to 0, 1, ...
+    Both are checkpointed in the same write: a slice only counts as ingested once its date is
+    in the time index (which also refreshes the sorted datetime64 index readers use) and its
+    hash in the manifest, so an interrupted run redoes the rest. Returns the new next_time_index.
+    """
+    rows = np.arange(len(targets)) if rows is None else np.asarray(rows)
+    with tiledb.DenseArray(array_uri, mode='w') as array:
+        offset = 0
+        for first, last in index_runs(targets):
+            run = rows[offset:offset + last - first + 1]
+            # A view of the buffer unless backfilled dates put the rows out of order
+            consecutive = len(run) == 1 or bool(np.all(np.diff(run) == 1))
+            array[first:last + 1, :, :] = data[run[0]:run[-1] + 1] if consecutive else data[run]
+            offset += len(run)
+
+        for date_str, t in zip(dates, targets):
+            time_mapping[date_str] = int(t)
+            manifest[date_str] = entries[date_str]
+        next_time_index = max(next_time_index, int(targets[-1]) + 1)
+
+        write_time_index(array, time_mapping)
+        array.meta[MANIFEST_KEY] = json.dumps(manifest)
+        array.meta["next_time_index"] = next_time_index
+    return next_time_index
+
+def _invalidate_companions(array_uri, dates, indices):
+    """
+    Marks the parts of the companions of array_uri derived from the given slices as stale
+    before the slices are overwritten: the running sums and the pixel-major copy are rebuilt from
+    the first of them, and the normals periods and annual values of their years are
+    recomputed by the next _update_companions.
+    """
+    first = int(min(indices))
+    for uri in (cumulative_uri(array_uri), timeseries_uri(array_uri)):
+        if not tiledb.array_exists(uri):
+            continue
+        with tiledb.DenseArray(uri, mode='r') as companion:
+            built_through = int(companion.meta["built_through"])
+        if built_through >= first:
+            with tiledb.DenseArray(uri, mode='w') as companion:
+                companion.meta["built_through"] = first - 1
+
+    years = {int(date_str[:4]) for date_str in dates}
+    n_uri = normals_uri(array_uri)
+    if tiledb.array_exists(n_uri):
+        with tiledb.DenseArray(n_uri, mode='r') as normals:
+            periods = json.loads(normals.meta["periods"])
+        for period, stored in periods.items():
+            first_year, last_year = (int(v) for v in period.split("-"))
+            if any(first_year <= year <= last_year for year in years):
+                # A slice count that never matches forces the recompute
+                stored["slices"] = -1
+        with tiledb.DenseArray(n_uri, mode='w') as normals:
+            normals.meta["periods"] = json.dumps(periods)
+
+    a_uri = annual_uri(array_uri)
+    if tiledb.array_exists(a_uri):
+        with tiledb.DenseArray(a_uri, mode='r') as annual:
+            year_slices = json.loads(annual.meta["year_slices"])
+        for year in years:
+            if str(year) in year_slices:
+                year_slices[str(year)] = -1
+        with tiledb.DenseArray(a_uri, mode='w') as annual:
+            annual.meta["year_slices"] = json.dumps(year_slices)
+
+def update_cumulative_array(array_uri):
+    """
+    Creates or extends the running-sum companion of array_uri. Slice t holds the sum
+    and valid-pixel count of every slice from 0 through t, so any contiguous range
+    aggregate is S[end] - S[start - 1]. Only slices added since the last build are processed.
+    """
+    cum_uri = cumulative_uri(array_uri)
+
+    with tiledb.DenseArray(array_uri, mode='r') as src:
+        next_time_index = int(src.meta["next_time_index"])
+        nodata = src.meta.get("nodata")
+
+        if not tiledb.array_exists(cum_uri):
+            print(f"Creating cumulative companion array at {cum_uri}...")
+            schema = tiledb.ArraySchema(
+                domain=src.schema.domain,
+                sparse=False,
+                attrs=[
+                    tiledb.Attr(name="sum", dtype=np.float64, fill=0,
+                                filters=tiledb.FilterList([tiledb.ZstdFilter(level=7)])),
+                    tiledb.Attr(name="count", dtype=np.int32, fill=0,
+                                filters=tiledb.FilterList([tiledb.ZstdFilter(level=7)]))
+                ]
+            )
+            tiledb.DenseArray.create(cum_uri, schema)
+            with tiledb.DenseArray(cum_uri, mode='w') as cum:
+                cum.meta["built_through"] = -1
+
+        with tiledb.DenseArray(cum_uri, mode='r') as cum:
+            built_through = int(cum.meta["built_through"])
+            if built_through >= next_time_index - 1:
+                print(f"Cumulative array {cum_uri} is up to date.")
+                return
+            if built_through >= 0:
+                last = cum[built_through, :, :]
+                running_sum, running_count = last["sum"], last["count"]
+            else:
+                running_sum, running_count = 0.0, 0
+
+        print(f"Extending cumulative array from time_index {built_through + 1} to {next_time_index - 1}...")
+        for start in range(built_through + 1, next_time_index, COMPANION_BATCH_SIZE):
+            end = min(start + COMPANION_BATCH_SIZE, next_time_index)
+            block = mask_fill_values(src[start:end, :, :]["value"].astype(np.float64), nodata)
+            valid = ~np.isnan(block)
+
+            sums = np.cumsum(np.where(valid, block, 0.0), axis=0) + running_sum
+            counts = np.cumsum(valid, axis=0, dtype=np.int32) + running_count
+            running_sum, running_count = sums[-1], counts[-1]
+
+            # Checkpoint after every batch so an interrupted build resumes here
+            with tiledb.DenseArray(cum_uri, mode='w') as cum:
+                cum[start:end, :, :] = {"sum": sums, "count": counts}
+                cum.meta["built_through"] = end - 1
+
+def update_timeseries_array(array_uri):
+    """
+    Creates or extends the pixel-major companion of array_uri. It holds the same cells
+    as the map-oriented array but tiled as (TIMESERIES_TIME_TILE, TIMESERIES_SPATIAL_TILE,
+    TIMESERIES_SPATIAL_TILE), so time-series reads decompress small blocks instead of
+    one statewide tile per month. Fill values are stored as NaN.
+    """
+    ts_uri = timeseries_uri(array_uri)
+
+    with tiledb.DenseArray(array_uri, mode='r') as src:
+        next_time_index = int(src.meta["next_time_index"])
+        nodata = src.meta.get("nodata")
+        height, width = int(src.meta["height"]), int(src.meta["width"])
+
+        if not tiledb.array_exists(ts_uri):
+            print(f"Creating pixel-major companion array at {ts_uri}...")
+            time_dim = src.schema.domain.dim("time_index")
+            dom = tiledb.Domain(
+                tiledb.Dim(name="time_index", domain=time_dim.domain, tile=TIMESERIES_TIME_TILE, dtype=np.int32),
+                tiledb.Dim(name="y", domain=(0, height - 1), tile=min(TIMESERIES_SPATIAL_TILE, height), dtype=np.int32),
+                tiledb.Dim(name="x", domain=(0, width - 1), tile=min(TIMESERIES_SPATIAL_TILE, width), dtype=np.int32)
+            )
+            schema = tiledb.ArraySchema(
+                domain=dom,
+                sparse=False,
+                attrs=[tiledb.Attr(name="value", dtype=np.float32, fill=np.nan,
+                                   filters=tiledb.FilterList([tiledb.ZstdFilter(level=7)]))]
+            )
+            tiledb.DenseArray.create(ts_uri, schema)
+            with tiledb.DenseArray(ts_uri, mode='w') as ts:
+                ts.meta["built_through"] = -1
+
+        with tiledb.DenseArray(ts_uri, mode='r') as ts:
+            built_through = int(ts.meta["built_through"])
+        if built_through >= next_time_index - 1:
+            print(f"Pixel-major array {ts_uri} is up to date.")
+            return
+
+        print(f"Extending pixel-major array from time_index {built_through + 1} to {next_time_index - 1}...")
+        for start in range(built_through + 1, next_time_index, TIMESERIES_BATCH_SIZE):
+            end = min(start + TIMESERIES_BATCH_SIZE, next_time_index)
+            block = mask_fill_values(src[start:end, :, :]["value"], nodata)
+            with tiledb.DenseArray(ts_uri, mode='w') as ts:
+                ts[start:end, :, :] = block
+                ts.meta["built_through"] = end - 1
+
+    # Batches only partially fill the time tiles, so merge them into whole tiles
+    tiledb.consolidate(ts_uri)
+    tiledb.vacuum(ts_uri)
+
+def _sidecar_schema(src, leading_dims, attrs):
+    # Same spatial grid and tiling as src, one slice per tile along the leading dimensions
+    domain = src.schema.domain
+    return tiledb.ArraySchema(
+        domain=tiledb.Domain(*leading_dims, domain.dim("y"), domain.dim("x")),
+        sparse=False,
+        attrs=[
+            tiledb.Attr(name=name, dtype=dtype, fill=fill, filters=tiledb.FilterList([tiledb.ZstdFilter(level=7)]))
+            for name, dtype, fill in attrs
+        ]
+    )
+
+def _copy_grid_meta(src, dst):
+    for key in ("transform", "crs", "nodata", "width", "height"):
+        dst.meta[key] = src.meta[key]
+    dst.meta["nodata_normalized"] = 1
+
+def _stored_years(src):
+    """
+    Calendar (year, month) of every stored slice plus its time_index, in chronological order.
+    """
+    dates, indices = build_time_index(json.loads(src.meta["time_mapping"]))
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    return months // 12 + 1970, months % 12, indices
+
+def _is_trailing_period(period, entry):
+    # Entries written before the flag existed: any non-standard RECENT_NORMAL_YEARS span
+    if "trailing" in entry:
+        return entry["trailing"]
+    first, last = (int(v) for v in period.split("-"))
+    return period not in STANDARD_NORMAL_PERIODS and last - first + 1 == RECENT_NORMAL_YEARS
+
+def update_normals_array(array_uri, periods=None, stripe_rows=ROLLUP_STRIPE_ROWS):
+    """
+    Creates or refreshes the normals sidecar of array_uri: for each reference period
+    ('YYYY-YYYY', inclusive years) the per-pixel mean of every calendar month over the
+    years stored in that period, as a (period, month, y, x) array with months 0-11.
+    periods defaults to STANDARD_NORMAL_PERIODS plus the trailing RECENT_NORMAL_YEARS, which
+    keeps one slot: when the latest year advances the superseded trailing period is dropped
+    and its slot rewritten. A period is only recomputed when the number of stored slices
+    inside it changed.
+    """
+    n_uri = normals_uri(array_uri)
+
+    with tiledb.DenseArray(array_uri, mode='r') as src:
+        years, calendar_months, indices = _stored_years(src)
+        if not len(indices):
+            print(f"No data in {array_uri} to compute normals from.")
+            return
+        trailing = None
+        if periods is None:
+            latest = int(years.max())
+            trailing = f"{latest - RECENT_NORMAL_YEARS + 1}-{latest}"
+            periods = list(STANDARD_NORMAL_PERIODS) + [trailing]
+
+        if not tiledb.array_exists(n_uri):
+            print(f"Creating normals sidecar array at {n_uri}...")
+            dims = [
+                tiledb.Dim(name="period", domain=(0, 99), tile=1, dtype=np.int32),
+                tiledb.Dim(name="month", domain=(0, 11), tile=1, dtype=np.int32)
+            ]
+            tiledb.DenseArray.create(n_uri, _sidecar_schema(src, dims, [("value", np.float32, np.nan)]))
+            with tiledb.DenseArray(n_uri, mode='w') as normals:
+                _copy_grid_meta(src, normals)
+                normals.meta["periods"] = json.dumps({})
+        with tiledb.DenseArray(n_uri, mode='r') as normals:
+            stored = json.loads(normals.meta["periods"])
+
+        trailing_slot = None
+        if trailing is not None:
+            superseded = sorted(
+                (p for p, entry in stored.items() if p != trailing and _is_trailing_period(p, entry)),
+                key=lambda p: stored[p]["index"]
+            )
+            if superseded:
+                print(f"Dropping superseded trailing normals {', '.join(superseded)}...")
+                trailing_slot = stored[superseded[0]]["index"]
+                for p in superseded:
+                    del stored[p]
+                with tiledb.DenseArray(n_uri, mode='w') as normals:
+                    normals.meta["periods"] = json.dumps(stored)
+
+        normalized = bool(src.meta.get("nodata_normalized", 0))
+        nodata = src.meta.get("nodata")
+        stripe_rows = _stripe_rows(src.schema.domain.dim("y").tile, stripe_rows)
+        updated = False
+        for period in dict.fromkeys(periods):
+            first, last = (int(v) for v in period.split("-"))
+            in_period = (years >= first) & (years <= last)
+            if not in_period.any():
+                print(f"Skipping normals for {period}, no data in that period.")
+                continue
+            slices = int(in_period.sum())
+            if period in stored and stored[period]["slices"] == slices:
+                continue
+
+            print(f"Computing {period} normals from {slices} slices...")
+            if period in stored:
+                slot = stored[period]["index"]
+            elif period == trailing and trailing_slot is not None:
+                slot = trailing_slot
+            else:
+                used = {p["index"] for p in stored.values()}
+                slot = next(i for i in range(100) if i not in used)
+            out = np.full((12, src.meta["height"], src.meta["width"]), np.nan, dtype=np.float32)
+            for month in range(12):
+                month_indices = np.sort(indices[in_period & (calendar_months == month)])
+                if len(month_indices):
+                    total, count = _sum_over_time(src, index_runs(month_indices), stripe_rows, normalized, nodata)
+                    out[month] = _aggregate(total, count, "mean")
+
+            with tiledb.DenseArray(n_uri, mode='w') as normals:
+                normals[slot:slot + 1, :, :, :] = out[None]
+                stored[period] = {"index": slot, "slices": slices, "years": sorted({int(y) for y in years[in_period]}),
+                                  "trailing": period == trailing}
+                normals.meta["periods"] = json.dumps(stored)
+            updated = True
 
-def ingest_tiffs(input_dir, array_uri):
+    if updated:
+        tiledb.consolidate(n_uri)
+        tiledb.vacuum(n_uri)
+    print(f"Normals sidecar {n_uri} holds periods: {', '.join(sorted(stored))}")
+
+def update_annual_array(array_uri, stripe_rows=ROLLUP_STRIPE_ROWS):
+    """
+    Creates or refreshes the annual sidecar of array_uri: per-pixel total ('total'),
+    mean ('mean') and number of contributing slices ('count') for every stored year,
+    keyed 'YYYY' in its time_mapping. Only years whose slice count changed are rewritten.
+    """
+    a_uri = annual_uri(array_uri)
+
+    with tiledb.DenseArray(array_uri, mode='r') as src:
+        years, _, indices = _stored_years(src)
+        if not tiledb.array_exists(a_uri):
+            print(f"Creating annual sidecar array at {a_uri}...")
+            time_dim = tiledb.Dim(name="time_index", domain=(0, TIME_DOMAIN_MAX["year"]), tile=1, dtype=np.int32)
+            tiledb.DenseArray.create(a_uri, _sidecar_schema(src, [time_dim], [
+                ("total", np.float32, np.nan), ("mean", np.float32, np.nan), ("count", np.int32, 0)
+            ]))
+            with tiledb.DenseArray(a_uri, mode='w') as annual:
+                _copy_grid_meta(src, annual)
+                annual.meta["time_mapping"] = json.dumps({})
+                annual.meta["next_time_index"] = 0
+                annual.meta["year_slices"] = json.dumps({})
+
+        with tiledb.DenseArray(a_uri, mode='r') as annual:
+            time_mapping = json.loads(annual.meta["time_mapping"])
+            next_time_index = int(annual.meta["next_time_index"])
+            year_slices = json.loads(annual.meta["year_slices"])
+
+        normalized = bool(src.meta.get("nodata_normalized", 0))
+        nodata = src.meta.get("nodata")
+        stripe_rows = _stripe_rows(src.schema.domain.dim("y").tile, stripe_rows)
+        updated = False
+        for year in np.unique(years):
+            key = str(int(year))
+            in_year = np.sort(indices[years == year])
+            if year_slices.get(key) == len(in_year):
+                continue
+
+            total, count = _sum_over_time(src, index_runs(in_year), stripe_rows, normalized, nodata)
+            if key not in time_mapping:
+                time_mapping[key] = next_time_index
+                next_time_index += 1
+            t = time_mapping[key]
+            # Checkpoint per year so an interrupted build resumes with the next one
+            with tiledb.DenseArray(a_uri, mode='w') as annual:
+                annual[t:t + 1, :, :] = {
+                    "total": _aggregate(total, count, "sum")[None],
+                    "mean": _aggregate(total, count, "mean")[None],
+                    "count": count[None]
+                }
+                year_slices[key] = len(in_year)
+                write_time_index(annual, time_mapping)
+                annual.meta["next_time_index"] = next_time_index
+                annual.meta["year_slices"] = json.dumps(year_slices)
+            updated = True
+
+    if updated:
+        tiledb.consolidate(a_uri)
+        tiledb.vacuum(a_uri)
+        print(f"Annual sidecar {a_uri} now covers {len(time_mapping)} years.")
+
+def _read_hot_index(directory):
+    try:
+        with open(os.path.join(directory, HOT_WINDOW_INDEX)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def refresh_hot_window(array_uri, years=None):
+    """
+    Materializes the most recent `years` calendar years of array_uri as an uncompressed
+    float32 .npy file (NaN fill) that tiledb_access memory-maps for reads inside that
+    window (see hot_window_dir). years=None keeps the span of the existing window and
+    does nothing when there is none; years=0 removes the window.
+    """
+    directory = hot_window_dir(array_uri)
+    if directory is None:
+        print(f"No hot window location for remote array {array_uri}; set HCDP_HOT_WINDOW_DIR.")
+        return
+    previous = _read_hot_index(directory)
+    if years is None:
+        if previous is None:
+            return
+        years = previous["years"]
+
+    if years <= 0:
+        if previous is not None:
+            os.remove(os.path.join(directory, HOT_WINDOW_INDEX))
+            _remove_stale_hot_files(directory, keep=None)
+            print(f"Removed hot window {directory}.")
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    file_name = f"values_{uuid.uuid4().hex[:12]}.npy"
+    with open_array(array_uri) as (array, meta):
+        if not len(meta["time_dates"]):
+            return
+        first_year = meta["time_dates"][-1].astype("datetime64[Y]") - (years - 1)
+        labels, indices = resolve_time_range(meta, str(first_year))
+
+        print(f"Refreshing hot window of {array_uri}: {len(labels)} slices from {labels[0]} to {labels[-1]}...")
+        out = np.lib.format.open_memmap(os.path.join(directory, file_name), mode="w+", dtype=np.float32,
+                                        shape=(len(indices), meta["height"], meta["width"]))
+        # One slice at a time, so memory use stays at a single map
+        for i, t in enumerate(indices):
+            data = array[int(t), :, :]["value"]
+            if not meta["nodata_normalized"]:
+                data = mask_fill_values(data.astype(np.float64), meta["nodata"])
+            out[i] = data
+        out.flush()
+        del out
+
+    index = {
+        "version": json.dumps(array_version(array_uri)),
+        "file": file_name,
+        "years": years,
+        "dates": labels,
+        "time_indices": [int(t) for t in indices]
+    }
+    # Readers see either the old or the new index, never a partial one
+    tmp_path = os.path.join(directory, f"{HOT_WINDOW_INDEX}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(directory, HOT_WINDOW_INDEX))
+    _remove_stale_hot_files(directory, keep=file_name)
+
+def _remove_stale_hot_files(directory, keep):
+    # Files still mapped by a reader cannot be removed on Windows; the next refresh retries
+    for path in glob.glob(os.path.join(directory, "values_*.npy")):
+        if os.path.basename(path) != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _update_companions(array_uri, build_cumulative=False, build_timeseries=False, build_normals=False, hot_years=None,
+                       consolidate_threshold=CONSOLIDATE_FRAGMENT_THRESHOLD):
+    # Keep the running-sum companion current once it has been built
+    if build_cumulative or tiledb.array_exists(cumulative_uri(array_uri)):
+        update_cumulative_array(array_uri)
+    if build_timeseries or tiledb.array_exists(timeseries_uri(array_uri)):
+        update_timeseries_array(array_uri)
+    if build_normals or tiledb.array_exists(normals_uri(array_uri)):
+        update_normals_array(array_uri)
+    if build_normals or tiledb.array_exists(annual_uri(array_uri)):
+        update_annual_array(array_uri)
+    # Every ingest run and companion batch adds fragments; merge them before reads slow down
+    consolidate_if_needed(array_uri, consolidate_threshold)
+    consolidate_if_needed(cumulative_uri(array_uri), consolidate_threshold)
+    refresh_hot_window(array_uri, hot_years)
+
+def _days_in_month(month):
+    # month is a datetime64[M] value
+    return int(((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64))
+
+def _stripe_rows(tile_y, stripe_rows):
+    # Round up to whole tiles so every stripe decodes each tile once
+    return max(tile_y, -(-stripe_rows // tile_y) * tile_y)
+
+def _sum_over_time(array, runs, stripe_rows, normalized, nodata):
+    """
+    Per-pixel sum (float64) and valid count (int32) over the time-index runs
+    [(first, last), ...] of an open array, reduced with one query per row stripe.
+    """
+    height, width = int(array.meta["height"]), int(array.meta["width"])
+    total = np.zeros((height, width), dtype=np.float64)
+    count = np.zeros((height, width), dtype=np.int32)
+    for y0 in range(0, height, stripe_rows):
+        y1 = min(y0 + stripe_rows, height)
+        # multi_index ranges are inclusive on both ends
+        block = array.multi_index[[slice(a, b) for a, b in runs], y0:y1 - 1, :]["value"]
+        if not normalized:
+            block = mask_fill_values(block, nodata)
+        valid = ~np.isnan(block)
+        total[y0:y1] = np.where(valid, block, 0.0).sum(axis=0, dtype=np.float64)
+        count[y0:y1] = valid.sum(axis=0, dtype=np.int32)
+    return total, count
+
+def _aggregate(total, count, aggregation):
+    # float32 'sum' or 'mean' grid, NaN where no valid value contributed
+    value = total if aggregation == 'sum' else total / np.maximum(count, 1)
+    return np.where(count > 0, value, np.nan).astype(np.float32)
+
+def rollup_daily_array(array_uri, aggregation="mean", stripe_rows=ROLLUP_STRIPE_ROWS):
+    """
+    Materializes monthly and annual rollups of the daily array of a variable.
+    array_uri is the variable's base (monthly) array; daily maps are read from
+    resolution_uri(array_uri, 'day') and annual rollups written to resolution_uri(array_uri, 'year').
+    aggregation: 'sum' (rainfall totals) or 'mean' (temperature) of the valid daily values.
+
+    Only complete months and years are rolled up, and periods the target already holds
+    (e.g. HCDP monthly products) are left untouched, so the job can run after every
+    daily ingest. Each month of days is reduced in row stripes aligned to the spatial
+    tiles, one query per stripe, which keeps memory bounded on the statewide grid.
+    """
+    daily_uri = resolution_uri(array_uri, "day")
+    year_uri = resolution_uri(array_uri, "year")
+    if not tiledb.array_exists(daily_uri):
+        print(f"No daily array at {daily_uri}")
+        return
+
+    create_array_like(daily_uri, array_uri, "month")
+    create_array_like(daily_uri, year_uri, "year")
+
+    with tiledb.DenseArray(daily_uri, mode='r') as daily:
+        day_mapping = json.loads(daily.meta["time_mapping"])
+        height, width = int(daily.meta["height"]), int(daily.meta["width"])
+        normalized = bool(daily.meta.get("nodata_normalized", 0))
+        nodata = daily.meta.get("nodata")
+        tile_y = daily.schema.domain.dim("y").tile
+    with tiledb.DenseArray(array_uri, mode='r') as monthly:
+        month_mapping = json.loads(monthly.meta["time_mapping"])
+    with tiledb.DenseArray(year_uri, mode='r') as yearly:
+        year_mapping = json.loads(yearly.meta["time_mapping"])
+
+    # Group the stored days by calendar month
+    days = sorted(day_mapping)
+    day_indices = np.array([day_mapping[d] for d in days], dtype=np.int64)
+    day_months = np.array(days, dtype="datetime64[D]").astype("datetime64[M]")
+    months = np.unique(day_months)
+    complete = {m for m in months if np.count_nonzero(day_months == m) == _days_in_month(m)}
+
+    stripe_rows = _stripe_rows(tile_y, stripe_rows)
+    for year in np.unique(months.astype("datetime64[Y]")):
+        year_months = [m for m in months if m.astype("datetime64[Y]") == year]
+        new_months = [m for m in year_months if m in complete and str(m) not in month_mapping]
+        year_complete = len(year_months) == 12 and all(m in complete for m in year_months)
+        new_year = year_complete and str(year) not in year_mapping
+        if not new_months and not new_year:
+            continue
+
+        print(f"Rolling up {str(year)}: {len(new_months)} month(s){' and the annual map' if new_year else ''}...")
+        month_out = np.full((len(new_months), height, width), np.nan, dtype=np.float32)
+        year_sum = np.zeros((height, width), dtype=np.float64)
+        year_count = np.zeros((height, width), dtype=np.int32)
+
+        with tiledb.DenseArray(daily_uri, mode='r') as daily:
+            for month in (year_months if new_year else new_months):
+                runs = index_runs(day_indices[day_months == month])
+                total, count = _sum_over_time(daily, runs, stripe_rows, normalized, nodata)
+                if month in new_months:
+                    month_out[new_months.index(month)] = _aggregate(total, count, aggregation)
+                year_sum += total
+                year_count += count
+
+        if new_months:
+            _append_slices(array_uri, [str(m) for m in new_months], month_out)
+        if new_year:
+            _append_slices(year_uri, [str(year)], _aggregate(year_sum, year_count, aggregation)[None])
+
+    _update_companions(array_uri)
+    consolidate_if_needed(year_uri)
+    refresh_hot_window(year_uri)
+    print(f"Rollups of {daily_uri} are up to date.")
+
+def _append_slices(array_uri, date_strs, data):
+    """
+    Writes consecutive slices after the last stored time_index and records their dates.
+    """
+    with tiledb.DenseArray(array_uri, mode='r') as array:
+        time_mapping = json.loads(array.meta["time_mapping"])
+        next_time_index = int(array.meta["next_time_index"])
+    with tiledb.DenseArray(array_uri, mode='w') as array:
+        array[next_time_index:next_time_index + len(date_strs), :, :] = data
+        for date_str in date_strs:
+            time_mapping[date_str] = next_time_index
+            next_time_index += 1
+        write_time_index(array, time_mapping)
+        array.meta["next_time_index"] = next_time_index
+
+def ingest_tiffs(input_dir, array_uri, build_cumulative=False, build_timeseries=False,
+                 tile_y=SPATIAL_TILE_Y, tile_x=SPATIAL_TILE_X, resolution="month", build_normals=False,
+                 hot_years=None, consolidate_threshold=CONSOLIDATE_FRAGMENT_THRESHOLD, batch_size=INGEST_BATCH_SIZE,
+                 workers=DECODE_WORKERS, executor=None):
+    """
+    Ingests the TIFFs of input_dir (named by date, e.g. 2024-01.tiff) into the
+    array of the variable at the given resolution: resolution='day' writes
+    YYYY-MM-DD.tiff files to the daily array next to array_uri (see resolution_uri).
+    Files are streamed in batches of batch_size: each batch is decoded into one buffer,
+    written as a fragment and checkpointed in the time index before the next one is read,
+    so memory stays flat and an interrupted run resumes with the first missing date.
+    workers: Processes decoding TIFFs into shared memory while this thread writes the
+             batches in chronological order. executor: an existing decode pool to use
+             instead (see ingest_variables).
+    hot_years: (Re)build the memory-mapped hot window with this many recent years
+               (0 removes it); an existing window is refreshed either way.
+    consolidate_threshold: Consolidate the array (and its running-sum companion) once it
+                           holds more fragments than this; 0 disables it.
+
+    Each ingested date is recorded in the array's manifest (see read_manifest). A rerun only
+    hashes files whose size or mtime changed, overwrites the slices whose content changed in
+    place (marking the companions built from them stale) and appends new dates. Dates
+    stored before the manifest existed are decoded once and compared with the stored slice.
+    Returns the diff against the manifest (see diff_manifest), or None without TIFFs.
+    """
     tiff_files = glob.glob(os.path.join(input_dir, "*.tiff")) + glob.glob(os.path.join(input_dir, "*.tif"))
     if not tiff_files:
         print(f"No TIFF files found in {input_dir}")
         return
 
-    create_array_if_not_exists(array_uri, tiff_files[0])
+    array_uri = resolution_uri(array_uri, resolution)
+    create_array_if_not_exists(array_uri, tiff_files[0], tile_y, tile_x, resolution)
 
     with tiledb.DenseArray(array_uri, mode='r') as array:
         time_mapping = json.loads(array.meta["time_mapping"])
-        next_time_index = array.meta["next_time_index"]
-        
-    dates_to_ingest = []
-    paths_to_ingest = []
-    
+        next_time_index = int(array.meta["next_time_index"])
+        height, width = int(array.meta["height"]), int(array.meta["width"])
+        manifest = json.loads(array.meta.get(MANIFEST_KEY, "{}"))
+
+    sources = {}
     for tiff_path in sorted(tiff_files):
         filename = os.path.basename(tiff_path)
         date_str = os.path.splitext(filename)[0] # Expects e.g. "2024-01.tiff"
-        
-        if date_str in time_mapping:
-            print(f"Skipping {date_str}, already ingested in array.")
+
+        if len(date_str) != DATE_KEY_LENGTH[resolution]:
+            print(f"Skipping {filename}, not a {resolution} date.")
             continue
-            
-        dates_to_ingest.append(date_str)
-        paths_to_ingest.append(tiff_path)
-
-    MAX_FILES = 120
-    if len(dates_to_ingest) > MAX_FILES:
-        print(f"Limiting to {MAX_FILES} files to bypass Windows TileDB fragment lock bugs and stay in memory.")
-        dates_to_ingest = dates_to_ingest[:MAX_FILES]
-        paths_to_ingest = paths_to_ingest[:MAX_FILES]
-        
-    print(f"Loading {len(dates_to_ingest)} files into memory to avoid fragment locks...")
-    data_to_ingest = []
-    for tiff_path in paths_to_ingest:
-        with rasterio.open(tiff_path) as src:
-            data_to_ingest.append(src.read(1).astype(np.float32))
-            
-    print(f"Writing all data sequentially to TileDB at once starting from time_index {next_time_index}...")
-    batch_data = np.stack(data_to_ingest)
-    
-    with tiledb.DenseArray(array_uri, mode='w') as array:
-        end_index = next_time_index + len(dates_to_ingest)
-        array[int(next_time_index):int(end_index), :, :] = batch_data
-        
-        for date_str in dates_to_ingest:
-            time_mapping[date_str] = int(next_time_index)
-            next_time_index += 1
-            
-        array.meta["time_mapping"] = json.dumps(time_mapping)
-        array.meta["next_time_index"] = next_time_index
+        sources[date_str] = tiff_path
+
+    diff, entries = diff_manifest(sources, time_mapping, manifest)
+    if diff["untracked"]:
+        # Dates stored before the manifest existed have no hash to go by: compare each file
+        # with its stored slice so a republished month is overwritten instead of adopted
+        print(f"Comparing {len(diff['untracked'])} dates stored before the manifest with their files...")
+        with tiledb.DenseArray(array_uri, mode='r') as array:
+            differ = [
+                date_str for date_str in diff["untracked"]
+                if not _slice_matches(array, time_mapping[date_str], read_tiff_as_float32(sources[date_str]))
+            ]
+        diff["untracked"] = [date_str for date_str in diff["untracked"] if date_str not in differ]
+        diff["changed"] = sorted(diff["changed"] + differ)
+    _print_diff(array_uri, diff)
+
+    # Changed dates keep their time_index and new ones are appended in date order, so the
+    # targets ascend and each batch is written as a few contiguous runs
+    changed = sorted(diff["changed"], key=time_mapping.get)
+    dates_to_ingest = changed + diff["new"]
+    targets = [time_mapping[date_str] for date_str in changed]
+    targets += range(next_time_index, next_time_index + len(diff["new"]))
+    paths_to_ingest = [sources[date_str] for date_str in dates_to_ingest]
+
+    if not dates_to_ingest:
+        if diff["touched"] or diff["untracked"]:
+            # Same content as stored: only the manifest learns the new size/mtime or hash
+            manifest.update(entries)
+            with tiledb.DenseArray(array_uri, mode='w') as array:
+                array.meta[MANIFEST_KEY] = json.dumps(manifest)
+        print(f"Nothing new to ingest into {array_uri}.")
+        if build_cumulative or build_timeseries or build_normals:
+            # Companions requested for data that is already in: build them now
+            _update_companions(array_uri, build_cumulative, build_timeseries, build_normals, hot_years,
+                               consolidate_threshold)
+        elif hot_years is not None:
+            refresh_hot_window(array_uri, hot_years)
+        return diff
+
+    if changed:
+        _invalidate_companions(array_uri, changed, targets[:len(changed)])
+    print(f"Ingesting {len(diff['new'])} new and {len(changed)} changed files in batches of {batch_size}...")
+    # Hash-only updates ride along with the first batch
+    for date_str in diff["touched"] + diff["untracked"]:
+        manifest[date_str] = entries[date_str]
+
+    def write_batch(start, data):
+        nonlocal next_time_index
+        batch_dates = dates_to_ingest[start:start + len(data)]
+        next_time_index = _write_slices(array_uri, batch_dates, targets[start:start + len(data)], data,
+                                        time_mapping, manifest, entries, next_time_index)
+        print(f"  Wrote {batch_dates[0]} to {batch_dates[-1]} ({start + len(data)}/{len(dates_to_ingest)}).")
+
+    # Decode straight into reused batch buffers instead of stacking a list of rasters
+    workers = min(workers, len(paths_to_ingest))
+    if executor is None and workers > 1:
+        with _decode_pool(workers) as pool:
+            _decode_batches(paths_to_ingest, batch_size, height, width, write_batch, pool)
+    else:
+        _decode_batches(paths_to_ingest, batch_size, height, width, write_batch, executor)
 
     # Final summary
     print(f"Successfully finished ingestion. Array {array_uri} now has {next_time_index} time slices.")
 
+    _update_companions(array_uri, build_cumulative, build_timeseries, build_normals, hot_years, consolidate_threshold)
+    return diff
+
+def ingest_variables(jobs, workers=DECODE_WORKERS, **options):
+    """
+    Ingests several variables at once. jobs is a list of (input_dir, array_uri) pairs,
+    e.g. rainfall, temperature and SPI. Each variable gets its own writer thread (one
+    writer per array, batches in chronological order) and all of them share one pool of
+    decode processes. options are passed on to ingest_tiffs.
+    Returns the diff of each job, in order.
+    """
+    with _decode_pool(max(1, workers)) as pool:
+        with ThreadPoolExecutor(max_workers=max(1, len(jobs))) as writers:
+            futures = [
+                writers.submit(ingest_tiffs, input_dir, array_uri, executor=pool, **options)
+                for input_dir, array_uri in jobs
+            ]
+            return [future.result() for future in futures]
+
+def _fetch_slice(fetch, date_str, known_hash, buffer, slot):
+    """
+    Download worker: fetches one date and, unless its content hash equals known_hash,
+    decodes it in memory into buffer[slot]. Returns (size, hash, decoded), or None if the
+    download failed or the response is not a readable GeoTIFF of the array grid (e.g. an
+    error page served with status 200).
+    """
+    content = fetch(date_str)
+    if content is None:
+        return None
+    digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+    if digest == known_hash:
+        return len(content), digest, False
+    try:
+        buffer[slot] = read_tiff_bytes_as_float32(content)
+    except (RasterioIOError, ValueError) as e:
+        print(f"  Could not decode {date_str}: {e}")
+        return None
+    return len(content), digest, True
+
+def ingest_downloads(array_uri, dates, fetch, source=None, refresh=False, workers=DOWNLOAD_WORKERS,
+                     batch_size=INGEST_BATCH_SIZE, resolution="month", tile_y=SPATIAL_TILE_Y, tile_x=SPATIAL_TILE_X,
+                     build_cumulative=False, build_timeseries=False, build_normals=False, hot_years=None,
+                     consolidate_threshold=CONSOLIDATE_FRAGMENT_THRESHOLD):
+    """
+    Streams GeoTIFFs from fetch straight into the array of the variable at the given
+    resolution, without intermediate files. fetch(date_str) returns the GeoTIFF bytes of a
+    date or None (e.g. fetch_tiff_bytes in HCDP_API/tiff_downloader.py). Up to `workers`
+    downloads run concurrently and each response is decoded in memory. Dates go in batches
+    of batch_size, in order: while one batch is written and checkpointed in the time index
+    and manifest, the next one is downloading.
+    Stored dates are skipped unless refresh is set; they are then downloaded again and
+    overwritten in place only if their content hash changed. Dates stored before the
+    manifest existed are compared with the stored slice instead.
+    source: Manifest path of a date, formatted with date=date_str (e.g. the request URL).
+    The other options are those of ingest_tiffs. Returns the diff (DOWNLOAD_DIFF_KEYS).
+    """
+    array_uri = resolution_uri(array_uri, resolution)
+    time_mapping, manifest, next_time_index = {}, {}, 0
+    if tiledb.array_exists(array_uri):
+        with tiledb.DenseArray(array_uri, mode='r') as array:
+            time_mapping = json.loads(array.meta["time_mapping"])
+            next_time_index = int(array.meta["next_time_index"])
+            manifest = json.loads(array.meta.get(MANIFEST_KEY, "{}"))
+
+    diff = {key: [] for key in DOWNLOAD_DIFF_KEYS}
+    wanted = []
+    for date_str in sorted(set(dates)):
+        if len(date_str) != DATE_KEY_LENGTH[resolution]:
+            print(f"Skipping {date_str}, not a {resolution} date.")
+        elif date_str in time_mapping and not refresh:
+            diff["stored"].append(date_str)
+        else:
+            wanted.append(date_str)
+    print(f"Downloading {len(wanted)} dates into {array_uri} with {workers} concurrent requests...")
+    prefetched = {}
+    if wanted and not tiledb.array_exists(array_uri):
+        # A new array takes its grid from the first date that downloads as a readable GeoTIFF
+        for i, date_str in enumerate(wanted):
+            content = fetch(date_str)
+            if content is not None:
+                try:
+                    with MemoryFile(content, filename=f"{date_str}.tiff") as memfile:
+                        create_array_if_not_exists(array_uri, memfile.name, tile_y, tile_x, resolution)
+                    prefetched[date_str] = content
+                    wanted = wanted[i:]
+                    break
+                except (RasterioIOError, ValueError) as e:
+                    print(f"  Could not decode {date_str}: {e}")
+            diff["failed"].append(date_str)
+        else:
+            wanted = []
+
+    def fetch_once(date_str):
+        content = prefetched.pop(date_str, None)
+        return content if content is not None else fetch(date_str)
+
+    batches = [wanted[i:i + batch_size] for i in range(0, len(wanted), batch_size)]
+    if batches:
+        with tiledb.DenseArray(array_uri, mode='r') as array:
+            height, width = int(array.meta["height"]), int(array.meta["width"])
+        # Two reused batch buffers: responses of the next batch are decoded into one while
+        # the other is compared and written
+        shape = (min(batch_size, len(wanted)), height, width)
+        buffers = [np.empty(shape, dtype=np.float32) for _ in range(min(2, len(batches)))]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        def submit(k):
+            return [
+                pool.submit(_fetch_slice, fetch_once, date_str, manifest.get(date_str, {}).get("hash"),
+                            buffers[k % 2], slot)
+                for slot, date_str in enumerate(batches[k])
+            ]
+
+        pending = submit(0) if batches else []
+        for k, batch in enumerate(batches):
+            results = [future.result() for future in pending]
+            pending = submit(k + 1) if k + 1 < len(batches) else []
+            buffer = buffers[k % 2]
+
+            entries, slices = {}, []
+            t = next_time_index
+            for slot, (date_str, result) in enumerate(zip(batch, results)):
+                if result is None:
+                    diff["failed"].append(date_str)
+                    continue
+                size, digest, decoded = result
+                entries[date_str] = {"path": source.format(date=date_str) if source else None,
+                                     "size": size, "mtime_ns": None, "hash": digest}
+                if date_str not in time_mapping:
+                    diff["new"].append(date_str)
+                    slices.append((t, date_str, slot))
+                    t += 1
+                elif date_str not in manifest and _matches_stored(array_uri, time_mapping[date_str], buffer[slot]):
+                    # Stored before the manifest existed with the same values: record its hash
+                    diff["untracked"].append(date_str)
+                    manifest[date_str] = entries[date_str]
+                elif not decoded:
+                    diff["unchanged"].append(date_str)
+                else:
+                    diff["changed"].append(date_str)
+                    slices.append((time_mapping[date_str], date_str, slot))
+            if not slices:
+                continue
+
+            slices.sort(key=lambda item: item[0])
+            targets = [target for target, _, _ in slices]
+            batch_dates = [date_str for _, date_str, _ in slices]
+            changed = [(target, date_str) for target, date_str, _ in slices if date_str in time_mapping]
+            if changed:
+                _invalidate_companions(array_uri, [d for _, d in changed], [target for target, _ in changed])
+            next_time_index = _write_slices(array_uri, batch_dates, targets, buffer, time_mapping, manifest,
+                                            entries, next_time_index, rows=[slot for _, _, slot in slices])
+            print(f"  Wrote {len(batch_dates)} slices, {batch[0]} to {batch[-1]}.")
+
+    _print_diff(array_uri, diff)
+    if diff["untracked"] and tiledb.array_exists(array_uri):
+        with tiledb.DenseArray(array_uri, mode='w') as array:
+            array.meta[MANIFEST_KEY] = json.dumps(manifest)
+    if not diff["new"] and not diff["changed"]:
+        print(f"Nothing new to ingest into {array_uri}.")
+        if not tiledb.array_exists(array_uri):
+            return diff
+        if build_cumulative or build_timeseries or build_normals:
+            # Companions requested for data that is already in: build them now
+            _update_companions(array_uri, build_cumulative, build_timeseries, build_normals, hot_years,
+                               consolidate_threshold)
+        elif hot_years is not None:
+            refresh_hot_window(array_uri, hot_years)
+        return diff
+
+    print(f"Successfully finished ingestion. Array {array_uri} now has {next_time_index} time slices.")
+    _update_companions(array_uri, build_cumulative, build_timeseries, build_normals, hot_years, consolidate_threshold)
+    return diff
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Ingest TIFFs into a TileDB Array")
-    parser.add_argument("--input_dir", required=True, help="Directory containing TIFF files")
-    parser.add_argument("--array_uri", required=True, help="Path/URI for the target TileDB array")
+    parser.add_argument("--input_dir", required=True, nargs="+",
+                        help="Directory containing TIFF files (several, paired with --array_uri, ingest concurrently)")
+    parser.add_argument("--array_uri", required=True, nargs="+", help="Path/URI for the target TileDB array")
+    parser.add_argument("--build_cumulative", action="store_true",
+                        help="Build/extend the running-sum companion array used for O(1) date-range aggregation")
+    parser.add_argument("--build_timeseries", action="store_true",
+                        help="Build/extend the pixel-major companion array used for fast time-series extraction")
+    parser.add_argument("--tile_y", type=int, default=SPATIAL_TILE_Y,
+                        help="Spatial tile extent along y for newly created arrays")
+    parser.add_argument("--tile_x", type=int, default=SPATIAL_TILE_X,
+                        help="Spatial tile extent along x for newly created arrays")
+    parser.add_argument("--resolution", default="month", choices=sorted(RESOLUTION_SUFFIXES),
+                        help="Time resolution of the TIFFs; 'day' ingests into <array_uri>_daily")
+    parser.add_argument("--build_normals", action="store_true",
+                        help="Build/refresh the monthly normals and annual totals/means sidecar arrays")
+    parser.add_argument("--hot_years", type=int,
+                        help="Keep the last N years as a memory-mapped .npy hot window for fast reads (0 removes it)")
+    parser.add_argument("--consolidate_threshold", type=int, default=CONSOLIDATE_FRAGMENT_THRESHOLD,
+                        help="Consolidate and vacuum the array once it holds more fragments than this (0 disables)")
+    parser.add_argument("--batch_size", type=int, default=INGEST_BATCH_SIZE,
+                        help="TIFFs decoded and written per batch; bounds memory use")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS,
+                        help="Processes decoding TIFFs in parallel (1 decodes serially)")
+    parser.add_argument("--rollup", choices=["sum", "mean"],
+                        help="After a daily ingest, materialize monthly/annual rollups with this aggregation")
     args = parser.parse_args()
-    
-    ingest_tiffs(args.input_dir, args.array_uri)
+    if len(args.input_dir) != len(args.array_uri):
+        parser.error("--input_dir and --array_uri need the same number of values")
+
+    options = dict(build_cumulative=args.build_cumulative, build_timeseries=args.build_timeseries,
+                   tile_y=args.tile_y, tile_x=args.tile_x, resolution=args.resolution,
+                   build_normals=args.build_normals, hot_years=args.hot_years,
+                   consolidate_threshold=args.consolidate_threshold, batch_size=args.batch_size)
+    if len(args.array_uri) == 1:
+        ingest_tiffs(args.input_dir[0], args.array_uri[0], workers=args.workers, **options)
+    else:
+        ingest_variables(list(zip(args.input_dir, args.array_uri)), workers=args.workers, **options)
+    if args.rollup:
+        for array_uri in args.array_uri:
+            rollup_daily_array(array_uri, aggregation=args.rollup)
@@ -0,0 +1,218 @@
+"""
+Zonal Statistics
+
+Computes statistics for every zone of a label grid (islands, districts, watersheds, ...)
+in one pass per time slice: each slice is reduced for all zones at once with np.bincount
+instead of one regional query per zone.
+
+Zones are rasterized once onto the array grid and cached:
+- island_zones: islands derived from the grid itself. Land pixels are split into
+  connected land masses, and each mass is named from the island codes of the stations
+  in HCDP_API/master_stations.csv that fall on it.
+- polygon_zones: user-supplied GeoJSON polygons, one zone per feature.
+
+Per-slice results are cached on the array version, the slice and the zone grid, so
+repeated or overlapping date ranges only reduce the slices not seen before.
+
+Usage:
+    from database.zonal_stats import island_zones, zonal_statistics
+
+    table = zonal_statistics("database/rainfall_array", "2020-01", "2020-12", island_zones("database/rainfall_array"))
+    annual = table.groupby("zone")["mean"].sum()
+"""
+import csv
+import hashlib
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from affine import Affine
+from rasterio.features import rasterize
+from scipy import ndimage
+
+try:
+    from database.tiledb_access import open_array, array_version, resolution_uri, resolve_time_range, latlon_to_pixel, mask_fill_values
+    from database.result_cache import ResultCache
+except ImportError:
+    # Running as a script from inside database/
+    from tiledb_access import open_array, array_version, resolution_uri, resolve_time_range, latlon_to_pixel, mask_fill_values
+    from result_cache import ResultCache
+
+STATIONS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "HCDP_API", "master_stations.csv")
+
+# Island codes used in master_stations.csv
+ISLAND_NAMES = {
+    "BI": "Hawaii", "MA": "Maui", "OA": "Oahu", "KA": "Kauai",
+    "MO": "Molokai", "LA": "Lanai", "KO": "Kahoolawe", "NI": "Niihau"
+}
+
+ZONAL_STATISTICS = ("mean", "min", "max", "std", "count")
+
+# Per-slice zonal results kept in memory (each is a few numbers per zone)
+ZONAL_CACHE_BYTES = 32 * 1024 * 1024
+
+_slice_cache = ResultCache(ZONAL_CACHE_BYTES)
+
+# labels: int32 grid with 0 outside every zone and i + 1 inside zone names[i]
+# window: (y_min, y_max, x_min, x_max) bounding all zones, stops exclusive
+# key: content hash identifying the zone grid in caches
+Zones = namedtuple("Zones", ["labels", "names", "window", "key"])
+
+def _make_zones(labels, names):
+    rows = np.flatnonzero(labels.any(axis=1))
+    cols = np.flatnonzero(labels.any(axis=0))
+    if not len(rows):
+        window = (0, 0, 0, 0)
+    else:
+        window = (int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1)
+    labels.flags.writeable = False
+    digest = hashlib.blake2b(labels.tobytes(), digest_size=16)
+    digest.update(json.dumps(names).encode())
+    return Zones(labels, tuple(names), window, (labels.shape, digest.hexdigest()))
+
+@lru_cache(maxsize=8)
+def _cached_island_zones(array_uri, stations_csv):
+    with open_array(array_uri) as (array, meta):
+        if not len(meta["time_indices"]):
+            raise ValueError(f"{array_uri} has no data to derive island outlines from.")
+        first = array[int(meta["time_indices"][0]), :, :]["value"]
+        if not meta["nodata_normalized"]:
+            first = mask_fill_values(first.astype(np.float64), meta["nodata"])
+
+    # 8-connected land masses of the valid-data mask
+    components, n_components = ndimage.label(~np.isnan(first), structure=np.ones((3, 3), dtype=int))
+
+    votes = {}
+    with open(stations_csv, newline="") as f:
+        for row in csv.DictReader(f):
+            code = (row.get("island") or "").strip()
+            if code not in ISLAND_NAMES:
+                continue
+            try:
+                lat, lon = float(row["lat"]), float(row["lng"])
+            except (TypeError, ValueError):
+                continue
+            r, c = latlon_to_pixel(meta, lat, lon)
+            if 0 <= r < meta["height"] and 0 <= c < meta["width"] and components[r, c]:
+                counts = votes.setdefault(int(components[r, c]), {})
+                counts[code] = counts.get(code, 0) + 1
+
+    # Each land mass goes to the island most of its stations report; islets share a zone
+    codes = sorted({max(counts, key=counts.get) for counts in votes.values()}, key=lambda c: ISLAND_NAMES[c])
+    zone_of = np.zeros(n_components + 1, dtype=np.int32)
+    for component, counts in votes.items():
+        zone_of[component] = codes.index(max(counts, key=counts.get)) + 1
+    return _make_zones(zone_of[components], [ISLAND_NAMES[c] for c in codes])
+
+def island_zones(array_uri, stations_csv=STATIONS_CSV):
+    """
+    Island label grid for the grid of array_uri. Land masses without any station
+    (e.g. Niihau when no station reports it) are left out. Cached per array.
+    """
+    return _cached_island_zones(os.path.abspath(array_uri), os.path.abspath(stations_csv))
+
+@lru_cache(maxsize=32)
+def _cached_polygon_zones(transform, shape, features_key):
+    features = json.loads(features_key)
+    labels = np.zeros(shape, dtype=np.int32)
+    if features:
+        # Later features win where polygons overlap
+        labels = rasterize(
+            [(geometry, i + 1) for i, (_, geometry) in enumerate(features)],
+            out_shape=shape, transform=Affine(*transform), fill=0, dtype="int32"
+        )
+    return _make_zones(labels, [name for name, _ in features])
+
+def polygon_zones(transform, shape, geojson, name_property="name"):
+    """
+    Label grid for GeoJSON polygons: one zone per feature of a FeatureCollection (or a
+    single Feature / geometry), named from name_property or 'zone <n>'. Pixels whose centers
+    fall inside a polygon belong to it. transform is the 6-element affine transform of the
+    grid and shape its (height, width). Cached per geometry.
+    """
+    if geojson.get("type") == "FeatureCollection":
+        features = geojson["features"]
+    elif geojson.get("type") == "Feature":
+        features = [geojson]
+    else:
+        features = [{"geometry": geojson, "properties": {}}]
+    named = [
+        (str((feature.get("properties") or {}).get(name_property, f"zone {i + 1}")), feature["geometry"])
+        for i, feature in enumerate(features)
+    ]
+    return _cached_polygon_zones(
+        tuple(float(v) for v in tuple(transform)[:6]), (int(shape[0]), int(shape[1])), json.dumps(named, sort_keys=True)
+    )
+
+def _reduce_slice(data, zone_ids, n_zones):
+    """
+    Statistics of every zone for one slice. data and zone_ids are flat arrays of the
+    zone pixels only. Returns a dict of arrays indexed by zone number - 1.
+    """
+    valid = ~np.isnan(data)
+    ids = zone_ids[valid]
+    values = data[valid].astype(np.float64)
+
+    count = np.bincount(ids, minlength=n_zones + 1)[1:]
+    total = np.bincount(ids, weights=values, minlength=n_zones + 1)[1:]
+    total_sq = np.bincount(ids, weights=values * values, minlength=n_zones + 1)[1:]
+    minimum = np.full(n_zones + 1, np.inf)
+    maximum = np.full(n_zones + 1, -np.inf)
+    np.minimum.at(minimum, ids, values)
+    np.maximum.at(maximum, ids, values)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(total_sq / count - mean ** 2, 0.0))
+    empty = count == 0
+    minimum, maximum = minimum[1:], maximum[1:]
+    minimum[empty] = np.nan
+    maximum[empty] = np.nan
+    return {"mean": mean, "min": minimum, "max": maximum, "std": std, "count": count}
+
+def zonal_statistics(array_uri, start_date, end_date, zones, statistics=ZONAL_STATISTICS, resolution="month"):
+    """
+    Statistics of every zone for each stored date in start_date..end_date (inclusive).
+    zones comes from island_zones or polygon_zones. Only the window bounding the zones is
+    read, and each slice is reduced for all zones at once.
+    Returns a tidy DataFrame with one row per (date, zone) and a column per statistic
+    ('mean', 'min', 'max', 'std', 'count').
+    """
+    array_uri = resolution_uri(array_uri, resolution)
+    y_min, y_max, x_min, x_max = zones.window
+    labels = zones.labels[y_min:y_max, x_min:x_max].ravel()
+    in_zone = labels > 0
+    zone_ids = labels[in_zone]
+    n_zones = len(zones.names)
+    version = array_version(array_uri)
+
+    frames = []
+    with open_array(array_uri) as (array, meta):
+        if (meta["height"], meta["width"]) != zones.labels.shape:
+            raise ValueError(f"Zone grid {zones.labels.shape} does not match the array grid ({meta['height']}, {meta['width']}).")
+        dates, indices = resolve_time_range(meta, start_date, end_date)
+        for date, t in zip(dates, indices):
+            key = (os.path.abspath(array_uri), version, int(t), zones.key)
+            found, result = _slice_cache.get(key)
+            if not found:
+                data = array[int(t), y_min:y_max, x_min:x_max]["value"].ravel()[in_zone]
+                if not meta["nodata_normalized"]:
+                    data = mask_fill_values(data.astype(np.float64), meta["nodata"])
+                result = _reduce_slice(data, zone_ids, n_zones)
+                _slice_cache.put(key, result)
+            frame = {"date": date, "zone": list(zones.names)}
+            frame.update({stat: result[stat] for stat in statistics})
+            frames.append(pd.DataFrame(frame))
+
+    if not frames:
+        return pd.DataFrame(columns=["date", "zone"] + list(statistics))
+    return pd.concat(frames, ignore_index=True)
+
+def zonal_cache_info():
+    """
+    Hit/miss/eviction counters of the per-slice zonal results cache.
+    """
+    return _slice_cache.info()
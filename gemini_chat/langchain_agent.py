@@ -17,6 +17,15 @@ OUTPUTS_DIR = os.path.join(PROJECT_ROOT, "outputs")
 # Ensure outputs directory exists
 os.makedirs(OUTPUTS_DIR, exist_ok=True)
 
+# Array, unit and temporal aggregation (rainfall totals, temperature means) of the
+# variables the anomaly, seasonal and island tools accept
+CLIMATE_ARRAYS = {
+    "rainfall": ("rainfall_array", "mm", "sum"),
+    "temperature": ("temperature_array", "Celsius", "mean"),
+    "max_temp": ("max_temp_array", "Celsius", "mean"),
+    "min_temp": ("min_temp_array", "Celsius", "mean")
+}
+
 for path in [PROJECT_ROOT, HCDP_API_DIR]:
     if path not in sys.path:
         sys.path.append(path)
@@ -196,11 +205,11 @@ def query_historical_climate_data(latitude: float, longitude: float, month: str,
     Args:
         latitude: Latitude coordinate.
         longitude: Longitude coordinate.
-        month: The month to query, strictly formatted as 'YYYY-MM' (e.g. '1995-05').
-        variable: The type of data to query: 'temperature' (Celsius), 'rainfall' (mm), or 'spi' (Standardized Precipitation Index). Defaults to 'temperature'.
+        month: The month to query, strictly formatted as 'YYYY-MM' (e.g. '1995-05'), or 'YYYY-MM-DD' for a single day (daily data).
+        variable: The type of data to query: 'temperature' (Celsius), 'rainfall' (mm), or 'spi' (Standardized Precipitation Index). Use 'spi_1', 'spi_3', 'spi_6' or 'spi_12' for SPI over a specific accumulation window in months. Defaults to 'temperature'.
     """
     try:
-        from database.tiledb_access import get_metadata, get_data_for_month
+        from database.tiledb_access import get_metadata, get_point_values, latlon_to_pixel, resolution_uri
         import numpy as np
         
         # Select the correct array based on the requested variable
@@ -216,28 +225,30 @@ def query_historical_climate_data(latitude: float, longitude: float, month: str,
         elif variable.lower() == "spi":
             array_name = "spi_array"
             unit = "units (SPI)"
+        elif variable.lower() in ("spi_1", "spi_3", "spi_6", "spi_12"):
+            # SPI computed from the rainfall array by database/compute_spi.py
+            array_name = f"spi_array_{variable.lower()[4:]}mo"
+            unit = "units (SPI)"
         else:
             array_name = "rainfall_array"
             unit = "mm"
         
-        db_path = os.path.join(PROJECT_ROOT, "database", array_name)
+        # 'YYYY-MM-DD' dates are answered from the daily array
+        resolution = "day" if len(month) == 10 else "month"
+        db_path = resolution_uri(os.path.join(PROJECT_ROOT, "database", array_name), resolution)
         if not os.path.exists(db_path):
-            return f"Error: TileDB database for {variable} not found."
+            return f"Error: TileDB database for {variable} ({'daily' if resolution == 'day' else 'monthly'} data) not found."
             
         meta = get_metadata(db_path)
-        transform = meta["transform"] 
-        a, b, c, d, e, f = transform
         
         # Calculate pixel coordinates dynamically via affine inverse for north-up raster
-        col = int((longitude - c) / a)
-        row = int((latitude - f) / e)
+        row, col = latlon_to_pixel(meta, latitude, longitude)
         
         if col < 0 or col >= meta["width"] or row < 0 or row >= meta["height"]:
             return f"Error: Coordinates ({latitude}, {longitude}) are outside the bounds of the Hawaii database."
             
-        data = get_data_for_month(db_path, month)
-        
-        val = data[row, col]
+        # Single-cell read instead of fetching the whole statewide grid
+        val = get_point_values(db_path, latitude, longitude, month)[0]
         if np.isnan(val):
             return f"No {variable} data available at ({latitude}, {longitude}) for {month} (likely over ocean)."
             
@@ -254,12 +265,13 @@ def query_historical_timeseries(latitude: float, longitude: float, start_date: s
     IMPORTANT: If a location name is given (e.g. 'Honolulu'), you MUST use geocode_placename first.
     Args:
         latitude, longitude: Center coordinates of the area of interest.
-        start_date, end_date: Strictly formatted as 'YYYY-MM' (e.g. '2008-01' to '2021-12').
+        start_date, end_date: Strictly formatted as 'YYYY-MM' (e.g. '2008-01' to '2021-12'), or both as 'YYYY-MM-DD' for a daily series.
         radius_km: Radius in kilometers to average the data over (default 5.0 km).
-        variable: 'rainfall' (mm), 'temperature' (Celsius), or 'spi'. Defaults to 'rainfall'.
+        variable: 'rainfall' (mm), 'temperature' (Celsius), or 'spi' ('spi_1', 'spi_3', 'spi_6', 'spi_12' for a specific accumulation window). Defaults to 'rainfall'.
     """
     try:
-        from database.tiledb_access import get_metadata, get_timeseries_for_region
+        from database.tiledb_access import get_metadata, get_region_statistics, resolution_uri
+        from database.region_masks import circle_mask
         import numpy as np
         
         # Select the correct array
@@ -275,68 +287,221 @@ def query_historical_timeseries(latitude: float, longitude: float, start_date: s
         elif variable.lower() == "spi":
             array_name = "spi_array"
             unit = "SPI"
+        elif variable.lower() in ("spi_1", "spi_3", "spi_6", "spi_12"):
+            # SPI computed from the rainfall array by database/compute_spi.py
+            array_name = f"spi_array_{variable.lower()[4:]}mo"
+            unit = "SPI"
         else:
             array_name = "rainfall_array"
             unit = "mm"
         
-        db_path = os.path.join(PROJECT_ROOT, "database", array_name)
+        # Daily bounds are answered from the daily array
+        resolution = "day" if len(start_date) == 10 and len(end_date) == 10 else "month"
+        db_path = resolution_uri(os.path.join(PROJECT_ROOT, "database", array_name), resolution)
         if not os.path.exists(db_path):
-            return f"Error: TileDB database for {variable} not found."
+            return f"Error: TileDB database for {variable} ({'daily' if resolution == 'day' else 'monthly'} data) not found."
             
         meta = get_metadata(db_path)
-        a, b, c, d, e, f = meta["transform"]
-        
-        # Center pixel
-        center_col = int((longitude - c) / a)
-        center_row = int((latitude - f) / e)
-        
-        # Convert radius_km to degrees (approximate)
-        # Hawaii approx: 1 deg lat = 111km, 1 deg lon = 104km
-        deg_lat = radius_km / 111.0
-        deg_lon = radius_km / 104.0
         
-        # Pixel delta (taking abs because 'e' is usually negative)
-        delta_col = abs(int(deg_lon / a))
-        delta_row = abs(int(deg_lat / e))
-        
-        # Bounding box in pixels
-        y_min, y_max = center_row - delta_row, center_row + delta_row
-        x_min, x_max = center_col - delta_col, center_col + delta_col
+        # Exact circular mask over the pixel window around the center (cached per location)
+        window, mask = circle_mask(meta["transform"], (meta["height"], meta["width"]), latitude, longitude, radius_km)
         
         # Bounds check
-        if x_max < 0 or x_min >= meta["width"] or y_max < 0 or y_min >= meta["height"]:
+        if window is None or not mask.any():
             return f"Error: The requested area at ({latitude}, {longitude}) is outside the Hawaii database bounds."
+        y_min, y_max, x_min, x_max = window
             
-        series = get_timeseries_for_region(db_path, start_date, end_date, y_min, y_max, x_min, x_max)
+        # One chunked pass returns per-month and overall statistics together
+        stats = get_region_statistics(db_path, start_date, end_date, y_min, y_max, x_min, x_max, percentiles=(10, 90), mask=mask)
         
-        if not series:
+        monthly_means = stats["per_step"]["mean"] if stats else np.array([])
+        has_data = ~np.isnan(monthly_means)
+        if not has_data.any():
             return f"No {variable} data found for the range {start_date} to {end_date} in this region."
             
         # Format a summary
-        months = sorted(series.keys())
-        values = [series[m] for m in months]
-        avg_val = sum(values) / len(values)
-        max_val, min_val = max(values), min(values)
+        months = [m for m, ok in zip(stats["months"], has_data) if ok]
+        values = monthly_means[has_data]
+        series = dict(zip(months, values))
+        avg_val = values.mean()
+        max_i, min_i = int(values.argmax()), int(values.argmin())
+        overall = stats["overall"]
         
         summary = f"Summary for {variable} near ({latitude}, {longitude}) from {start_date} to {end_date} ({radius_km}km radius):\n"
         summary += f"- Average: {avg_val:.2f} {unit}\n"
-        summary += f"- Maximum: {max_val:.2f} {unit} ({months[values.index(max_val)]})\n"
-        summary += f"- Minimum: {min_val:.2f} {unit} ({months[values.index(min_val)]})\n"
-        summary += f"- Data Points: {len(series)} months"
+        summary += f"- Maximum: {values[max_i]:.2f} {unit} ({months[max_i]})\n"
+        summary += f"- Minimum: {values[min_i]:.2f} {unit} ({months[min_i]})\n"
+        summary += f"- Spatial/Temporal Spread: std {overall['std']:.2f} {unit}, 10th-90th percentile {overall['p10']:.2f} to {overall['p90']:.2f} {unit}\n"
+        summary += f"- Pixel Extremes: {overall['min']:.2f} to {overall['max']:.2f} {unit}\n"
+        summary += f"- Data Points: {len(series)} {resolution}s ({overall['count']} valid pixel-{resolution}s)"
         
         # If the series is short, list it. Otherwise, mention it can be plotted.
         if len(series) <= 12:
-            summary += "\n\nMonthly Breakdown:\n"
+            summary += f"\n\n{'Daily' if resolution == 'day' else 'Monthly'} Breakdown:\n"
             for m in months:
                 summary += f"  {m}: {series[m]:.2f} {unit}\n"
         else:
-            summary += "\n\n(Note: Detailed monthly data is available for all 168 months if needed.)"
+            summary += f"\n\n(Note: Detailed {'daily' if resolution == 'day' else 'monthly'} data is available for all {len(series)} {resolution}s if needed.)"
                 
         return summary
             
     except Exception as err:
         return f"Error in regional query: {str(err)}"
 
+@tool
+def query_climate_anomaly(latitude: float, longitude: float, start_date: str, end_date: str = None, radius_km: float = 5.0, variable: str = 'rainfall', reference_period: str = None) -> str:
+    """
+    Compares a month or date range with the long-term normal at a location, answering questions like
+    'Was March 2024 wetter than usual in Hilo?' or 'How hot was last summer compared to normal?'.
+    IMPORTANT: If a location name is given (e.g. 'Honolulu'), you MUST use geocode_placename first.
+    Args:
+        latitude, longitude: Center coordinates of the area of interest.
+        start_date: First month, strictly formatted as 'YYYY-MM' (e.g. '2024-03').
+        end_date: Last month ('YYYY-MM'); omit for a single month.
+        radius_km: Radius in kilometers to average over (default 5.0 km).
+        variable: 'rainfall' (mm), 'temperature', 'max_temp' or 'min_temp' (Celsius). Defaults to 'rainfall'.
+        reference_period: Normals period as 'YYYY-YYYY' (e.g. '1991-2020'). Defaults to 1991-2020 when available.
+    """
+    try:
+        from database.tiledb_access import get_metadata, get_region_anomaly
+        from database.region_masks import circle_mask
+        import numpy as np
+
+        if variable.lower() not in CLIMATE_ARRAYS:
+            return f"Error: Anomalies are available for {', '.join(CLIMATE_ARRAYS)}. SPI is already expressed relative to normal."
+        array_name, unit, aggregation = CLIMATE_ARRAYS[variable.lower()]
+
+        db_path = os.path.join(PROJECT_ROOT, "database", array_name)
+        if not os.path.exists(db_path):
+            return f"Error: TileDB database for {variable} not found."
+
+        meta = get_metadata(db_path)
+        window, mask = circle_mask(meta["transform"], (meta["height"], meta["width"]), latitude, longitude, radius_km)
+        if window is None or not mask.any():
+            return f"Error: The requested area at ({latitude}, {longitude}) is outside the Hawaii database bounds."
+        y_min, y_max, x_min, x_max = window
+
+        # Observed values minus the stored per-pixel normals; no scan of the full history
+        result = get_region_anomaly(db_path, start_date, end_date, y_min, y_max, x_min, x_max,
+                                    mask=mask, aggregation=aggregation, period=reference_period)
+        if result is None or np.isnan(result["observed"]):
+            return f"No {variable} data found for {start_date}{' to ' + end_date if end_date else ''} in this region."
+
+        label = start_date if not end_date or end_date == start_date else f"{start_date} to {end_date}"
+        kind = "total" if aggregation == "sum" else "average"
+        summary = f"{variable.capitalize()} near ({latitude}, {longitude}) for {label} ({radius_km}km radius, {len(result['months'])} month{'s' if len(result['months']) != 1 else ''}):\n"
+        summary += f"- Observed {kind}: {result['observed']:.2f} {unit}\n"
+        summary += f"- Normal {kind} ({result['period']}): {result['normal']:.2f} {unit}\n"
+        summary += f"- Anomaly: {result['anomaly']:+.2f} {unit}"
+        if aggregation == "sum":
+            summary += f" ({result['percent_of_normal']:.0f}% of normal)"
+        return summary
+
+    except Exception as err:
+        return f"Error in anomaly query: {str(err)}"
+
+@tool
+def query_seasonal_climate(latitude: float, longitude: float, season: str = None, months: str = None, start_year: int = None, end_year: int = None, radius_km: float = 5.0, variable: str = 'rainfall') -> str:
+    """
+    Averages a climate variable over specific calendar months or a season across years, answering questions like
+    'average January rainfall in Hilo since 1990' or 'typical wet-season rainfall totals in Kona'.
+    Only the matching months are read, so use this instead of query_historical_timeseries for such questions.
+    IMPORTANT: If a location name is given (e.g. 'Honolulu'), you MUST use geocode_placename first.
+    Args:
+        latitude, longitude: Center coordinates of the area of interest.
+        season: 'wet' (Nov-Apr), 'dry' (May-Oct), 'winter', 'spring', 'summer' or 'fall'.
+        months: Alternatively, comma-separated month numbers in season order (e.g. '1' or '11,12,1,2').
+        start_year, end_year: Years to include (inclusive); default to all stored years.
+        radius_km: Radius in kilometers to average over (default 5.0 km).
+        variable: 'rainfall' (mm), 'temperature', 'max_temp' or 'min_temp' (Celsius). Defaults to 'rainfall'.
+    """
+    try:
+        from database.tiledb_access import get_metadata, get_calendar_aggregate
+        from database.region_masks import circle_mask
+
+        if variable.lower() not in CLIMATE_ARRAYS:
+            return f"Error: Seasonal queries are available for {', '.join(CLIMATE_ARRAYS)}."
+        array_name, unit, aggregation = CLIMATE_ARRAYS[variable.lower()]
+        if not season and not months:
+            return "Error: Provide a season or the months to include."
+        month_list = [int(m) for m in str(months).split(",")] if months and not season else None
+
+        db_path = os.path.join(PROJECT_ROOT, "database", array_name)
+        if not os.path.exists(db_path):
+            return f"Error: TileDB database for {variable} not found."
+
+        meta = get_metadata(db_path)
+        window, mask = circle_mask(meta["transform"], (meta["height"], meta["width"]), latitude, longitude, radius_km)
+        if window is None or not mask.any():
+            return f"Error: The requested area at ({latitude}, {longitude}) is outside the Hawaii database bounds."
+        y_min, y_max, x_min, x_max = window
+
+        # Rainfall: average of each year's total over the months; temperature: average month
+        years = range(start_year or 1, (end_year or 9999) + 1) if start_year or end_year else None
+        result = get_calendar_aggregate(db_path, months=month_list, season=season.lower() if season else None, years=years,
+                                        aggregation=aggregation, y_min=y_min, y_max=y_max, x_min=x_min, x_max=x_max, mask=mask)
+        if result is None or not result["per_year"]:
+            return f"No complete {variable} data found for that selection in this region."
+
+        per_year = result["per_year"]
+        which = f"{season} season" if season else "months " + ", ".join(str(m) for m in result["months"])
+        label = "Average seasonal total" if aggregation == "sum" else "Seasonal mean"
+        summary = f"{variable.capitalize()} near ({latitude}, {longitude}) for the {which}, {min(per_year)}-{max(per_year)} ({radius_km}km radius, {len(per_year)} years):\n"
+        summary += f"- {label}: {result['value']:.2f} {unit}\n"
+        highest = max(per_year, key=per_year.get)
+        lowest = min(per_year, key=per_year.get)
+        summary += f"- Highest: {per_year[highest]:.2f} {unit} in {highest}; lowest: {per_year[lowest]:.2f} {unit} in {lowest}\n"
+        if len(per_year) <= 12:
+            summary += "- By year: " + ", ".join(f"{y}: {v:.1f}" for y, v in per_year.items())
+        return summary
+
+    except Exception as err:
+        return f"Error in seasonal query: {str(err)}"
+
+@tool
+def query_island_statistics(start_date: str, end_date: str = None, variable: str = 'rainfall') -> str:
+    """
+    Summarizes a climate variable for every Hawaiian island at once (e.g. 'average rainfall per island for 2020',
+    'which island was hottest last summer'). Use this instead of one query per island.
+    Args:
+        start_date: First month, strictly formatted as 'YYYY-MM' (e.g. '2020-01').
+        end_date: Last month ('YYYY-MM'); omit for a single month.
+        variable: 'rainfall' (mm), 'temperature', 'max_temp' or 'min_temp' (Celsius). Defaults to 'rainfall'.
+    """
+    try:
+        from database.zonal_stats import island_zones, zonal_statistics
+
+        if variable.lower() not in CLIMATE_ARRAYS:
+            return f"Error: Island statistics are available for {', '.join(CLIMATE_ARRAYS)}."
+        array_name, unit, aggregation = CLIMATE_ARRAYS[variable.lower()]
+
+        db_path = os.path.join(PROJECT_ROOT, "database", array_name)
+        if not os.path.exists(db_path):
+            return f"Error: TileDB database for {variable} not found."
+
+        # All islands are reduced together, one pass per month
+        end_date = end_date or start_date
+        table = zonal_statistics(db_path, start_date, end_date, island_zones(db_path))
+        table = table[table["count"] > 0]
+        if table.empty:
+            return f"No {variable} data found for {start_date} to {end_date}."
+
+        per_island = table.groupby("zone").agg(mean=("mean", "mean"), total=("mean", "sum"), months=("date", "nunique"))
+        per_island = per_island.sort_values("total" if aggregation == "sum" else "mean", ascending=False)
+
+        label = start_date if end_date == start_date else f"{start_date} to {end_date}"
+        summary = f"{variable.capitalize()} by island for {label}:\n"
+        for island, row in per_island.iterrows():
+            months = f"{int(row['months'])} month{'s' if row['months'] != 1 else ''}"
+            if aggregation == "sum":
+                summary += f"- {island}: {row['total']:.1f} {unit} total ({row['mean']:.1f} {unit}/month over {months})\n"
+            else:
+                summary += f"- {island}: {row['mean']:.2f} {unit} average over {months}\n"
+        return summary
+
+    except Exception as err:
+        return f"Error in island statistics query: {str(err)}"
+
 @tool
 def generate_climatogram(latitude: float, longitude: float, start_year: int = None, end_year: int = None, units: str = 'metric', session_id: str = "default") -> str:
     """
@@ -352,9 +517,9 @@ def generate_climatogram(latitude: float, longitude: float, start_year: int = No
         return "Error: Graph generator utility not found."
     
     try:
-        from database.tiledb_access import get_metadata, get_timeseries_for_region
+        from database.tiledb_access import get_metadata, get_timeseries_for_variables, get_normal_periods, get_region_normals
+        from database.region_masks import circle_mask
         import numpy as np
-        from collections import defaultdict
         
         # 1. Determine Date Range (Default to last 10 years)
         temp_db_path = os.path.join(PROJECT_ROOT, "database", "temperature_array")
@@ -373,45 +538,38 @@ def generate_climatogram(latitude: float, longitude: float, start_year: int = No
         start_date = f"{start_year}-01"
         end_date = f"{end_year}-12"
 
-        # 2. Setup Pixel Bounds (5km radius as requested)
-        a, b, c, d, e, f = meta["transform"]
+        # 2. Setup Pixel Window and circular mask (5km radius as requested)
         radius_km = 5.0
-        deg_lat = radius_km / 111.0
-        deg_lon = radius_km / 104.0
-        
-        center_col = int((longitude - c) / a)
-        center_row = int((latitude - f) / e)
-        delta_col = abs(int(deg_lon / a))
-        delta_row = abs(int(deg_lat / e))
-        
-        y_min, y_max = center_row - delta_row, center_row + delta_row
-        x_min, x_max = center_col - delta_col, center_col + delta_col
+        window, mask = circle_mask(meta["transform"], (meta["height"], meta["width"]), latitude, longitude, radius_km)
+        if window is None or not mask.any():
+            return f"Error: The requested area at ({latitude}, {longitude}) is outside the Hawaii database bounds."
+        y_min, y_max, x_min, x_max = window
 
         # 3. Query Data
         rain_db_path = os.path.join(PROJECT_ROOT, "database", "rainfall_array")
-        
-        temp_series = get_timeseries_for_region(temp_db_path, start_date, end_date, y_min, y_max, x_min, x_max)
-        rain_series = get_timeseries_for_region(rain_db_path, start_date, end_date, y_min, y_max, x_min, x_max)
-
-        if not temp_series or not rain_series:
-            return f"Error: Could not retrieve enough data for a chart at ({latitude}, {longitude}) for the range {start_year}-{end_year}."
-
-        # 4. Aggregate by Month
-        monthly_temp = defaultdict(list)
-        monthly_rain = defaultdict(list)
+        months_label = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        period = f"{start_year}-{end_year}"
+
+        if period in get_normal_periods(temp_db_path) and period in get_normal_periods(rain_db_path):
+            # Precomputed per-pixel normals: one small read per variable
+            final_temp = list(get_region_normals(temp_db_path, period, y_min, y_max, x_min, x_max, mask=mask))
+            final_rain = list(get_region_normals(rain_db_path, period, y_min, y_max, x_min, x_max, mask=mask))
+            if np.isnan(final_temp).all() or np.isnan(final_rain).all():
+                return f"Error: Could not retrieve enough data for a chart at ({latitude}, {longitude}) for the range {start_year}-{end_year}."
+        else:
+            # Both variables are read concurrently and returned as one DataFrame aligned by month
+            aligned = get_timeseries_for_variables(
+                {"temperature": temp_db_path, "rainfall": rain_db_path},
+                start_date, end_date, y_min, y_max, x_min, x_max, mask=mask, output="series"
+            )
 
-        for date_str, val in temp_series.items():
-            month_idx = int(date_str.split("-")[1])
-            monthly_temp[month_idx].append(val)
-        
-        for date_str, val in rain_series.items():
-            month_idx = int(date_str.split("-")[1])
-            monthly_rain[month_idx].append(val)
+            # 4. Aggregate by calendar month (NaN months are skipped by the mean)
+            monthly = aligned.groupby(aligned.index.month).mean().reindex(range(1, 13)).astype(np.float64)
+            if monthly["temperature"].isna().all() or monthly["rainfall"].isna().all():
+                return f"Error: Could not retrieve enough data for a chart at ({latitude}, {longitude}) for the range {start_year}-{end_year}."
 
-        # Calculate Means
-        months_label = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        final_temp = [np.mean(monthly_temp[i]) if i in monthly_temp else np.nan for i in range(1, 13)]
-        final_rain = [np.mean(monthly_rain[i]) if i in monthly_rain else np.nan for i in range(1, 13)]
+            final_temp = monthly["temperature"].tolist()
+            final_rain = monthly["rainfall"].tolist()
 
         # 5. Handle Unit Conversion
         temp_unit = "°C"
@@ -456,6 +614,9 @@ Follow these constraints strictly:
 8. For specific historical climate queries (temperature, rainfall, or SPI):
    - Use 'query_historical_timeseries' for multi-month or multi-year ranges.
    - Use 'query_historical_climate_data' for a single specific month.
+   - Use 'query_climate_anomaly' when the user asks whether a period was wetter, drier, hotter or cooler than usual/normal.
+   - Use 'query_seasonal_climate' for specific months or seasons across years (e.g. 'average January rainfall since 1990', 'wet-season totals').
+   - Use 'query_island_statistics' to compare islands or summarize every island at once.
    - Use 'generate_climatogram' when the user asks for a chart, graph, or seasonal typical weather breakdown.
 9. SPI stands for Standardized Precipitation Index. It is used to represent drought (negative values) or wet conditions (positive values).
 10. If statewide is False, radius_km must be at least 1.0 (default 5.0).
@@ -499,7 +660,7 @@ def initialize_agent():
     )
 
     # Bind tools to the LLM
-    tools = [geocode_placename, find_nearby_stations, map_nearby_stations, generate_gridded_map, query_historical_climate_data, query_historical_timeseries, generate_climatogram]
+    tools = [geocode_placename, find_nearby_stations, map_nearby_stations, generate_gridded_map, query_historical_climate_data, query_historical_timeseries, query_climate_anomaly, query_seasonal_climate, query_island_statistics, generate_climatogram]
     llm_with_tools = llm.bind_tools(tools)
     print("[*] Agent initialized with tools.")
 
@@ -534,6 +695,9 @@ def chat_with_agent(user_input: str, messages: list, session_id: str = "default"
                     "generate_gridded_map": generate_gridded_map,
                     "query_historical_climate_data": query_historical_climate_data,
                     "query_historical_timeseries": query_historical_timeseries,
+                    "query_climate_anomaly": query_climate_anomaly,
+                    "query_seasonal_climate": query_seasonal_climate,
+                    "query_island_statistics": query_island_statistics,
                     "generate_climatogram": generate_climatogram
                 }
 
@@ -618,6 +782,9 @@ def run_agent():
                         "generate_gridded_map": generate_gridded_map,
                         "query_historical_climate_data": query_historical_climate_data,
                         "query_historical_timeseries": query_historical_timeseries,
+                        "query_climate_anomaly": query_climate_anomaly,
+                        "query_seasonal_climate": query_seasonal_climate,
+                        "query_island_statistics": query_island_statistics,
                         "generate_climatogram": generate_climatogram
                     }
 